@@ -1,12 +1,30 @@
+from asgiref.sync import sync_to_async
 from ninja import NinjaAPI
-from django.db.models import Count, Prefetch
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import FileResponse, HttpResponse
 from ninja.errors import HttpError
-from apps.api.schemas import NearbyRequest, NearbyResponse, UnitDetailResponse, ErrorResponse, GedungDetailSchema
-from apps.api.utils import haversine_distance, get_bounding_box, ImarahApiKeyAuth
-from apps.core.models import Gedung, Unit
+from apps.api.schemas import NearbyRequest, NearbyResponse, NearbyBatchRequest, NearbyBatchResponse, NearestResponse, UnitDetailResponse, ErrorResponse, GedungDetailSchema, GedungSearchResponse, ClusterResponse, UuidBatchRequest, GedungBatchResponse, UnitBatchResponse, PhoneScreeningRequest, PhoneScreeningResponse, NameScreeningResponse, SyncResponse
+from apps.api.utils import haversine_distances, ImarahApiKeyAuth
+from apps.api.spatial import nearby_candidates_multi, nearest_gedung, gedung_in_bbox
+from apps.api.clusters import get_cluster_index, cluster_max_zoom
+from apps.api.media import aresolve_media_urls
+from apps.api.renderers import ORJSONRenderer, trust_responses
+from apps.api.ratelimit import RateLimitExceeded
+from apps.api.metrics import NEARBY_CANDIDATES_SCANNED, NEARBY_CANDIDATES_MATCHED
+from apps.api.etags import gedung_etag, unit_etag, etag_matches, not_modified
+from apps.api.sync import sync_page, SyncCursorInvalid, SyncCursorExpired
+from apps.api.snapshot import read_manifest, snapshot_dir
+from apps.api.cache import nearby_cache_enabled, entry_keys, get_entries, set_entries, record_lookups, cache_stats
+from apps.core.models import Gedung, Unit, Pemilik, Agen
+from apps.core.images import ORIGINAL, image_sizes
+from apps.core.search import search_gedung
+from apps.core.fuzzy import fuzzy_search
+from apps.core.utils import normalize_phone
 
 # utils
 import uuid
+import numpy as np
 
 # Initialize API
 api = NinjaAPI(
@@ -14,164 +32,716 @@ api = NinjaAPI(
     version="1.0.0",
     description="API untuk mencari gedung berdasarkan radius lokasi",
     docs_url="/docs",
-    auth=ImarahApiKeyAuth() 
+    auth=ImarahApiKeyAuth(),
+    renderer=ORJSONRenderer()
 )
 
 
+@api.exception_handler(RateLimitExceeded)
+def rate_limit_exceeded(request, exc):
+    """429 + Retry-After untuk API key yang melewati rate limit / kuota"""
+    response = api.create_response(request, {"success": False, "error": exc.message}, status=429)
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+
+def _trusted(request, response, data, status=200):
+    """
+    Response untuk output view yang bentuknya sudah pasti sesuai schema.
+    
+    Jika API_TRUST_RESPONSES aktif (production), data langsung di-render
+    tanpa validasi Pydantic. Di development/test tetap dikembalikan sebagai
+    (status, data) agar divalidasi response schema seperti biasa.
+    """
+    if not trust_responses():
+        return status, data
+    response.status_code = status
+    return api.create_response(request, data, temporal_response=response)
+
+
+def _validate_nearby_request(payload):
+    """Validasi koordinat, radius dan limit satu titik nearby"""
+    if not (-90 <= payload.lat <= 90):
+        raise HttpError(400, "Latitude harus antara -90 dan 90")
+    
+    if not (-180 <= payload.long <= 180):
+        raise HttpError(400, "Longitude harus antara -180 dan 180")
+    
+    if not (1 <= payload.radius <= 1000):
+        raise HttpError(400, "Radius harus antara 1 dan 1000 meter")
+    
+    if payload.limit is not None and not (1 <= payload.limit <= 1000):
+        raise HttpError(400, "Limit harus antara 1 dan 1000")
+
+
+def _validate_image_size(image_size):
+    """Validasi query param image_size (thumb, medium, original)"""
+    if image_size not in image_sizes():
+        raise HttpError(400, f"image_size harus salah satu dari: {', '.join(image_sizes())}")
+
+
+def _gedung_summaries(gedung_ids):
+    """
+    Hydrate gedung hasil pencarian spatial (tanpa distance).
+    
+    primary_image masih berupa nama file di storage per ukuran ({original,
+    thumb, medium}); variant dipilih dan URL di-resolve saat response dibuat
+    (lihat _with_distance) agar hasil aman di-cache.
+    
+    Returns:
+    - Dict gedung_id -> dict GedungBaseSchema
+    """
+    gedungs = {}
+    if not gedung_ids:
+        return gedungs
+    
+    # total_units dan primary_image sudah denormalized di tabel gedung
+    queryset = Gedung.objects.defer('lat', 'long').select_related('primary_image')
+    
+    for gedung in queryset.filter(id__in=list(gedung_ids)):
+        primary_img = None
+        if gedung.primary_image:
+            primary_img = {ORIGINAL: gedung.primary_image.image.name, **gedung.primary_image.variants}
+        
+        gedungs[gedung.id] = {
+            'id': gedung.id,
+            'uuid': str(gedung.uuid),
+            'nama_gedung': gedung.nama_gedung,
+            'lat': gedung.lat_float,
+            'long': gedung.long_float,
+            'alamat': gedung.alamat,
+            'total_units': gedung.total_units,
+            'primary_image': primary_img
+        }
+    
+    return gedungs
+
+
+def _summary_image(summary, image_size):
+    """Nama file primary_image summary untuk image_size (tanpa variant pakai original)"""
+    names = summary['primary_image']
+    if not names:
+        return None
+    return names.get(image_size, names[ORIGINAL])
+
+
+def _with_image(summary, media_urls, image_size):
+    """Summary gedung dengan URL primary_image absolute"""
+    return {**summary, 'primary_image': media_urls.get(_summary_image(summary, image_size))}
+
+
+def _with_distance(summary, distance, media_urls, image_size):
+    """Gabungkan summary gedung dengan distance dan URL gambar absolute"""
+    return {
+        **_with_image(summary, media_urls, image_size),
+        'distance': distance
+    }
+
+
+def _rank_by_distance(lat, long, radius, limit, lats, longs):
+    """
+    Index kandidat dalam radius, urut dari terdekat, maksimal limit.
+    
+    Returns:
+    - (order, distances): NumPy array index kandidat dan jaraknya (dibulatkan)
+    """
+    distances = haversine_distances(lat, long, lats, longs)
+    in_radius = np.flatnonzero(distances <= radius)
+    order = in_radius[np.argsort(distances[in_radius], kind='stable')][:limit]
+    return order, np.round(distances[order], 2)
+
+
+def _nearby_hits(points, fresh_after=None):
+    """
+    Spatial search untuk banyak titik (lat, long, radius, limit) sekaligus.
+    
+    Kandidat semua titik diambil dalam satu lookup dan jarak dihitung dalam
+    satu pass (matrix titik x kandidat).
+    
+    Returns:
+    - List (ids, distances) per titik, urut dari terdekat
+    """
+    # Kandidat dari bounding box (index in-memory, tanpa query database)
+    ids, lats, longs = nearby_candidates_multi(
+        [(lat, long, radius) for lat, long, radius, _ in points], fresh_after
+    )
+    
+    # Jarak exact untuk semua titik x kandidat sekaligus
+    center_lats = np.array([[point[0]] for point in points], dtype=np.float64)
+    center_longs = np.array([[point[1]] for point in points], dtype=np.float64)
+    distances = haversine_distances(center_lats, center_longs, lats, longs)
+    
+    # Per titik: filter radius, sort berdasarkan jarak terdekat, ambil top N
+    hits = []
+    matched = 0
+    for row, (_, _, radius, limit) in zip(distances, points):
+        in_radius = np.flatnonzero(row <= radius)
+        matched += len(in_radius)
+        order = in_radius[np.argsort(row[in_radius], kind='stable')][:limit]
+        hits.append((ids[order].tolist(), np.round(row[order], 2).tolist()))
+    
+    NEARBY_CANDIDATES_SCANNED.inc(distances.size)
+    NEARBY_CANDIDATES_MATCHED.inc(matched)
+    return hits
+
+
+def _ranked_from_index(payloads):
+    """Nearby tanpa cache: spatial search lalu hydrate gedung yang lolos"""
+    hits = _nearby_hits([(p.lat, p.long, p.radius, p.limit) for p in payloads])
+    
+    # Hydrate hanya gedung yang benar-benar dalam radius, sekali per gedung
+    gedungs = _gedung_summaries({gedung_id for gedung_ids, _ in hits for gedung_id in gedung_ids})
+    
+    # Gedung yang sudah dihapus sejak index terakhir di-refresh dilewati. Jarak
+    # dihitung ulang dari koordinat database (index worker ini bisa tertinggal)
+    ranked = []
+    for payload, (gedung_ids, _) in zip(payloads, hits):
+        summaries = [gedungs[gedung_id] for gedung_id in gedung_ids if gedung_id in gedungs]
+        order, distances = _rank_by_distance(
+            payload.lat, payload.long, payload.radius, payload.limit,
+            np.array([g['lat'] for g in summaries], dtype=np.float64),
+            np.array([g['long'] for g in summaries], dtype=np.float64)
+        )
+        ranked.append([(summaries[i], distance) for i, distance in zip(order.tolist(), distances.tolist())])
+    return ranked
+
+
+def _ranked_from_cache(payloads):
+    """
+    Nearby lewat cache quantized per cell grid.
+    
+    Entry cache berisi kandidat ter-hydrate untuk seluruh cell; hasil
+    untuk titik sebenarnya di-filter dan di-sort ulang secara exact.
+    
+    Entry baru dibuat dari index in-memory hanya jika index worker ini
+    dibaca setelah invalidasi terakhir region-nya; jika tidak (perubahan
+    dari worker lain belum terlihat), kandidat diambil dari database agar
+    entry bersama tidak diisi koordinat lama.
+    """
+    keys = entry_keys([(p.lat, p.long, p.radius) for p in payloads])
+    entries = get_entries({key for key, *_ in keys})
+    
+    missing = {
+        key: (center_lat, center_long, coverage, None)
+        for key, center_lat, center_long, coverage, _ in keys
+        if key not in entries
+    }
+    record_lookups(
+        hits=sum(1 for key, *_ in keys if key in entries),
+        misses=sum(1 for key, *_ in keys if key not in entries)
+    )
+    
+    if missing:
+        invalidated_at = max((at for key, *_, at in keys if key in missing), default=0)
+        hits = _nearby_hits(list(missing.values()), fresh_after=invalidated_at)
+        gedungs = _gedung_summaries({gedung_id for gedung_ids, _ in hits for gedung_id in gedung_ids})
+        
+        fresh = {}
+        for key, (gedung_ids, _) in zip(missing, hits):
+            summaries = [gedungs[gedung_id] for gedung_id in gedung_ids if gedung_id in gedungs]
+            fresh[key] = {
+                'gedungs': summaries,
+                'lats': np.array([g['lat'] for g in summaries], dtype=np.float64),
+                'longs': np.array([g['long'] for g in summaries], dtype=np.float64),
+            }
+        set_entries(fresh)
+        entries.update(fresh)
+    
+    ranked = []
+    for (key, *_), payload in zip(keys, payloads):
+        entry = entries[key]
+        order, distances = _rank_by_distance(
+            payload.lat, payload.long, payload.radius, payload.limit, entry['lats'], entry['longs']
+        )
+        ranked.append([
+            (entry['gedungs'][i], distance)
+            for i, distance in zip(order.tolist(), distances.tolist())
+        ])
+    return ranked
+
+
+async def _nearby_results(request, payloads, image_size):
+    """
+    Jalankan nearby search untuk satu atau banyak titik sekaligus.
+    
+    Setiap gedung hanya di-hydrate sekali walaupun muncul di beberapa titik.
+    Spatial search, cache dan query database berjalan di thread (sync) agar
+    event loop tidak ter-block.
+    
+    Returns:
+    - List hasil (list dict gedung dengan distance), satu per payload
+    """
+    if nearby_cache_enabled():
+        ranked = await sync_to_async(_ranked_from_cache)(payloads)
+    else:
+        ranked = await sync_to_async(_ranked_from_index)(payloads)
+    
+    # Resolve URL gambar sekali untuk seluruh response
+    media_urls = await aresolve_media_urls(
+        request, (_summary_image(summary, image_size) for point_ranked in ranked for summary, _ in point_ranked)
+    )
+    
+    return [
+        [_with_distance(summary, distance, media_urls, image_size) for summary, distance in point_ranked]
+        for point_ranked in ranked
+    ]
+
+
+def _nearby_response(payload, results):
+    return {
+        'success': True,
+        'count': len(results),
+        'radius': payload.radius,
+        'center_lat': payload.lat,
+        'center_long': payload.long,
+        'results': results
+    }
+
+
 @api.post("/gedung/nearby", response={200: NearbyResponse, 400: ErrorResponse}, tags=["Gedung"])
-def search_nearby_gedung(request, payload: NearbyRequest):
+async def search_nearby_gedung(request, response: HttpResponse, payload: NearbyRequest, image_size: str = ORIGINAL):
     """
     Search gedung dalam radius tertentu dari koordinat.
     
     Algoritma:
     1. Validasi input koordinat dan radius
-    2. Hitung bounding box untuk filter database (efisien)
-    3. Query gedung yang ada dalam bounding box
-    4. Hitung jarak exact menggunakan Haversine
-    5. Filter yang benar-benar dalam radius
-    6. Sort berdasarkan jarak terdekat
+    2. Ambil kandidat dari spatial index in-memory (NumPy array)
+    3. Hitung jarak exact menggunakan Haversine (vectorized)
+    4. Filter yang benar-benar dalam radius, sort, ambil top N
+    5. Query database hanya untuk gedung yang lolos filter
     
     Parameters:
     - lat: Latitude center point (-90 to 90)
     - long: Longitude center point (-180 to 180)
     - radius: Search radius dalam meter (1-1000)
+    - limit: Maksimal jumlah hasil (opsional, 1-1000)
+    - image_size: Query param ukuran primary_image (thumb, medium, original)
     
     Returns:
     - List gedung dalam radius, sorted by distance
     """
-    # 1. Validasi input
-    if not (-90 <= payload.lat <= 90):
+    _validate_nearby_request(payload)
+    _validate_image_size(image_size)
+    
+    results = (await _nearby_results(request, [payload], image_size))[0]
+    
+    return _trusted(request, response, _nearby_response(payload, results))
+
+
+@api.post("/gedung/nearby/batch", response={200: NearbyBatchResponse, 400: ErrorResponse}, tags=["Gedung"])
+async def search_nearby_gedung_batch(request, response: HttpResponse, payload: NearbyBatchRequest, image_size: str = ORIGINAL):
+    """
+    Nearby search untuk banyak titik dalam satu request (rute, saved places).
+    
+    Semua titik memakai satu lookup kandidat, satu pass perhitungan jarak
+    dan satu query hydrate gedung.
+    
+    Parameters:
+    - points: List NearbyRequest (1-50 titik)
+    - image_size: Query param ukuran primary_image (thumb, medium, original)
+    
+    Returns:
+    - List NearbyResponse, urutan sama dengan points
+    """
+    if not (1 <= len(payload.points) <= 50):
+        raise HttpError(400, "Jumlah titik harus antara 1 dan 50")
+    
+    for point in payload.points:
+        _validate_nearby_request(point)
+    _validate_image_size(image_size)
+    
+    results = await _nearby_results(request, payload.points, image_size)
+    
+    return _trusted(request, response, {
+        'success': True,
+        'count': len(payload.points),
+        'results': [
+            _nearby_response(point, point_results)
+            for point, point_results in zip(payload.points, results)
+        ]
+    })
+
+
+@api.get("/gedung/nearest", response={200: NearestResponse, 400: ErrorResponse}, tags=["Gedung"])
+async def search_nearest_gedung(request, response: HttpResponse, lat: float, long: float, k: int = 10, image_size: str = ORIGINAL):
+    """
+    k gedung terdekat dari koordinat, tanpa batas radius.
+    
+    Memakai expanding-ring search di spatial index, jadi client tidak perlu
+    mengulang /gedung/nearby dengan radius yang makin besar.
+    
+    Parameters:
+    - lat: Latitude center point (-90 to 90)
+    - long: Longitude center point (-180 to 180)
+    - k: Jumlah gedung terdekat (1-100)
+    - image_size: Ukuran primary_image (thumb, medium, original)
+    
+    Returns:
+    - List gedung terdekat, sorted by distance
+    """
+    if not (-90 <= lat <= 90):
         raise HttpError(400, "Latitude harus antara -90 dan 90")
     
-    if not (-180 <= payload.long <= 180):
+    if not (-180 <= long <= 180):
         raise HttpError(400, "Longitude harus antara -180 dan 180")
     
-    if not (1 <= payload.radius <= 1000):
-        raise HttpError(400, "Radius harus antara 1 dan 1000 meter")
+    if not (1 <= k <= 100):
+        raise HttpError(400, "k harus antara 1 dan 100")
     
-    # 2. Hitung bounding box untuk filter awal
-    bbox = get_bounding_box(payload.lat, payload.long, payload.radius)
+    _validate_image_size(image_size)
     
-    # 3. Query gedung dengan bounding box (efisien, tidak get semua gedung)
-    gedungs = Gedung.objects.filter(
-        lat__gte=bbox['lat_min'],
-        lat__lte=bbox['lat_max'],
-        long__gte=bbox['lon_min'],
-        long__lte=bbox['lon_max']
-    ).annotate(
-        total_units=Count('units')  # Hitung total unit sekali query
-    ).select_related('lokasi').prefetch_related('images')
+    ids, distances = await sync_to_async(nearest_gedung)(lat, long, k)
+    gedungs = await sync_to_async(_gedung_summaries)(ids.tolist())
+    media_urls = await aresolve_media_urls(request, (_summary_image(g, image_size) for g in gedungs.values()))
     
-    # 4. Filter exact dengan Haversine dan build response
-    results = []
+    results = [
+        _with_distance(gedungs[gedung_id], distance, media_urls, image_size)
+        for gedung_id, distance in zip(ids.tolist(), np.round(distances, 2).tolist())
+        if gedung_id in gedungs
+    ]
     
-    for gedung in gedungs:
-        # Hitung jarak exact
-        distance = haversine_distance(
-            payload.lat, 
-            payload.long, 
-            float(gedung.lat), 
-            float(gedung.long)
+    return _trusted(request, response, {
+        'success': True,
+        'count': len(results),
+        'k': k,
+        'center_lat': lat,
+        'center_long': long,
+        'results': results
+    })
+
+
+def _gedung_detail_queryset():
+    """Queryset gedung detail: units urut lantai, gambar unit di-prefetch"""
+    return Gedung.objects.defer('lat', 'long').select_related(
+        'primary_image'
+    ).prefetch_related(
+        Prefetch(
+            'units',
+            queryset=Unit.objects.prefetch_related('images').order_by('lantai', 'unit_number')
         )
+    )
+
+
+def _gedung_media_names(gedung, image_size):
+    """Nama file semua gambar yang tampil di detail gedung (gedung + semua unit)"""
+    names = [gedung.primary_image.variant_name(image_size)] if gedung.primary_image else []
+    names.extend(img.variant_name(image_size) for unit in gedung.units.all() for img in unit.images.all())
+    return names
+
+
+def _gedung_detail(gedung, media_urls, image_size):
+    """Bentuk GedungDetailSchema dari gedung hasil _gedung_detail_queryset()"""
+    # Get primary image
+    primary_img = None
+    if gedung.primary_image:
+        primary_img = media_urls[gedung.primary_image.variant_name(image_size)]
+    
+    # Build units data
+    units_data = []
+    for unit in gedung.units.all():
+        # Get all images for this unit (not just primary)
+        unit_images = [media_urls[img.variant_name(image_size)] for img in unit.images.all()]
         
-        # Filter yang benar-benar dalam radius
-        if distance <= payload.radius:
-            # Get primary image
-            primary_img = None
-            for img in gedung.images.all():
-                if img.is_primary:
-                    primary_img = request.build_absolute_uri(img.image.url)
-                    break
-            
-            results.append({
-                'id': gedung.id,
-                'uuid': str(gedung.uuid),
-                'nama_gedung': gedung.nama_gedung,
-                'lat': float(gedung.lat),
-                'long': float(gedung.long),
-                'alamat': gedung.alamat,
-                'distance': round(distance, 2),
-                'total_units': gedung.total_units,  # Dari annotate
-                'primary_image': primary_img
-            })
+        units_data.append({
+            'id': unit.id,
+            'uuid': str(unit.uuid),
+            'lantai': unit.lantai,
+            'unit_number': unit.unit_number,
+            'deskripsi': unit.deskripsi,
+            'alasan_blacklist': unit.alasan_blacklist,
+            'images': unit_images
+        })
     
-    # 5. Sort berdasarkan jarak terdekat
-    results.sort(key=lambda x: x['distance'])
+    return {
+        'id': gedung.id,
+        'uuid': str(gedung.uuid),
+        'nama_gedung': gedung.nama_gedung,
+        'lat': gedung.lat_float,
+        'long': gedung.long_float,
+        'alamat': gedung.alamat,
+        'total_units': gedung.total_units,
+        'primary_image': primary_img,
+        'units': units_data
+    }
+
+
+def _unit_detail_queryset():
+    return Unit.objects.select_related('gedung', 'pemilik', 'agen').prefetch_related('images')
+
+
+def _nama_julukan(person):
+    """Format pemilik/agen: Nama (Julukan)"""
+    if person is None:
+        return None
+    if person.julukan:
+        return f"{person.nama} ({person.julukan})"
+    return person.nama
+
+
+def _unit_detail(unit, media_urls, image_size):
+    """Bentuk UnitDetailResponse dari unit hasil _unit_detail_queryset()"""
+    return {
+        'id': unit.id,
+        'uuid': str(unit.uuid),
+        'lantai': unit.lantai,
+        'unit_number': unit.unit_number,
+        'deskripsi': unit.deskripsi,
+        'alasan_blacklist': unit.alasan_blacklist,
+        'gedung_nama': unit.gedung.nama_gedung,
+        'listing_type': unit.listing_type,
+        'pemilik': _nama_julukan(unit.pemilik),
+        'agen': _nama_julukan(unit.agen),
+        'images': [media_urls[img.variant_name(image_size)] for img in unit.images.all()]
+    }
+
+
+def _parse_uuids(values, max_count):
+    """
+    Validasi list UUID untuk endpoint batch.
+
+    Returns:
+        dict: {uuid input: UUID} untuk input yang valid (duplikat digabung)
+    """
+    if not (1 <= len(values) <= max_count):
+        raise HttpError(400, f"Jumlah uuid harus antara 1 dan {max_count}")
     
-    # 6. Return response
-    return 200, {
+    parsed = {}
+    for value in values:
+        try:
+            parsed[value] = uuid.UUID(value)
+        except ValueError:
+            continue
+    return parsed
+
+
+def _batch_response(values, parsed, found):
+    """Map uuid input -> hasil; uuid tidak valid / tidak ada bernilai None"""
+    results = {value: found.get(parsed.get(value)) for value in values}
+    not_found = [value for value, result in results.items() if result is None]
+    return {
         'success': True,
-        'count': len(results),
-        'radius': payload.radius,
-        'center_lat': payload.lat,
-        'center_long': payload.long,
-        'results': results
+        'count': len(results) - len(not_found),
+        'results': results,
+        'not_found': not_found
     }
 
 
+def _parse_bbox(bbox):
+    """bbox "long_min,lat_min,long_max,lat_max" (urutan Leaflet toBBoxString)"""
+    try:
+        lon_min, lat_min, lon_max, lat_max = (float(value) for value in bbox.split(','))
+    except ValueError:
+        raise HttpError(400, "bbox harus berformat long_min,lat_min,long_max,lat_max")
+    
+    if not (-90 <= lat_min <= lat_max <= 90) or not (-180 <= lon_min <= lon_max <= 180):
+        raise HttpError(400, "bbox di luar jangkauan atau min > max")
+    return lat_min, lat_max, lon_min, lon_max
+
+
+def _clusters(zoom, bbox):
+    """
+    Cluster (zoom rendah) atau gedung satu per satu (zoom tinggi) di bbox.
+    
+    Gedung individual diambil dari spatial index; jika terlalu banyak
+    (> CLUSTER_MAX_GEDUNG) atau bbox terlalu besar tetap dikirim sebagai
+    cluster zoom terdalam.
+    """
+    lat_min, lat_max, lon_min, lon_max = bbox
+    # bbox jauh lebih besar dari layar (~16 tile per sisi) untuk zoom ini tetap di-cluster
+    max_span = 16 * 360 / 2 ** zoom
+    if zoom >= cluster_max_zoom() and lat_max - lat_min <= max_span and lon_max - lon_min <= max_span:
+        ids = gedung_in_bbox(*bbox)
+        if len(ids) <= getattr(settings, 'CLUSTER_MAX_GEDUNG', 1000):
+            return False, list(_gedung_summaries(ids).values())
+    return True, get_cluster_index().query(zoom, *bbox)
+
+
+@api.get("/gedung/clusters", response={200: ClusterResponse, 400: ErrorResponse}, tags=["Gedung"])
+async def get_gedung_clusters(request, response: HttpResponse, bbox: str, zoom: int, image_size: str = ORIGINAL):
+    """
+    Cluster gedung untuk viewport peta.
+    
+    Gedung dikelompokkan per cell grid yang ukurannya mengikuti zoom, dengan
+    agregat yang sudah dihitung di memory, jadi viewport satu kota sama
+    murahnya dengan viewport kecil. Mulai CLUSTER_MAX_ZOOM gedung dikirim
+    satu per satu.
+    
+    Parameters:
+    - bbox: long_min,lat_min,long_max,lat_max
+    - zoom: Zoom level peta (0-22)
+    - image_size: Ukuran primary_image gedung individual (thumb, medium, original)
+    
+    Returns:
+    - clusters (count, centroid, blacklisted_units) atau gedung
+    """
+    if not (0 <= zoom <= 22):
+        raise HttpError(400, "zoom harus antara 0 dan 22")
+    
+    _validate_image_size(image_size)
+    
+    clustered, items = await sync_to_async(_clusters)(zoom, _parse_bbox(bbox))
+    if clustered:
+        return _trusted(request, response, {
+            'success': True,
+            'zoom': zoom,
+            'clustered': True,
+            'count': sum(cluster['count'] for cluster in items),
+            'clusters': items,
+            'gedung': []
+        })
+    
+    media_urls = await aresolve_media_urls(request, (_summary_image(g, image_size) for g in items))
+    gedung = [_with_image(g, media_urls, image_size) for g in items]
+    return _trusted(request, response, {
+        'success': True,
+        'zoom': zoom,
+        'clustered': False,
+        'count': len(gedung),
+        'clusters': [],
+        'gedung': gedung
+    })
+
+
+@api.get("/gedung/search", response={200: GedungSearchResponse, 400: ErrorResponse}, tags=["Gedung"])
+async def search_gedung_text(request, response: HttpResponse, q: str, page: int = 1, per_page: int = 20, image_size: str = ORIGINAL):
+    """
+    Full-text search gedung berdasarkan nama gedung, alamat, lokasi dan distrik.
+    
+    Memakai index full-text database (PostgreSQL tsvector + trigram, SQLite
+    FTS5), hasil diurutkan dari yang paling relevan.
+    
+    Parameters:
+    - q: Kata kunci (min 2 karakter)
+    - page: Halaman (mulai 1)
+    - per_page: Jumlah hasil per halaman (1-100)
+    - image_size: Ukuran primary_image (thumb, medium, original)
+    
+    Returns:
+    - List gedung, sorted by relevansi
+    """
+    q = q.strip()
+    if len(q) < 2:
+        raise HttpError(400, "q minimal 2 karakter")
+    
+    if page < 1:
+        raise HttpError(400, "page minimal 1")
+    
+    if not (1 <= per_page <= 100):
+        raise HttpError(400, "per_page harus antara 1 dan 100")
+    
+    _validate_image_size(image_size)
+    
+    ids, total = await sync_to_async(search_gedung)(q, per_page, (page - 1) * per_page)
+    gedungs = await sync_to_async(_gedung_summaries)(ids)
+    media_urls = await aresolve_media_urls(request, (_summary_image(g, image_size) for g in gedungs.values()))
+    
+    results = [_with_image(gedungs[gedung_id], media_urls, image_size) for gedung_id in ids if gedung_id in gedungs]
+    
+    return _trusted(request, response, {
+        'success': True,
+        'count': total,
+        'page': page,
+        'per_page': per_page,
+        'results': results
+    })
+
+
+@api.post("/gedung/batch", response={200: GedungBatchResponse, 400: ErrorResponse}, tags=["Gedung"])
+async def get_gedung_batch(request, response: HttpResponse, payload: UuidBatchRequest, image_size: str = ORIGINAL):
+    """
+    Detail banyak gedung sekaligus berdasarkan list UUID.
+    
+    Satu query uuid__in untuk gedung plus prefetch units dan gambar, jadi
+    jumlah query tidak bertambah dengan jumlah UUID.
+    
+    Parameters:
+    - uuids: List UUID gedung (1-100)
+    - image_size: Query param ukuran gambar (thumb, medium, original)
+    
+    Returns:
+    - results: map uuid -> GedungDetailSchema (null jika tidak ditemukan)
+    - not_found: list uuid yang tidak valid atau tidak ditemukan
+    """
+    parsed = _parse_uuids(payload.uuids, 100)
+    _validate_image_size(image_size)
+    
+    gedungs = [gedung async for gedung in _gedung_detail_queryset().filter(uuid__in=set(parsed.values()))]
+    media_urls = await aresolve_media_urls(
+        request, (name for gedung in gedungs for name in _gedung_media_names(gedung, image_size))
+    )
+    found = {gedung.uuid: _gedung_detail(gedung, media_urls, image_size) for gedung in gedungs}
+    
+    return _trusted(request, response, _batch_response(payload.uuids, parsed, found))
+
+
 @api.get("/gedung/{gedung_uuid}", response={200: GedungDetailSchema, 404: ErrorResponse}, tags=["Gedung"])
-def get_gedung_detail(request, gedung_uuid: str):
-    """Get detail gedung by UUID with units ordered by lantai"""
+async def get_gedung_detail(request, response: HttpResponse, gedung_uuid: str, image_size: str = ORIGINAL):
+    """
+    Get detail gedung by UUID with units ordered by lantai
+    
+    Mendukung conditional GET: ETag dihitung dari query versi yang ringan
+    sebelum prefetch, dan If-None-Match yang cocok dijawab 304.
+    
+    image_size (thumb, medium, original) memilih ukuran semua gambar.
+    """
 
     try:
         uuid.UUID(gedung_uuid)
     except ValueError:
         return 404, {"success": False, "error": "not found"}
     
+    _validate_image_size(image_size)
+    
+    etag = await sync_to_async(gedung_etag)(request, gedung_uuid, image_size)
+    if etag is None:
+        return 404, {"error": "not found"}
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    
     try:
-        gedung = Gedung.objects.annotate(
-            total_units=Count('units')
-        ).prefetch_related(
-            'images',
-            Prefetch(
-                'units',
-                queryset=Unit.objects.prefetch_related('images').order_by('lantai', 'unit_number')
-            )
-        ).get(uuid=gedung_uuid)
-        
-        # Get primary image
-        primary_img = None
-        for img in gedung.images.all():
-            if img.is_primary:
-                primary_img = request.build_absolute_uri(img.image.url)
-                break
-        
-        # Build units data
-        units_data = []
-        for unit in gedung.units.all():
-            # Get all images for this unit (not just primary)
-            unit_images = [
-                request.build_absolute_uri(img.image.url) 
-                for img in unit.images.all()
-            ]
-            
-            units_data.append({
-                'id': unit.id,
-                'uuid': str(unit.uuid),
-                'lantai': unit.lantai,
-                'unit_number': unit.unit_number,
-                'deskripsi': unit.deskripsi,
-                'alasan_blacklist': unit.alasan_blacklist,
-                'images': unit_images
-            })
-        
-        return 200, {
-            'id': gedung.id,
-            'uuid': str(gedung.uuid),
-            'nama_gedung': gedung.nama_gedung,
-            'lat': float(gedung.lat),
-            'long': float(gedung.long),
-            'alamat': gedung.alamat,
-            'total_units': gedung.total_units,
-            'primary_image': primary_img,
-            'units': units_data
-        }
+        gedung = await _gedung_detail_queryset().aget(uuid=gedung_uuid)
     except Gedung.DoesNotExist:
         return 404, {"error": "not found"}
+    
+    # Resolve semua URL gambar (gedung + semua unit) sekali jalan
+    media_urls = await aresolve_media_urls(request, _gedung_media_names(gedung, image_size))
+    return _trusted(request, response, _gedung_detail(gedung, media_urls, image_size))
+
+
+@api.post("/unit/batch", response={200: UnitBatchResponse, 400: ErrorResponse}, tags=["Unit"])
+async def get_unit_batch(request, response: HttpResponse, payload: UuidBatchRequest, image_size: str = ORIGINAL):
+    """
+    Detail banyak unit sekaligus (misalnya daftar bookmark client).
+    
+    Satu query uuid__in dengan select_related gedung/pemilik/agen plus satu
+    prefetch gambar, menggantikan satu request GET /unit/{uuid} per unit.
+    
+    Parameters:
+    - uuids: List UUID unit (1-300)
+    - image_size: Query param ukuran gambar (thumb, medium, original)
+    
+    Returns:
+    - results: map uuid -> UnitDetailResponse (null jika tidak ditemukan)
+    - not_found: list uuid yang tidak valid atau tidak ditemukan
+    """
+    parsed = _parse_uuids(payload.uuids, 300)
+    _validate_image_size(image_size)
+    
+    units = [unit async for unit in _unit_detail_queryset().filter(uuid__in=set(parsed.values()))]
+    media_urls = await aresolve_media_urls(
+        request, (img.variant_name(image_size) for unit in units for img in unit.images.all())
+    )
+    found = {unit.uuid: _unit_detail(unit, media_urls, image_size) for unit in units}
+    
+    return _trusted(request, response, _batch_response(payload.uuids, parsed, found))
+
 
 @api.get("/unit/{unit_uuid}", response={200: UnitDetailResponse, 404: ErrorResponse}, tags=["Unit"])
-def get_unit_detail(request, unit_uuid: str):
-    """Get detail unit by UUID"""
+async def get_unit_detail(request, response: HttpResponse, unit_uuid: str, image_size: str = ORIGINAL):
+    """Get detail unit by UUID (mendukung ETag / If-None-Match), gambar sesuai image_size"""
     
     # Validasi UUID
     try:
@@ -179,51 +749,226 @@ def get_unit_detail(request, unit_uuid: str):
     except ValueError:
         return 404, {"error": "not found"}
     
+    _validate_image_size(image_size)
+    
+    etag = await sync_to_async(unit_etag)(request, unit_uuid, image_size)
+    if etag is None:
+        return 404, {"error": "not found"}
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    
     try:
-        unit = Unit.objects.select_related(
-            'gedung', 'pemilik', 'agen'
-        ).prefetch_related('images').get(uuid=unit_uuid)
-        
-        # Get all images
-        unit_images = [
-            request.build_absolute_uri(img.image.url) 
-            for img in unit.images.all()
-        ]
-        
-        # Format pemilik: "Nama (Julukan)"
-        pemilik_str = None
-        if unit.pemilik:
-            if unit.pemilik.julukan:
-                pemilik_str = f"{unit.pemilik.nama} ({unit.pemilik.julukan})"
-            else:
-                pemilik_str = unit.pemilik.nama
-        
-        # Format agen: "Nama (Julukan)"
-        agen_str = None
-        if unit.agen:
-            if unit.agen.julukan:
-                agen_str = f"{unit.agen.nama} ({unit.agen.julukan})"
-            else:
-                agen_str = unit.agen.nama
-        
-        return 200, {
-            'id': unit.id,
-            'uuid': str(unit.uuid),
-            'gedung_nama': unit.gedung.nama_gedung,
-            'lantai': unit.lantai,
-            'unit_number': unit.unit_number,
-            'deskripsi': unit.deskripsi,
-            'listing_type': unit.listing_type,
-            'alasan_blacklist': unit.alasan_blacklist,
-            'pemilik': pemilik_str,
-            'agen': agen_str,
-            'images': unit_images
-        }
-        
+        unit = await _unit_detail_queryset().aget(uuid=unit_uuid)
     except Unit.DoesNotExist:
         return 404, {"error": "not found"}
+    
+    media_urls = await aresolve_media_urls(request, (img.variant_name(image_size) for img in unit.images.all()))
+    return _trusted(request, response, _unit_detail(unit, media_urls, image_size))
+
+def _screening_unit(unit):
+    return {
+        'uuid': str(unit.uuid),
+        'gedung_uuid': str(unit.gedung.uuid),
+        'gedung_nama': unit.gedung.nama_gedung,
+        'lantai': unit.lantai,
+        'unit_number': unit.unit_number,
+        'listing_type': unit.listing_type,
+        'alasan_blacklist': unit.alasan_blacklist
+    }
+
+
+async def _blacklisted_by_phone(model, normalized):
+    """Pemilik/agen blacklist dengan no_telp_normalized di normalized, beserta unitnya"""
+    units = Unit.objects.select_related('gedung').order_by('gedung_id', 'lantai', 'unit_number')
+    queryset = model.objects.filter(
+        no_telp_normalized__in=normalized, status='blacklist'
+    ).prefetch_related(Prefetch('units', queryset=units))
+    return [person async for person in queryset]
+
+
+@api.post("/screening/phone", response={200: PhoneScreeningResponse, 400: ErrorResponse}, tags=["Screening"])
+async def screen_phone_numbers(request, response: HttpResponse, payload: PhoneScreeningRequest):
+    """
+    Cek satu atau banyak nomor telepon terhadap pemilik dan agen blacklist.
+    
+    Nomor dinormalisasi (digit + kode negara) lalu dicocokkan lewat index
+    no_telp_normalized, jadi format input bebas ("+20 101...", "0101...").
+    
+    Parameters:
+    - numbers: List nomor telepon (1-100)
+    
+    Returns:
+    - Satu hasil per nomor (urutan sama dengan input) berisi pemilik/agen
+      yang cocok beserta unit-unitnya
+    """
+    if not (1 <= len(payload.numbers) <= 100):
+        raise HttpError(400, "Jumlah nomor harus antara 1 dan 100")
+    
+    normalized = {number: normalize_phone(number) for number in payload.numbers}
+    lookup = {value for value in normalized.values() if value}
+    
+    matches = {}
+    if lookup:
+        for match_type, model in (('pemilik', Pemilik), ('agen', Agen)):
+            for person in await _blacklisted_by_phone(model, lookup):
+                matches.setdefault(person.no_telp_normalized, []).append({
+                    'type': match_type,
+                    'nama': person.nama,
+                    'julukan': person.julukan,
+                    'no_telp': person.no_telp,
+                    'units': [_screening_unit(unit) for unit in person.units.all()]
+                })
+    
+    results = []
+    for number in payload.numbers:
+        number_matches = matches.get(normalized[number], [])
+        results.append({
+            'number': number,
+            'normalized': normalized[number],
+            'blacklisted': bool(number_matches),
+            'matches': number_matches
+        })
+    
+    return _trusted(request, response, {
+        'success': True,
+        'count': len(results),
+        'results': results
+    })
+
+
+@api.get("/screening/name", response={200: NameScreeningResponse, 400: ErrorResponse}, tags=["Screening"])
+async def screen_name(request, response: HttpResponse, q: str, limit: int = 10):
+    """
+    Fuzzy search pemilik dan agen berdasarkan nama atau julukan.
+    
+    Mencocokkan ejaan berbeda (mis. "Mohamed" / "Muhammad") dengan
+    similarity trigram, bukan substring.
+    
+    Parameters:
+    - q: Nama atau julukan (min 3 karakter)
+    - limit: Jumlah hasil maksimum (1-50)
+    
+    Returns:
+    - Pemilik/agen (semua status) beserta unitnya, sorted by similarity
+    """
+    q = q.strip()
+    if len(q) < 3:
+        raise HttpError(400, "q minimal 3 karakter")
+    
+    if not (1 <= limit <= 50):
+        raise HttpError(400, "limit harus antara 1 dan 50")
+    
+    units = Unit.objects.select_related('gedung').order_by('gedung_id', 'lantai', 'unit_number')
+    results = []
+    for match_type, model in (('pemilik', Pemilik), ('agen', Agen)):
+        scores = dict(await sync_to_async(fuzzy_search)(model, q, limit))
+        if not scores:
+            continue
+        queryset = model.objects.filter(id__in=scores).prefetch_related(Prefetch('units', queryset=units))
+        async for person in queryset:
+            results.append({
+                'type': match_type,
+                'nama': person.nama,
+                'julukan': person.julukan,
+                'no_telp': person.no_telp,
+                'units': [_screening_unit(unit) for unit in person.units.all()],
+                'status': person.status,
+                'score': round(scores[person.id], 3)
+            })
+    
+    results.sort(key=lambda match: -match['score'])
+    results = results[:limit]
+    
+    return _trusted(request, response, {
+        'success': True,
+        'count': len(results),
+        'query': q,
+        'results': results
+    })
+
+
+@api.get("/sync", response={200: SyncResponse, 400: ErrorResponse, 410: ErrorResponse}, tags=["Sync"])
+async def sync_changes(request, response: HttpResponse, since: str = None, limit: int = 500):
+    """
+    Delta sync untuk salinan lokal client (gedung, unit, pemilik, agen, image).
+    
+    Tanpa since: mulai sync penuh dari awal. Ulangi request dengan
+    since=next_cursor selama has_more true; simpan next_cursor terakhir
+    untuk pull berikutnya. Baris yang dihapus dikirim di deleted.
+    
+    Parameters:
+    - since: Cursor dari response sebelumnya (opsional)
+    - limit: Jumlah baris maksimum per entity per halaman (1-2000)
+    
+    Returns:
+    - Baris yang berubah per entity, tombstone, next_cursor dan has_more
+    - 410 jika cursor lebih tua dari retensi tombstone (sync penuh ulang)
+    """
+    if not (1 <= limit <= 2000):
+        raise HttpError(400, "limit harus antara 1 dan 2000")
+    
+    try:
+        page = await sync_to_async(sync_page)(since, limit)
+    except SyncCursorInvalid:
+        raise HttpError(400, "Cursor tidak valid")
+    except SyncCursorExpired as exc:
+        return 410, {"success": False, "error": str(exc)}
+    
+    media_urls = await aresolve_media_urls(request, (row['image'] for row in page['image']))
+    for row in page['image']:
+        row['image'] = media_urls.get(row['image'])
+    
+    return _trusted(request, response, {'success': True, **page})
+
+
+@api.get("/snapshot", response={404: ErrorResponse}, tags=["Sync"])
+async def download_snapshot(request):
+    """
+    Download snapshot SQLite offline terbaru (gzip).
+    
+    Berisi distrik, lokasi, gedung (dengan R*Tree gedung_rtree), unit dan
+    URL gambar utama; meta.sync_cursor bisa dipakai langsung sebagai since
+    untuk /sync. ETag = versi snapshot, If-None-Match yang cocok dijawab 304.
+    
+    Returns:
+    - File snapshot-v<versi>.sqlite3.gz
+    """
+    manifest = await sync_to_async(read_manifest)()
+    if manifest is None:
+        return 404, {"success": False, "error": "Snapshot belum tersedia"}
+    
+    etag = '"snapshot-v%s"' % manifest['version']
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    prefix = getattr(settings, 'SNAPSHOT_ACCEL_REDIRECT_PREFIX', None)
+    if prefix:
+        # nginx mengirim file langsung (location internal ke SNAPSHOT_DIR)
+        response = HttpResponse(content_type='application/gzip')
+        response['X-Accel-Redirect'] = prefix + manifest['file']
+        response['Content-Disposition'] = 'attachment; filename="%s"' % manifest['file']
+    else:
+        try:
+            file = await sync_to_async(open)(snapshot_dir() / manifest['file'], 'rb')
+        except FileNotFoundError:
+            return 404, {"success": False, "error": "Snapshot belum tersedia"}
+        response = FileResponse(file, as_attachment=True, filename=manifest['file'], content_type='application/gzip')
+    
+    response['ETag'] = etag
+    response['X-Snapshot-Version'] = str(manifest['version'])
+    response['X-Snapshot-SHA256'] = manifest['sha256']
+    return response
+
+
+@api.get("/cache/stats", tags=["System"])
+async def get_cache_stats(request):
+    """Counter hit/miss nearby cache"""
+    return {"nearby": await sync_to_async(cache_stats)()}
 
 @api.get("/health", auth=None, tags=["System"])
-def health_check(request):
+async def health_check(request):
     """Health check endpoint"""
     return {"status": "ok", "message": "API is running"}
@@ -3,4 +3,10 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.api'
\ No newline at end of file
+    name = 'apps.api'
+
+    def ready(self):
+        import apps.api.signals
+        from apps.api.ratelimit import warn_if_local_cache
+
+        warn_if_local_cache()
@@ -0,0 +1,163 @@
+import hashlib
+import time
+import uuid
+from math import floor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.api.utils import get_bounding_box, haversine_distance, split_antimeridian
+
+# Entry yang mencakup lebih dari sekian kolom region (dekat kutub) memakai
+# versi per baris region, agar jumlah key yang dibaca tetap kecil
+MAX_REGION_COLUMNS = 16
+
+# Naikkan jika bentuk entry (summary gedung) berubah agar entry lama di cache bersama tidak terbaca
+ENTRY_FORMAT = 2
+
+STATS_KEYS = {
+    'hits': 'nearby:stats:hits',
+    'misses': 'nearby:stats:misses',
+}
+
+
+def nearby_cache_enabled():
+    return getattr(settings, 'NEARBY_CACHE_ENABLED', True)
+
+
+def _grid_size():
+    return getattr(settings, 'NEARBY_CACHE_GRID', 0.002)
+
+
+def _region_size():
+    return getattr(settings, 'NEARBY_CACHE_REGION_SIZE', 0.02)
+
+
+def _region_key(row, col):
+    return f'nearby:version:{row}:{col}'
+
+
+def _region_row_key(row):
+    return f'nearby:version:{row}:*'
+
+
+def _region_of(lat, long):
+    size = _region_size()
+    return floor(lat / size), floor(long / size)
+
+
+def quantize_point(lat, long, radius):
+    """
+    Kuantisasi titik nearby ke cell grid cache.
+
+    Entry cache untuk satu cell berisi semua gedung dalam radius
+    coverage dari pusat cell, cukup untuk menjawab query dari titik mana
+    pun di dalam cell tersebut secara exact.
+
+    Returns:
+        tuple: (cell, center_lat, center_long, coverage_radius)
+    """
+    grid = _grid_size()
+    row, col = floor(lat / grid), floor(long / grid)
+    # Cell di tepi (lat 90, long 180) pusatnya bisa lewat batas koordinat
+    center_lat = min(max((row + 0.5) * grid, -90.0), 90.0)
+    center_long = min(max((col + 0.5) * grid, -180.0), 180.0)
+
+    # Jarak terjauh pusat cell ke pojok cell (+1 meter toleransi pembulatan)
+    half = grid / 2
+    corner = max(
+        haversine_distance(center_lat, 0, center_lat + half, half),
+        haversine_distance(center_lat, 0, center_lat - half, half),
+    )
+    return (row, col), center_lat, center_long, radius + corner + 1
+
+
+def entry_keys(points):
+    """
+    Cache key untuk setiap (lat, long, radius).
+
+    Key memuat versi semua region invalidasi yang tercakup entry, jadi
+    entry lama otomatis tidak terpakai setelah region-nya di-invalidate.
+    invalidated_at adalah waktu invalidasi terakhir region-region tersebut
+    (0 jika belum pernah): entry baru hanya boleh dibuat dari data yang
+    dibaca setelahnya.
+
+    Returns:
+        list: [(key, center_lat, center_long, coverage_radius, invalidated_at), ...]
+    """
+    quantized = [quantize_point(lat, long, radius) + (radius,) for lat, long, radius in points]
+
+    regions_per_point = []
+    for _, center_lat, center_long, coverage, _ in quantized:
+        bbox = get_bounding_box(center_lat, center_long, coverage)
+        region_keys = []
+        for lat_min, lat_max, lon_min, lon_max in split_antimeridian(
+            bbox['lat_min'], bbox['lat_max'], bbox['lon_min'], bbox['lon_max']
+        ):
+            row_min, col_min = _region_of(lat_min, lon_min)
+            row_max, col_max = _region_of(lat_max, lon_max)
+            if col_max - col_min + 1 > MAX_REGION_COLUMNS:
+                region_keys.extend(_region_row_key(row) for row in range(row_min, row_max + 1))
+            else:
+                region_keys.extend(
+                    _region_key(row, col)
+                    for row in range(row_min, row_max + 1)
+                    for col in range(col_min, col_max + 1)
+                )
+        regions_per_point.append(region_keys)
+
+    versions = cache.get_many({key for keys in regions_per_point for key in keys})
+
+    results = []
+    for (cell, center_lat, center_long, coverage, radius), region_keys in zip(quantized, regions_per_point):
+        region_versions = [versions.get(key, ('0', 0)) for key in region_keys]
+        version = ':'.join(token for token, _ in region_versions)
+        digest = hashlib.md5(version.encode()).hexdigest()[:12]
+        key = f'nearby:entry:v{ENTRY_FORMAT}:{cell[0]}:{cell[1]}:{radius}:{digest}'
+        results.append((key, center_lat, center_long, coverage, max((at for _, at in region_versions), default=0)))
+    return results
+
+
+def get_entries(keys):
+    return cache.get_many(keys)
+
+
+def set_entries(entries):
+    cache.set_many(entries, getattr(settings, 'NEARBY_CACHE_TIMEOUT', 300))
+
+
+def invalidate_location(lat, long):
+    """Invalidate semua entry nearby yang mencakup region koordinat ini"""
+    row, col = _region_of(lat, long)
+    # Token acak (bukan counter) agar versi tidak pernah terulang setelah eviction;
+    # waktunya dipakai worker lain untuk tahu index lokalnya sudah tertinggal
+    version = (uuid.uuid4().hex[:12], time.time())
+    cache.set_many({_region_key(row, col): version, _region_row_key(row): version}, None)
+
+
+def _incr(key, delta):
+    if not delta:
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def record_lookups(hits, misses):
+    _incr(STATS_KEYS['hits'], hits)
+    _incr(STATS_KEYS['misses'], misses)
+
+
+def cache_stats():
+    """Counter hit/miss nearby cache (gabungan semua worker jika cache shared)"""
+    values = cache.get_many(STATS_KEYS.values())
+    hits = values.get(STATS_KEYS['hits'], 0)
+    misses = values.get(STATS_KEYS['misses'], 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+    }
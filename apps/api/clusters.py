@@ -0,0 +1,125 @@
+import threading
+import time
+
+import numpy as np
+
+from django.conf import settings
+
+from apps.core.models import Gedung
+
+
+def cluster_max_zoom():
+    """Zoom mulai dari mana gedung dikirim satu per satu (tanpa cluster)"""
+    return getattr(settings, 'CLUSTER_MAX_ZOOM', 17)
+
+
+def cell_size(zoom):
+    """
+    Ukuran cell cluster (derajat) untuk satu zoom level.
+
+    Satu tile web map (256 px) selebar 360 / 2^zoom derajat dibagi
+    CLUSTER_CELLS_PER_TILE cell, jadi jumlah cell di layar kira-kira tetap
+    untuk zoom berapa pun.
+    """
+    return 360 / (2 ** zoom * getattr(settings, 'CLUSTER_CELLS_PER_TILE', 4))
+
+
+_KEY_OFFSET = 2 ** 30
+
+
+class ClusterLevel:
+    """Agregat gedung per cell grid untuk satu zoom level, diurutkan per (row, col)"""
+
+    def __init__(self, zoom, lats, longs, blacklisted):
+        size = cell_size(zoom)
+        rows = np.floor(lats / size).astype(np.int64)
+        cols = np.floor(longs / size).astype(np.int64)
+
+        # Key 1 dimensi (row di 32 bit atas) agar np.unique cepat dan hasilnya urut per (row, col)
+        keys, inverse = np.unique(((rows + _KEY_OFFSET) << 32) | (cols + _KEY_OFFSET), return_inverse=True)
+        inverse = inverse.reshape(-1)
+        counts = np.bincount(inverse, minlength=len(keys))
+
+        self.rows = (keys >> 32) - _KEY_OFFSET
+        self.cols = (keys & 0xFFFFFFFF) - _KEY_OFFSET
+        self.counts = counts
+        self.lats = np.bincount(inverse, weights=lats, minlength=len(keys)) / counts
+        self.longs = np.bincount(inverse, weights=longs, minlength=len(keys)) / counts
+        self.blacklisted = np.bincount(inverse, weights=blacklisted, minlength=len(keys)).astype(np.int64)
+        self.size = size
+
+    def query(self, lat_min, lat_max, lon_min, lon_max):
+        """
+        Cluster dengan cell yang bersinggungan bbox.
+
+        Baris cell dipotong dengan binary search (urutan row), jadi biaya
+        sebanding jumlah cell di viewport, bukan jumlah gedung.
+        """
+        row_min, row_max = np.floor(lat_min / self.size), np.floor(lat_max / self.size)
+        col_min, col_max = np.floor(lon_min / self.size), np.floor(lon_max / self.size)
+
+        start = np.searchsorted(self.rows, row_min, side='left')
+        end = np.searchsorted(self.rows, row_max, side='right')
+        cols = self.cols[start:end]
+        selected = np.flatnonzero((cols >= col_min) & (cols <= col_max)) + start
+
+        return [
+            {'lat': lat, 'long': long, 'count': count, 'blacklisted_units': blacklisted}
+            for lat, long, count, blacklisted in zip(
+                self.lats[selected].tolist(), self.longs[selected].tolist(),
+                self.counts[selected].tolist(), self.blacklisted[selected].tolist()
+            )
+        ]
+
+
+class ClusterIndex:
+    """
+    Cluster gedung yang sudah dihitung untuk setiap zoom 0..CLUSTER_MAX_ZOOM-1.
+
+    Satu instance per worker; dibuat ulang dari database saat sudah lebih
+    tua dari CLUSTER_INDEX_MAX_AGE detik atau setelah gedung/unit berubah
+    di worker ini.
+    """
+
+    def __init__(self, rows):
+        """rows: list (lat, long, blacklisted_units)"""
+        self.loaded_at = time.monotonic()
+        self.levels = {}
+        if rows:
+            lats, longs, blacklisted = (np.array(column, dtype=np.float64) for column in zip(*rows))
+            self.levels = {zoom: ClusterLevel(zoom, lats, longs, blacklisted) for zoom in range(cluster_max_zoom())}
+
+    def query(self, zoom, lat_min, lat_max, lon_min, lon_max):
+        level = self.levels.get(min(zoom, cluster_max_zoom() - 1))
+        if level is None:
+            return []
+        return level.query(lat_min, lat_max, lon_min, lon_max)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_cluster_index():
+    """Return cluster worker ini, dihitung dari database saat pertama dipakai atau sudah kedaluwarsa"""
+    global _index
+    max_age = getattr(settings, 'CLUSTER_INDEX_MAX_AGE', 300)
+
+    index = _index
+    if index is not None and time.monotonic() - index.loaded_at < max_age:
+        return index
+
+    with _index_lock:
+        index = _index
+        if index is None or time.monotonic() - index.loaded_at >= max_age:
+            rows = list(Gedung.objects.exclude(lat_float=None).values_list('lat_float', 'long_float', 'blacklisted_units'))
+            index = ClusterIndex(rows)
+            _index = index
+    return index
+
+
+def reset_cluster_index():
+    """Buang cluster worker ini; dihitung ulang saat dipakai berikutnya"""
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,99 @@
+import hashlib
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import F, Func, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from apps.api.media import url_epoch
+from apps.core.models import Gedung, Unit, Image
+
+
+def _aggregate(queryset, field, function):
+    """
+    Subquery satu nilai agregat (COUNT/MAX) dari queryset yang difilter OuterRef.
+
+    Memakai Func (bukan Aggregate) agar Django tidak menambah GROUP BY.
+    """
+    return Subquery(
+        queryset.order_by().annotate(value=Func(F(field), function=function)).values('value')[:1]
+    )
+
+
+def _make_etag(request, *parts):
+    """Strong ETag dari versi data + host (URL absolute) + periode URL media"""
+    raw = ':'.join(str(part) for part in (request.get_host(), request.scheme, url_epoch(), *parts))
+    return '"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+
+def gedung_etag(request, gedung_uuid, image_size):
+    """
+    ETag detail gedung dari updated_at gedung, unit dan semua gambarnya
+    (per image_size, karena URL gambarnya berbeda).
+
+    Dihitung dengan satu query agregat (tanpa prefetch). Jumlah baris ikut
+    dihitung agar penghapusan juga mengubah ETag.
+
+    Returns:
+        str atau None jika gedung tidak ditemukan
+    """
+    unit_type = ContentType.objects.get_for_model(Unit)
+    gedung_type = ContentType.objects.get_for_model(Gedung)
+
+    units = Unit.objects.filter(gedung=OuterRef('pk'))
+    images = Image.objects.filter(
+        Q(content_type=gedung_type, object_id=OuterRef('pk'))
+        | Q(content_type=unit_type, object_id__in=Unit.objects.filter(gedung=OuterRef(OuterRef('pk'))).values('pk'))
+    )
+
+    version = Gedung.objects.filter(uuid=gedung_uuid).annotate(
+        unit_count=Coalesce(_aggregate(units, 'pk', 'COUNT'), 0),
+        unit_updated=_aggregate(units, 'updated_at', 'MAX'),
+        image_count=Coalesce(_aggregate(images, 'pk', 'COUNT'), 0),
+        image_updated=_aggregate(images, 'updated_at', 'MAX'),
+    ).values_list('id', 'updated_at', 'unit_count', 'unit_updated', 'image_count', 'image_updated').first()
+
+    if version is None:
+        return None
+    return _make_etag(request, 'gedung', image_size, *version)
+
+
+def unit_etag(request, unit_uuid, image_size):
+    """
+    ETag detail unit dari updated_at unit, gedung, pemilik, agen dan gambarnya
+    (per image_size).
+
+    Returns:
+        str atau None jika unit tidak ditemukan
+    """
+    images = Image.objects.filter(content_type=ContentType.objects.get_for_model(Unit), object_id=OuterRef('pk'))
+
+    version = Unit.objects.filter(uuid=unit_uuid).annotate(
+        image_count=Coalesce(_aggregate(images, 'pk', 'COUNT'), 0),
+        image_updated=_aggregate(images, 'updated_at', 'MAX'),
+    ).values_list(
+        'id', 'updated_at', 'gedung__updated_at', 'pemilik__updated_at', 'agen__updated_at',
+        'image_count', 'image_updated'
+    ).first()
+
+    if version is None:
+        return None
+    return _make_etag(request, 'unit', image_size, *version)
+
+
+def etag_matches(request, etag):
+    """Cek header If-None-Match (weak comparison sesuai RFC 9110)"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    if '*' in candidates:
+        return True
+    return etag in (c.removeprefix('W/') for c in candidates)
+
+
+def not_modified(etag):
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
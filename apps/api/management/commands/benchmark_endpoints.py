@@ -0,0 +1,147 @@
+import json
+import platform
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from apps.api.media import clear_media_url_cache
+from apps.api.queries import install_query_tracker, track_queries
+from apps.api.spatial import reset_gedung_index
+from apps.api.utils import IMARAH_ALLOWED_API_KEYS
+from apps.core.models import Gedung, Unit
+
+# Batas jumlah query per request; harus konstan, tidak tumbuh dengan ukuran dataset
+QUERY_BUDGET = {
+    'search_nearby_gedung': 1,  # hydrate gedung (kandidat dari index in-memory)
+    'get_gedung_detail': 4,     # etag, gedung, units, images unit
+    'get_unit_detail': 3,       # etag, unit (+gedung/pemilik/agen), images
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark search_nearby_gedung, get_gedung_detail dan get_unit_detail pada '
+        'beberapa ukuran dataset sintetis (di test database), cek jumlah query, '
+        'dan tulis hasil sebagai JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000', help='Jumlah gedung per run, dipisah koma')
+        parser.add_argument('--requests', type=int, default=200, help='Jumlah request per endpoint')
+        parser.add_argument('--radius', type=int, default=1000)
+        parser.add_argument('--api-key', help='API key untuk request (default key pertama APIKEY_IMARAH_BLACKLIST)')
+        parser.add_argument('--output', help='File JSON hasil (default stdout)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keepdb', action='store_true', help='Jangan hapus test database setelah selesai')
+
+    def handle(self, *args, **options):
+        api_key = options['api_key'] or next(iter(sorted(IMARAH_ALLOWED_API_KEYS)), None)
+        if api_key not in IMARAH_ALLOWED_API_KEYS:
+            raise CommandError('API key tidak valid; set APIKEY_IMARAH_BLACKLIST atau --api-key')
+
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        client = Client(HTTP_X_API_KEY=api_key)
+        rng = random.Random(options['seed'])
+
+        # Selalu di test database agar data asli tidak tersentuh
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        install_query_tracker(connection)
+        runs = []
+        try:
+            with override_settings(API_RATE_LIMIT_ENABLED=False, NEARBY_CACHE_ENABLED=False):
+                for size in sizes:
+                    self.stderr.write(f'Generate dataset {size} gedung...')
+                    call_command('generate_dataset', gedung=size, clear=True, seed=options['seed'], stdout=self.stderr)
+                    runs.append(self._run(client, rng, size, options))
+        finally:
+            if not options['keepdb']:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        result = {
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'spatial_index': getattr(settings, 'GEDUNG_SPATIAL_INDEX', True),
+            'requests_per_endpoint': options['requests'],
+            'radius': options['radius'],
+            'runs': runs,
+        }
+        output = json.dumps(result, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stderr.write(self.style.SUCCESS(f"Hasil ditulis ke {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+        failures = [
+            f"{run['gedung']} gedung / {name}: {stats['max_queries']} query (batas {QUERY_BUDGET[name]})"
+            for run in runs for name, stats in run['endpoints'].items()
+            if stats['max_queries'] > QUERY_BUDGET[name]
+        ]
+        if failures:
+            raise CommandError('Jumlah query melebihi batas:\n' + '\n'.join(failures))
+
+    def _run(self, client, rng, size, options):
+        # Mulai dari keadaan dingin: index, cache URL dan cache Django dikosongkan
+        reset_gedung_index()
+        clear_media_url_cache()
+        cache.clear()
+
+        points = list(Gedung.objects.values_list('lat_float', 'long_float'))
+        gedung_uuids = list(Gedung.objects.values_list('uuid', flat=True))
+        unit_uuids = list(Unit.objects.values_list('uuid', flat=True))
+        count = options['requests']
+
+        def nearby():
+            lat, long = rng.choice(points)
+            body = {'lat': lat + rng.gauss(0, 0.002), 'long': long + rng.gauss(0, 0.002), 'radius': options['radius']}
+            return client.post('/api/gedung/nearby', json.dumps(body), content_type='application/json')
+
+        # Warm up: build spatial index sekali (bukan bagian dari latency per request)
+        nearby()
+
+        endpoints = {
+            'search_nearby_gedung': self._measure(nearby, count),
+            'get_gedung_detail': self._measure(lambda: client.get(f'/api/gedung/{rng.choice(gedung_uuids)}'), count),
+            'get_unit_detail': self._measure(lambda: client.get(f'/api/unit/{rng.choice(unit_uuids)}'), count),
+        }
+        for name, stats in endpoints.items():
+            self.stderr.write(
+                f"  {size:>7} gedung  {name:<22} p50 {stats['p50_ms']:7.2f} ms  "
+                f"p95 {stats['p95_ms']:7.2f} ms  query {stats['max_queries']}"
+            )
+        return {'gedung': size, 'units': len(unit_uuids), 'endpoints': endpoints}
+
+    @staticmethod
+    def _measure(request, count):
+        timings, queries, sizes = [], [], []
+        for _ in range(count):
+            with track_queries() as stats:
+                started = time.perf_counter()
+                response = request()
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'Request gagal: {response.status_code} {response.content[:200]!r}')
+            queries.append(stats.count)
+            sizes.append(len(response.content))
+
+        timings.sort()
+        return {
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'p50_ms': round(timings[len(timings) // 2], 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            'max_ms': round(timings[-1], 3),
+            'max_queries': max(queries),
+            'mean_queries': round(statistics.fmean(queries), 2),
+            'mean_response_bytes': round(statistics.fmean(sizes)),
+        }
@@ -0,0 +1,116 @@
+import json
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from ninja.responses import NinjaJSONEncoder
+
+from apps.api.renderers import ORJSONRenderer
+from apps.api.schemas import NearbyResponse, GedungDetailSchema
+
+
+class Command(BaseCommand):
+    help = (
+        'Ukur biaya serialisasi response API: validasi Pydantic + json.dumps (default) '
+        'vs validasi + orjson vs orjson tanpa validasi (API_TRUST_RESPONSES), '
+        'untuk response nearby 1000 gedung dan detail gedung 300 unit.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--results', type=int, default=1000, help='Jumlah gedung di response nearby')
+        parser.add_argument('--units', type=int, default=300, help='Jumlah unit di response detail gedung')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        cases = [
+            (f"nearby ({options['results']} gedung)", NearbyResponse, self._nearby_payload(rng, options['results'])),
+            (f"gedung detail ({options['units']} unit)", GedungDetailSchema, self._detail_payload(rng, options['units'])),
+        ]
+
+        renderer = ORJSONRenderer()
+        iterations = options['iterations']
+
+        for label, schema, data in cases:
+            def validate():
+                # Sama seperti yang dilakukan ninja sebelum render
+                return schema.model_validate(data).model_dump()
+
+            strategies = [
+                ('validasi + json.dumps', lambda: json.dumps(validate(), cls=NinjaJSONEncoder)),
+                ('validasi + orjson', lambda: renderer.render(None, validate(), response_status=200)),
+                ('orjson tanpa validasi', lambda: renderer.render(None, data, response_status=200)),
+            ]
+
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            baseline = None
+            for name, func in strategies:
+                size = len(func())
+                elapsed = self._measure(func, iterations)
+                baseline = baseline or elapsed
+                self.stdout.write(
+                    f"  {name:<24} {elapsed * 1000:8.2f} ms/response  "
+                    f"{baseline / elapsed:5.1f}x  ({size / 1024:.0f} KiB)"
+                )
+
+    @staticmethod
+    def _measure(func, iterations):
+        func()  # warm up
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - started) / iterations
+
+    @staticmethod
+    def _image_url(rng):
+        return f'https://media.example.com/images/{uuid.UUID(int=rng.getrandbits(128))}.jpg'
+
+    def _nearby_payload(self, rng, count):
+        results = []
+        for i in range(count):
+            results.append({
+                'id': i + 1,
+                'uuid': str(uuid.UUID(int=rng.getrandbits(128))),
+                'nama_gedung': f'Gedung {i + 1}',
+                'lat': 30.066 + rng.uniform(-0.01, 0.01),
+                'long': 31.328 + rng.uniform(-0.01, 0.01),
+                'alamat': f'Jl. Contoh No. {i + 1}, Nasr City',
+                'total_units': rng.randint(0, 40),
+                'primary_image': self._image_url(rng) if rng.random() < 0.8 else None,
+                'distance': round(rng.uniform(0, 1000), 2),
+            })
+        results.sort(key=lambda r: r['distance'])
+        return {
+            'success': True,
+            'count': len(results),
+            'radius': 1000,
+            'center_lat': 30.066,
+            'center_long': 31.328,
+            'results': results,
+        }
+
+    def _detail_payload(self, rng, count):
+        units = []
+        for i in range(count):
+            units.append({
+                'id': i + 1,
+                'uuid': str(uuid.UUID(int=rng.getrandbits(128))),
+                'lantai': i // 10,
+                'unit_number': f'{i // 10}{i % 10:02d}',
+                'deskripsi': 'Unit contoh untuk benchmark serialisasi',
+                'alasan_blacklist': 'Deposit tidak dikembalikan' if rng.random() < 0.3 else None,
+                'images': [self._image_url(rng) for _ in range(rng.randint(0, 4))],
+            })
+        return {
+            'id': 1,
+            'uuid': str(uuid.UUID(int=rng.getrandbits(128))),
+            'nama_gedung': 'Gedung Benchmark',
+            'lat': 30.066,
+            'long': 31.328,
+            'alamat': 'Jl. Contoh No. 1, Nasr City',
+            'total_units': count,
+            'primary_image': self._image_url(rng),
+            'units': units,
+        }
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from apps.api.media import storage_is_signed
+from apps.api.snapshot import build_snapshot, snapshot_dir
+from apps.core.models import Image
+
+
+class Command(BaseCommand):
+    help = (
+        'Build/update snapshot SQLite offline (distrik, lokasi, gedung + R*Tree, unit) '
+        'secara incremental dari delta sync, lalu publish sebagai file gzip.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Buang snapshot kerja dan build ulang dari awal')
+        parser.add_argument('--force', action='store_true', help='Publish versi baru walaupun tidak ada perubahan')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if storage_is_signed(Image._meta.get_field('image').storage):
+            self.stderr.write(self.style.WARNING(
+                'Storage memakai presigned URL: URL gambar di snapshot akan kedaluwarsa'
+            ))
+
+        manifest, changes = build_snapshot(full=options['full'], batch_size=options['batch_size'], force=options['force'])
+        if not changes and not options['full'] and not options['force']:
+            self.stdout.write(f"Tidak ada perubahan, snapshot tetap versi {manifest['version']}")
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot versi {manifest['version']} ({changes} perubahan, {manifest['size']} byte) "
+            f"ditulis ke {snapshot_dir() / manifest['file']}"
+        ))
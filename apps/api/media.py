@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from apps.core.models import Image
+
+
+class MediaUrlCache:
+    """
+    Cache LRU in-memory untuk URL file media, per worker.
+
+    Key adalah (storage, nama file). Untuk storage S3/R2 dengan querystring
+    auth (presigned URL), entry hanya disimpan setengah masa berlaku URL
+    agar client selalu menerima URL yang masih cukup lama valid.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # (storage_key, name) -> (url, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, url, expires_at):
+        with self._lock:
+            self._entries[key] = (url, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_url_cache = MediaUrlCache(getattr(settings, 'MEDIA_URL_CACHE_SIZE', 10000))
+
+
+def clear_media_url_cache():
+    _url_cache.clear()
+
+
+def _storage_key(storage):
+    """Identitas storage: class + bucket/custom domain/lokasi"""
+    return (
+        f'{type(storage).__module__}.{type(storage).__qualname__}',
+        getattr(storage, 'bucket_name', None) or getattr(storage, 'location', None),
+        getattr(storage, 'custom_domain', None),
+    )
+
+
+def url_ttl(storage):
+    """
+    Berapa lama (detik) URL dari storage boleh di-cache.
+
+    Return None jika URL tidak pernah kedaluwarsa.
+    """
+    if storage_is_signed(storage):
+        return getattr(storage, 'querystring_expire', 3600) // 2
+    return getattr(settings, 'MEDIA_URL_CACHE_TIMEOUT', None)
+
+
+def storage_is_signed(storage):
+    """True jika storage menghasilkan presigned URL yang bisa kedaluwarsa"""
+    return bool(getattr(storage, 'querystring_auth', False) and (
+        not getattr(storage, 'custom_domain', None) or getattr(storage, 'cloudfront_signer', None)
+    ))
+
+
+def url_epoch(storage=None):
+    """
+    Nomor periode cache URL saat ini (untuk ETag).
+
+    Berubah setiap kali URL presigned di cache sudah harus dibuat ulang,
+    sehingga response yang memuat URL lama tidak dianggap masih valid.
+    Selalu 0 untuk URL tanpa expiry.
+    """
+    storage = storage or Image._meta.get_field('image').storage
+    if not storage_is_signed(storage):
+        return 0
+    return int(time.time() // max(url_ttl(storage), 1))
+
+
+def resolve_media_url(name, storage=None):
+    """
+    URL storage untuk satu nama file, lewat cache.
+
+    Args:
+        name: nama file di storage (FieldFile.name)
+        storage: default storage field Image.image
+
+    Returns:
+        str: URL dari storage (bisa relatif untuk FileSystemStorage)
+    """
+    if not name:
+        return None
+    storage = storage or Image._meta.get_field('image').storage
+
+    key = (_storage_key(storage), name)
+    now = time.monotonic()
+    url = _url_cache.get(key, now)
+    if url is None:
+        url = storage.url(name)
+        ttl = url_ttl(storage)
+        _url_cache.set(key, url, None if ttl is None else now + ttl)
+    return url
+
+
+def resolve_media_urls(request, names, storage=None):
+    """
+    Resolve banyak nama file sekaligus jadi URL absolute.
+
+    Dipanggil sekali per response; nama yang sama hanya di-resolve sekali.
+
+    Returns:
+        dict: {name: absolute_url}
+    """
+    urls = {}
+    for name in names:
+        if name and name not in urls:
+            urls[name] = request.build_absolute_uri(resolve_media_url(name, storage))
+    return urls
+
+
+async def aresolve_media_urls(request, names, storage=None):
+    """
+    Versi async resolve_media_urls untuk view async.
+
+    URL yang sudah ada di cache langsung dipakai di event loop; hanya
+    cache miss (signing/panggilan storage) yang dijalankan di thread
+    terpisah, sekali untuk semua nama yang belum ter-cache.
+    """
+    storage = storage or Image._meta.get_field('image').storage
+    storage_key = _storage_key(storage)
+    now = time.monotonic()
+
+    urls = {}
+    missing = []
+    for name in names:
+        if not name or name in urls:
+            continue
+        url = _url_cache.get((storage_key, name), now)
+        urls[name] = url
+        if url is None:
+            missing.append(name)
+
+    if missing:
+        resolved = await sync_to_async(
+            lambda: [resolve_media_url(name, storage) for name in missing],
+            thread_sensitive=False
+        )()
+        urls.update(zip(missing, resolved))
+
+    return {name: request.build_absolute_uri(url) for name, url in urls.items()}
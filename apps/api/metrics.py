@@ -0,0 +1,146 @@
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+
+from apps.api.queries import track_queries
+
+# Label route memakai template URL (api/gedung/<gedung_uuid>), bukan path asli,
+# agar jumlah time series tetap kecil.
+REQUEST_LATENCY = Histogram(
+    'api_request_duration_seconds', 'Latency request per route',
+    ['method', 'route', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+REQUEST_SQL_QUERIES = Histogram(
+    'api_request_sql_queries', 'Jumlah query SQL per request',
+    ['method', 'route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+REQUEST_SQL_DURATION = Histogram(
+    'api_request_sql_duration_seconds', 'Total durasi query SQL per request',
+    ['method', 'route'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+RESPONSE_SIZE = Histogram(
+    'api_response_size_bytes', 'Ukuran body response',
+    ['method', 'route'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+)
+
+# Efisiensi bounding box nearby: kandidat dari bbox vs yang benar-benar dalam radius
+NEARBY_CANDIDATES_SCANNED = Counter(
+    'api_nearby_candidates_scanned', 'Kandidat gedung dari bounding box yang dihitung jaraknya'
+)
+NEARBY_CANDIDATES_MATCHED = Counter(
+    'api_nearby_candidates_matched', 'Kandidat gedung yang berada dalam radius'
+)
+
+API_KEY_REQUESTS = Counter(
+    'api_key_requests', 'Request per API key (id = hash key)',
+    ['key_id', 'outcome']
+)
+
+
+def metrics_enabled():
+    return getattr(settings, 'API_METRICS_ENABLED', True)
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.route or match.view_name or 'unknown'
+
+
+def _response_size(response):
+    if getattr(response, 'streaming', False):
+        return None
+    return len(response.content)
+
+
+class MetricsMiddleware:
+    """
+    Catat latency, jumlah/durasi query SQL dan ukuran response per route.
+
+    Mendukung request sync (admin) maupun async (API) tanpa memaksa
+    Django berpindah mode.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not metrics_enabled():
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with track_queries() as queries:
+            response = self.get_response(request)
+        self._observe(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        if not metrics_enabled():
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        with track_queries() as queries:
+            response = await self.get_response(request)
+        self._observe(request, response, time.perf_counter() - started, queries)
+        return response
+
+    @staticmethod
+    def _observe(request, response, duration, queries):
+        route = _route(request)
+        if route == 'metrics':
+            # Scrape Prometheus sendiri tidak dicatat
+            return
+
+        method = request.method
+        REQUEST_LATENCY.labels(method, route, str(response.status_code)).observe(duration)
+        REQUEST_SQL_QUERIES.labels(method, route).observe(queries.count)
+        REQUEST_SQL_DURATION.labels(method, route).observe(queries.duration)
+
+        size = _response_size(response)
+        if size is not None:
+            RESPONSE_SIZE.labels(method, route).observe(size)
+
+
+def metrics_view(request):
+    """
+    Endpoint scrape Prometheus.
+
+    Dengan PROMETHEUS_MULTIPROC_DIR (diset di gunicorn.conf.py) metrics
+    semua worker digabung dari file di direktori tersebut. Request harus
+    membawa header Authorization: Bearer <METRICS_TOKEN>; tanpa
+    METRICS_TOKEN endpoint hanya terbuka saat DEBUG.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
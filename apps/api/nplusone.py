@@ -0,0 +1,121 @@
+import logging
+import traceback
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from apps.api.queries import track_queries
+
+logger = logging.getLogger(__name__)
+
+
+class NPlusOneError(AssertionError):
+    """Query yang sama (hanya beda parameter) dijalankan berulang dalam satu request"""
+
+
+def detection_enabled():
+    return getattr(settings, 'N_PLUS_ONE_DETECTION', False)
+
+
+def _threshold():
+    return getattr(settings, 'N_PLUS_ONE_THRESHOLD', 5)
+
+
+def _app_stack():
+    """Stack trace tanpa frame Django/library, agar baris pemicu langsung terlihat"""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename
+    ]
+    return ''.join(traceback.format_list(frames))
+
+
+class NPlusOneDetector:
+    """
+    Collector query (lihat track_queries) yang mengelompokkan SQL per template.
+
+    SQL dari execute wrapper masih memakai placeholder parameter, jadi
+    query yang hanya berbeda parameter punya string yang sama. Template
+    yang dijalankan >= threshold kali dianggap N+1; stack trace diambil
+    sekali, saat threshold tercapai.
+    """
+
+    def __init__(self, label, threshold=None):
+        self.label = label
+        self.threshold = threshold or _threshold()
+        self.counts = {}
+        self.stacks = {}
+
+    def record(self, sql, duration):
+        count = self.counts.get(sql, 0) + 1
+        self.counts[sql] = count
+        if count == self.threshold:
+            self.stacks[sql] = _app_stack()
+
+    @property
+    def offenders(self):
+        """List (sql, jumlah eksekusi, stack trace) yang melewati threshold"""
+        return [(sql, self.counts[sql], stack) for sql, stack in self.stacks.items()]
+
+    def report(self):
+        """Log setiap offender; raise NPlusOneError jika N_PLUS_ONE_RAISE aktif"""
+        offenders = self.offenders
+        for sql, count, stack in offenders:
+            logger.warning(
+                'Kemungkinan N+1 di %s: query dijalankan %d kali\n  %s\nDipicu dari:\n%s',
+                self.label, count, sql, stack
+            )
+        if offenders and getattr(settings, 'N_PLUS_ONE_RAISE', False):
+            raise NPlusOneError(
+                f'{len(offenders)} query berulang di {self.label}: '
+                + '; '.join(f'{count}x {sql[:120]}' for sql, count, _ in offenders)
+            )
+
+
+@contextmanager
+def detect_n_plus_one(label='block', threshold=None):
+    """
+    Context manager untuk memeriksa N+1 di sebuah blok kode (mis. di test).
+
+    Selalu aktif tanpa melihat N_PLUS_ONE_DETECTION.
+    """
+    detector = NPlusOneDetector(label, threshold)
+    with track_queries(detector):
+        yield detector
+    detector.report()
+
+
+class NPlusOneMiddleware:
+    """
+    Deteksi N+1 per request (API dan admin), opt-in lewat N_PLUS_ONE_DETECTION.
+
+    Offender di-log dengan stack trace; dengan N_PLUS_ONE_RAISE (settings
+    test) request gagal dengan NPlusOneError sehingga test ikut gagal.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not detection_enabled():
+            return self.get_response(request)
+
+        with detect_n_plus_one(f'{request.method} {request.path}'):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not detection_enabled():
+            return await self.get_response(request)
+
+        with detect_n_plus_one(f'{request.method} {request.path}'):
+            return await self.get_response(request)
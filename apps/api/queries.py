@@ -0,0 +1,58 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class QueryStats:
+    """Jumlah dan total durasi query SQL selama satu request / blok kode"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+
+
+_active = ContextVar('query_collectors', default=())
+
+
+@contextmanager
+def track_queries(collector=None):
+    """
+    Kumpulkan statistik semua query SQL di dalam blok ini.
+
+    Memakai ContextVar sehingga query yang dijalankan lewat sync_to_async
+    (thread lain, context yang sama) ikut tercatat, dan request async yang
+    berjalan bersamaan tidak saling tercampur.
+
+    Yields:
+        collector (default QueryStats baru) yang dipanggil record(sql, duration)
+    """
+    collector = collector or QueryStats()
+    token = _active.set(_active.get() + (collector,))
+    try:
+        yield collector
+    finally:
+        _active.reset(token)
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    collectors = _active.get()
+    if not collectors:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        for collector in collectors:
+            collector.record(sql, duration)
+
+
+def install_query_tracker(connection):
+    """Pasang wrapper pencatat query di koneksi database (dipanggil dari signal connection_created)"""
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from math import ceil, floor
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Backend cache yang isinya per proses: setiap worker punya bucket sendiri,
+# sehingga limit efektif = limit x jumlah worker
+LOCAL_CACHE_BACKENDS = frozenset({
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+})
+
+class RateLimitExceeded(Exception):
+    """API key melewati rate limit atau kuota harian (dijawab 429)"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = max(1, ceil(retry_after))
+
+
+def shared_cache():
+    """True jika cache default dipakai bersama semua worker (mis. Redis)"""
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def rate_limit_enabled():
+    """Rate limit hanya jalan di atas cache bersama, lihat warn_if_local_cache()"""
+    return getattr(settings, 'API_RATE_LIMIT_ENABLED', True) and shared_cache()
+
+
+def warn_if_local_cache():
+    """Dipanggil saat startup (ApiConfig.ready)"""
+    configured = getattr(settings, 'API_RATE_LIMIT_DEFAULT', None) or getattr(settings, 'API_RATE_LIMITS', {})
+    if getattr(settings, 'API_RATE_LIMIT_ENABLED', True) and configured and not shared_cache():
+        logger.warning(
+            "Rate limit API dimatikan: cache %s tidak dipakai bersama antar worker. "
+            "Set REDIS_URL agar API_RATE_LIMITS berlaku.",
+            settings.CACHES['default']['BACKEND']
+        )
+
+
+def key_limits(api_key):
+    """
+    Limit untuk satu API key: API_RATE_LIMITS[api_key], atau
+    API_RATE_LIMIT_DEFAULT untuk key yang tidak terdaftar.
+
+    Returns:
+        dict: {'rate': request/detik, 'burst': kapasitas, 'daily_quota': int atau None},
+        atau None jika key tidak dibatasi
+    """
+    limits = getattr(settings, 'API_RATE_LIMITS', {}).get(api_key)
+    if limits is None:
+        limits = getattr(settings, 'API_RATE_LIMIT_DEFAULT', None)
+    return limits
+
+
+def api_key_id(api_key):
+    """Identitas key di cache (hash, agar API key asli tidak tersimpan di cache)"""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+async def _incr(key, timeout):
+    """Increment atomic dengan expiry; key dibuat dulu dengan add() bila belum ada"""
+    await cache.aadd(key, 0, timeout)
+    try:
+        return await cache.aincr(key)
+    except ValueError:
+        # Key expired di antara add() dan incr()
+        await cache.aset(key, 1, timeout)
+        return 1
+
+
+async def check_rate_limit(api_key):
+    """
+    Catat satu request untuk API key dan tolak jika melewati limit.
+
+    Token bucket (rate per detik, kapasitas burst) diaproksimasi dengan
+    sliding window counter sepanjang burst / rate detik, sehingga cukup
+    memakai cache.incr yang atomic (aman dipakai banyak worker dengan Redis).
+    Kuota harian dihitung per hari UTC.
+
+    Raises:
+        RateLimitExceeded: dengan retry_after dalam detik
+    """
+    limits = key_limits(api_key)
+    if not limits:
+        return
+    key_id = api_key_id(api_key)
+    now = time.time()
+
+    rate, burst = limits.get('rate'), limits.get('burst')
+    if rate and burst:
+        window = burst / rate
+        current = floor(now / window)
+        elapsed = now / window - current
+
+        count = await _incr(f'ratelimit:window:{key_id}:{current}', ceil(window * 2) + 1)
+        previous = await cache.aget(f'ratelimit:window:{key_id}:{current - 1}', 0)
+
+        # Request window sebelumnya dihitung proporsional sisa overlap-nya
+        if previous * (1 - elapsed) + count > burst:
+            raise RateLimitExceeded(
+                f"Rate limit terlampaui ({rate}/detik, burst {burst})",
+                retry_after=(1 - elapsed) * window if count > burst else 1 / rate
+            )
+
+    quota = limits.get('daily_quota')
+    if quota:
+        today = datetime.fromtimestamp(now, timezone.utc)
+        used = await _incr(f'ratelimit:quota:{key_id}:{today:%Y%m%d}', 2 * 24 * 3600)
+        if used > quota:
+            tomorrow = (today + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+            raise RateLimitExceeded(
+                f"Kuota harian terlampaui ({quota} request/hari)",
+                retry_after=(tomorrow - today).total_seconds()
+            )
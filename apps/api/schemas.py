@@ -1,5 +1,5 @@
 from ninja import Schema
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 
 class NearbyRequest(Schema):
@@ -7,6 +7,7 @@ class NearbyRequest(Schema):
     lat: float
     long: float
     radius: int  # dalam meter, 1-1000
+    limit: Optional[int] = None  # maksimal jumlah hasil terdekat, 1-1000
     
     class Config:
         json_schema_extra = {
@@ -51,6 +52,55 @@ class NearbyResponse(Schema):
     results: List[GedungSchema]
 
 
+class NearbyBatchRequest(Schema):
+    """Request schema untuk nearby search banyak titik sekaligus"""
+    points: List[NearbyRequest]
+
+
+class NearbyBatchResponse(Schema):
+    """Response schema untuk batch nearby search (satu hasil per titik)"""
+    success: bool
+    count: int
+    results: List[NearbyResponse]
+
+
+class NearestResponse(Schema):
+    """Response schema untuk k-nearest search"""
+    success: bool
+    count: int
+    k: int
+    center_lat: float
+    center_long: float
+    results: List[GedungSchema]
+
+
+class GedungSearchResponse(Schema):
+    """Response schema untuk full-text search gedung"""
+    success: bool
+    count: int  # total hasil, bukan hanya halaman ini
+    page: int
+    per_page: int
+    results: List[GedungBaseSchema]
+
+
+class ClusterSchema(Schema):
+    """Agregat gedung dalam satu cell grid"""
+    lat: float  # centroid
+    long: float
+    count: int
+    blacklisted_units: int
+
+
+class ClusterResponse(Schema):
+    """Response schema untuk cluster peta; clustered false berarti gedung dikirim satu per satu"""
+    success: bool
+    zoom: int
+    clustered: bool
+    count: int
+    clusters: List[ClusterSchema] = []
+    gedung: List[GedungBaseSchema] = []
+
+
 class UnitDetailSchema(Schema):
     """Schema untuk unit detail di dalam gedung"""
     id: int
@@ -77,6 +127,147 @@ class UnitDetailResponse(Schema):
     images: List[str] = []
 
 
+class UuidBatchRequest(Schema):
+    """Request schema untuk lookup banyak gedung/unit berdasarkan UUID"""
+    uuids: List[str]
+
+
+class GedungBatchResponse(Schema):
+    """Response schema batch gedung: map uuid -> detail (null jika tidak ditemukan)"""
+    success: bool
+    count: int
+    results: Dict[str, Optional[GedungDetailSchema]]
+    not_found: List[str] = []
+
+
+class UnitBatchResponse(Schema):
+    """Response schema batch unit: map uuid -> detail (null jika tidak ditemukan)"""
+    success: bool
+    count: int
+    results: Dict[str, Optional[UnitDetailResponse]]
+    not_found: List[str] = []
+
+
+class PhoneScreeningRequest(Schema):
+    """Request schema untuk screening nomor telepon (satu atau banyak nomor)"""
+    numbers: List[str]
+
+
+class ScreeningUnitSchema(Schema):
+    """Unit milik/dipegang pemilik atau agen yang cocok"""
+    uuid: str
+    gedung_uuid: str
+    gedung_nama: Optional[str]
+    lantai: int
+    unit_number: str
+    listing_type: str
+    alasan_blacklist: Optional[str] = None
+
+
+class ScreeningMatchSchema(Schema):
+    """Pemilik/agen blacklist dengan nomor telepon yang cocok"""
+    type: str  # 'pemilik' atau 'agen'
+    nama: str
+    julukan: Optional[str] = None
+    no_telp: Optional[str] = None
+    units: List[ScreeningUnitSchema] = []
+
+
+class PhoneScreeningResult(Schema):
+    """Hasil screening satu nomor"""
+    number: str
+    normalized: Optional[str]
+    blacklisted: bool
+    matches: List[ScreeningMatchSchema] = []
+
+
+class PhoneScreeningResponse(Schema):
+    """Response schema untuk screening nomor telepon"""
+    success: bool
+    count: int
+    results: List[PhoneScreeningResult]
+
+
+class NameScreeningMatchSchema(ScreeningMatchSchema):
+    """Pemilik/agen dengan nama atau julukan yang mirip query"""
+    status: str
+    score: float  # similarity trigram 0-1
+
+
+class NameScreeningResponse(Schema):
+    """Response schema untuk fuzzy screening nama"""
+    success: bool
+    count: int
+    query: str
+    results: List[NameScreeningMatchSchema]
+
+
+class SyncGedungSchema(Schema):
+    id: int
+    uuid: str
+    nama_gedung: Optional[str]
+    alamat: str
+    total_units: int
+    blacklisted_units: int
+    updated_at: str
+    lat: Optional[float]
+    long: Optional[float]
+    lokasi_nama: str
+    distrik_nama: str
+
+
+class SyncUnitSchema(Schema):
+    id: int
+    uuid: str
+    gedung_id: int
+    lantai: int
+    unit_number: str
+    deskripsi: str
+    listing_type: str
+    alasan_blacklist: Optional[str]
+    pemilik_id: Optional[int]
+    agen_id: Optional[int]
+    updated_at: str
+
+
+class SyncPersonSchema(Schema):
+    id: int
+    nama: str
+    julukan: Optional[str]
+    no_telp: Optional[str]
+    status: str
+    updated_at: str
+
+
+class SyncImageSchema(Schema):
+    id: int
+    object_id: int
+    image: Optional[str]  # URL absolute
+    is_primary: bool
+    updated_at: str
+    owner: str  # 'gedung' atau 'unit'
+
+
+class SyncTombstoneSchema(Schema):
+    model: str  # 'gedung', 'unit', 'pemilik', 'agen' atau 'image'
+    object_id: int
+    uuid: Optional[str]
+    deleted_at: str
+
+
+class SyncResponse(Schema):
+    """Response schema untuk delta sync; ulangi dengan since=next_cursor selama has_more"""
+    success: bool
+    has_more: bool
+    next_cursor: str
+    gedung: List[SyncGedungSchema]
+    unit: List[SyncUnitSchema]
+    pemilik: List[SyncPersonSchema]
+    agen: List[SyncPersonSchema]
+    image: List[SyncImageSchema]
+    deleted: List[SyncTombstoneSchema]
+
+
 class ErrorResponse(Schema):
     """Error response schema"""
     success: bool = False
@@ -0,0 +1,121 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from apps.api.cache import invalidate_location
+from apps.api.queries import install_query_tracker
+from apps.api.spatial import get_loaded_gedung_index
+from apps.api.clusters import reset_cluster_index
+from apps.core.models import Gedung, Unit, Image
+
+
+@receiver(post_save, sender=Gedung)
+def update_gedung_index(sender, instance, **kwargs):
+    """
+    Update koordinat gedung di spatial index worker ini setelah commit
+    """
+    gedung_id, lat, long = instance.id, instance.lat_float, instance.long_float
+
+    def _apply():
+        index = get_loaded_gedung_index()
+        if index is not None:
+            index.upsert(gedung_id, lat, long)
+
+    transaction.on_commit(_apply)
+
+
+@receiver(post_delete, sender=Gedung)
+def remove_gedung_from_index(sender, instance, **kwargs):
+    """
+    Hapus gedung dari spatial index worker ini setelah commit
+    """
+    gedung_id = instance.id
+
+    def _apply():
+        index = get_loaded_gedung_index()
+        if index is not None:
+            index.remove(gedung_id)
+
+    transaction.on_commit(_apply)
+
+
+@receiver(post_save, sender=Gedung)
+@receiver(post_delete, sender=Gedung)
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+def invalidate_cluster_index(sender, **kwargs):
+    """
+    Koordinat / jumlah unit blacklist berubah: hitung ulang cluster worker ini setelah commit
+    """
+    transaction.on_commit(reset_cluster_index)
+
+
+# Invalidasi nearby cache
+
+def _invalidate_locations(locations):
+    """Invalidate region nearby cache untuk koordinat (lat, long) setelah commit"""
+    locations = {loc for loc in locations if None not in loc}
+
+    def _apply():
+        for lat, long in locations:
+            invalidate_location(lat, long)
+
+    if locations:
+        transaction.on_commit(_apply)
+
+
+def _gedung_locations(gedung_ids):
+    return Gedung.objects.filter(id__in=gedung_ids).values_list('lat_float', 'long_float')
+
+
+@receiver(pre_save, sender=Gedung)
+def remember_gedung_location(sender, instance, **kwargs):
+    """
+    Simpan koordinat lama agar region asal ikut di-invalidate saat gedung dipindah
+    """
+    instance._previous_location = None
+    if instance.pk:
+        instance._previous_location = _gedung_locations([instance.pk]).first()
+
+
+@receiver(post_save, sender=Gedung)
+@receiver(post_delete, sender=Gedung)
+def invalidate_gedung_cache(sender, instance, **kwargs):
+    locations = [(instance.lat_float, instance.long_float)]
+    if getattr(instance, '_previous_location', None):
+        locations.append(instance._previous_location)
+    _invalidate_locations(locations)
+
+
+@receiver(pre_save, sender=Unit)
+def remember_unit_gedung(sender, instance, **kwargs):
+    """
+    Simpan gedung lama agar jumlah unit di gedung asal ikut di-invalidate
+    """
+    instance._previous_gedung_id = (getattr(instance, '_counted_state', None) or (None, None))[0]
+
+
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+def invalidate_unit_cache(sender, instance, **kwargs):
+    gedung_ids = {instance.gedung_id, getattr(instance, '_previous_gedung_id', None)} - {None}
+    _invalidate_locations(_gedung_locations(gedung_ids))
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+def invalidate_image_cache(sender, instance, **kwargs):
+    model = instance.content_type.model
+    if model == 'gedung':
+        gedung_ids = [instance.object_id]
+    elif model == 'unit':
+        gedung_ids = Unit.objects.filter(pk=instance.object_id).values_list('gedung_id', flat=True)
+    else:
+        return
+    _invalidate_locations(_gedung_locations(gedung_ids))
+
+
+@receiver(connection_created)
+def track_connection_queries(sender, connection, **kwargs):
+    """Catat jumlah/durasi query di setiap koneksi baru (untuk metrics per request)"""
+    install_query_tracker(connection)
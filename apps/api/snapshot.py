@@ -0,0 +1,279 @@
+"""
+Snapshot SQLite read-only dataset publik untuk client offline.
+
+Berisi distrik, lokasi, gedung (+ R*Tree koordinat), unit dan URL gambar
+utama. Snapshot kerja (tidak terkompresi) disimpan di SNAPSHOT_DIR dan
+di-update incremental lewat delta sync (apps/api/sync.py); setiap build
+yang ada perubahannya dipublish sebagai file gzip baru + manifest.
+
+Query nearby offline dengan semantik sama seperti /gedung/nearby:
+bounding box (get_bounding_box) di gedung_rtree, lalu filter haversine
+<= radius dengan earth_radius dari tabel meta, urut dari yang terdekat.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.api.media import resolve_media_url
+from apps.api.sync import sync_page
+from apps.api.utils import EARTH_RADIUS
+from apps.core.models import Distrik, Lokasi, Gedung, Unit
+
+# Naikkan jika struktur tabel berubah: snapshot kerja lama di-rebuild penuh
+SCHEMA_VERSION = 1
+
+MANIFEST_NAME = 'snapshot.json'
+WORKING_NAME = 'snapshot.sqlite3'
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE distrik (id INTEGER PRIMARY KEY, nama TEXT NOT NULL, kode TEXT);
+CREATE TABLE lokasi (id INTEGER PRIMARY KEY, distrik_id INTEGER NOT NULL, nama TEXT NOT NULL);
+CREATE TABLE gedung (
+    id INTEGER PRIMARY KEY,
+    uuid TEXT NOT NULL UNIQUE,
+    lokasi_id INTEGER NOT NULL,
+    nama_gedung TEXT,
+    alamat TEXT NOT NULL,
+    lat REAL NOT NULL,
+    long REAL NOT NULL,
+    total_units INTEGER NOT NULL,
+    blacklisted_units INTEGER NOT NULL,
+    primary_image_id INTEGER,
+    primary_image TEXT
+);
+CREATE INDEX gedung_lokasi_idx ON gedung (lokasi_id);
+CREATE INDEX gedung_primary_image_idx ON gedung (primary_image_id);
+CREATE VIRTUAL TABLE gedung_rtree USING rtree(id, min_lat, max_lat, min_long, max_long);
+CREATE TABLE unit (
+    id INTEGER PRIMARY KEY,
+    uuid TEXT NOT NULL UNIQUE,
+    gedung_id INTEGER NOT NULL,
+    lantai INTEGER NOT NULL,
+    unit_number TEXT NOT NULL,
+    deskripsi TEXT NOT NULL,
+    listing_type TEXT NOT NULL,
+    alasan_blacklist TEXT,
+    primary_image_id INTEGER,
+    primary_image TEXT
+);
+CREATE INDEX unit_gedung_idx ON unit (gedung_id, lantai, unit_number);
+CREATE INDEX unit_primary_image_idx ON unit (primary_image_id);
+"""
+
+
+def snapshot_dir():
+    return Path(getattr(settings, 'SNAPSHOT_DIR', settings.BASE_DIR / 'snapshots'))
+
+
+def read_manifest():
+    """Manifest snapshot terakhir yang dipublish, atau None"""
+    try:
+        with open(snapshot_dir() / MANIFEST_NAME) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _image_url(name):
+    """URL absolute gambar (URL relatif FileSystemStorage diprefix SNAPSHOT_MEDIA_BASE_URL)"""
+    url = resolve_media_url(name)
+    base_url = getattr(settings, 'SNAPSHOT_MEDIA_BASE_URL', None)
+    if url and base_url:
+        url = urljoin(base_url, url)
+    return url
+
+
+def _open_working(path, full):
+    """Buka snapshot kerja; buat baru jika belum ada, --full, atau schema-nya lama"""
+    if not full and path.exists():
+        db = sqlite3.connect(path)
+        try:
+            row = db.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        except sqlite3.DatabaseError:
+            row = None
+        if row and int(row[0]) == SCHEMA_VERSION:
+            return db, False
+        db.close()
+
+    path.unlink(missing_ok=True)
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    _set_meta(db, schema_version=SCHEMA_VERSION, version=0, earth_radius=EARTH_RADIUS)
+    return db, True
+
+
+def _get_meta(db, key, default=None):
+    row = db.execute('SELECT value FROM meta WHERE key = ?', [key]).fetchone()
+    return row[0] if row else default
+
+
+def _set_meta(db, **values):
+    db.executemany(
+        'INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value',
+        [(key, str(value)) for key, value in values.items()]
+    )
+
+
+def _replace_locations(db):
+    """Distrik dan lokasi kecil: selalu ditulis ulang penuh"""
+    db.execute('DELETE FROM lokasi')
+    db.execute('DELETE FROM distrik')
+    db.executemany('INSERT INTO distrik VALUES (?, ?, ?)', Distrik.objects.values_list('id', 'nama', 'kode').iterator())
+    db.executemany('INSERT INTO lokasi VALUES (?, ?, ?)', Lokasi.objects.values_list('id', 'distrik_id', 'nama').iterator())
+
+
+def _upsert_gedung(db, gedung_ids):
+    rows = []
+    for gedung in Gedung.objects.filter(id__in=gedung_ids).values_list(
+        'id', 'uuid', 'lokasi_id', 'nama_gedung', 'alamat', 'lat_float', 'long_float',
+        'total_units', 'blacklisted_units', 'primary_image_id', 'primary_image__image'
+    ):
+        *fields, image_name = gedung
+        fields[1] = str(fields[1])
+        rows.append((*fields, _image_url(image_name)))
+
+    db.executemany('INSERT OR REPLACE INTO gedung VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    db.executemany('DELETE FROM gedung_rtree WHERE id = ?', [(row[0],) for row in rows])
+    db.executemany(
+        'INSERT INTO gedung_rtree VALUES (?, ?, ?, ?, ?)',
+        [(row[0], row[5], row[5], row[6], row[6]) for row in rows]
+    )
+
+
+def _upsert_units(db, unit_ids):
+    rows = []
+    for unit in Unit.objects.filter(id__in=unit_ids).values_list(
+        'id', 'uuid', 'gedung_id', 'lantai', 'unit_number', 'deskripsi', 'listing_type',
+        'alasan_blacklist', 'primary_image_id', 'primary_image__image'
+    ):
+        *fields, image_name = unit
+        fields[1] = str(fields[1])
+        rows.append((*fields, _image_url(image_name)))
+
+    db.executemany('INSERT OR REPLACE INTO unit VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+
+def _apply_page(db, page):
+    """Terapkan satu halaman delta sync ke snapshot kerja"""
+    _upsert_gedung(db, [row['id'] for row in page['gedung']])
+    _upsert_units(db, [row['id'] for row in page['unit']])
+
+    # Gambar utama yang diganti filenya / dihapus tidak mengubah updated_at gedung/unit
+    for row in page['image']:
+        url = _image_url(row['image'])
+        for table in ('gedung', 'unit'):
+            db.execute(f'UPDATE {table} SET primary_image = ? WHERE primary_image_id = ?', [url, row['id']])
+
+    for tombstone in page['deleted']:
+        model, object_id = tombstone['model'], tombstone['object_id']
+        if model == 'gedung':
+            db.execute('DELETE FROM gedung WHERE id = ?', [object_id])
+            db.execute('DELETE FROM gedung_rtree WHERE id = ?', [object_id])
+            db.execute('DELETE FROM unit WHERE gedung_id = ?', [object_id])
+        elif model == 'unit':
+            db.execute('DELETE FROM unit WHERE id = ?', [object_id])
+        elif model == 'image':
+            for table in ('gedung', 'unit'):
+                db.execute(
+                    f'UPDATE {table} SET primary_image_id = NULL, primary_image = NULL WHERE primary_image_id = ?',
+                    [object_id]
+                )
+
+    return sum(len(page[name]) for name in ('gedung', 'unit', 'image', 'deleted'))
+
+
+def _publish(db, directory, version):
+    """Salin snapshot kerja (backup API, konsisten), kompres gzip, tulis manifest"""
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        copy_path = Path(tmp) / 'snapshot.sqlite3'
+        copy = sqlite3.connect(copy_path)
+        db.backup(copy)
+        copy.execute('VACUUM')
+        copy.close()
+
+        filename = f'snapshot-v{version}.sqlite3.gz'
+        gz_path = Path(tmp) / filename
+        digest = hashlib.sha256()
+        with open(copy_path, 'rb') as src, open(gz_path, 'wb') as raw:
+            # mtime=0 agar hasil kompresi deterministik
+            with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        with open(gz_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        os.replace(gz_path, directory / filename)
+
+    manifest = {
+        'version': version,
+        'schema_version': SCHEMA_VERSION,
+        'generated_at': _get_meta(db, 'generated_at'),
+        'file': filename,
+        'size': (directory / filename).stat().st_size,
+        'sha256': digest.hexdigest(),
+    }
+    manifest_tmp = directory / f'{MANIFEST_NAME}.tmp'
+    manifest_tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(manifest_tmp, directory / MANIFEST_NAME)
+
+    # Simpan satu versi sebelumnya untuk download yang sedang berjalan
+    keep = {filename, f'snapshot-v{version - 1}.sqlite3.gz'}
+    for old in directory.glob('snapshot-v*.sqlite3.gz'):
+        if old.name not in keep:
+            old.unlink(missing_ok=True)
+    return manifest
+
+
+def build_snapshot(full=False, batch_size=2000, force=False):
+    """
+    Update snapshot kerja dari delta sync sejak build terakhir, lalu publish.
+
+    Build pertama (atau full=True) membaca semua baris lewat jalur yang
+    sama dari cursor kosong. Jika tidak ada perubahan, versi lama tetap
+    dipakai kecuali force=True.
+
+    Returns:
+        tuple: (manifest, jumlah perubahan yang diterapkan)
+    """
+    directory = snapshot_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    db, created = _open_working(directory / WORKING_NAME, full)
+    try:
+        cursor = _get_meta(db, 'sync_cursor')
+        changes = 0
+        with db:
+            while True:
+                page = sync_page(cursor, batch_size)
+                changes += _apply_page(db, page)
+                cursor = page['next_cursor']
+                if not page['has_more']:
+                    break
+
+            _replace_locations(db)
+            _set_meta(db, sync_cursor=cursor)
+
+        manifest = read_manifest()
+        if not (changes or created or force) and manifest and manifest['version'] == int(_get_meta(db, 'version')):
+            return manifest, 0
+
+        with db:
+            # Snapshot kerja yang dibuat ulang tetap melanjutkan nomor versi yang sudah dipublish
+            version = max(int(_get_meta(db, 'version')), manifest['version'] if manifest else 0) + 1
+            _set_meta(
+                db, version=version, generated_at=timezone.now().isoformat(),
+                gedung_count=db.execute('SELECT COUNT(*) FROM gedung').fetchone()[0],
+                unit_count=db.execute('SELECT COUNT(*) FROM unit').fetchone()[0],
+            )
+        return _publish(db, directory, version), changes
+    finally:
+        db.close()
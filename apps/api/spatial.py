@@ -0,0 +1,459 @@
+import logging
+import threading
+import time
+from math import ceil, floor, radians, cos, sin, asin, pi
+
+import numpy as np
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from apps.api.utils import get_bounding_box, haversine_distances, split_antimeridian, EARTH_RADIUS
+from apps.core.models import Gedung
+from apps.core.utils import geocell_ranges
+
+logger = logging.getLogger(__name__)
+
+
+class GedungGridIndex:
+    """
+    Spatial index in-memory (uniform grid) untuk koordinat gedung.
+
+    Setiap worker menyimpan satu instance. Koordinat disimpan sebagai float
+    dan dikelompokkan per cell grid, sehingga pencarian bounding box hanya
+    membaca cell yang bersinggungan tanpa menyentuh database. Isi tiap cell
+    di-cache sebagai NumPy array agar kandidat bisa diambil tanpa loop per
+    gedung.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.loaded_at = None
+        self.synced_at = None  # time.time() saat data dibaca dari database
+        self._journal = None  # perubahan lokal selama rebuild background (lihat replay)
+        self._points = {}  # gedung_id -> (lat, long, cell)
+        self._cells = {}   # (row, col) -> set(gedung_id)
+        self._arrays = {}  # (row, col) -> (ids, lats, longs), dibuat saat dibutuhkan
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, lat, long):
+        return (floor(lat / self.cell_size), floor(long / self.cell_size))
+
+    def load(self, rows, synced_at=None):
+        """
+        Rebuild seluruh index dari iterable (id, lat, long).
+
+        synced_at: waktu (time.time()) sebelum rows dibaca dari database
+        """
+        points = {}
+        cells = {}
+        for gedung_id, lat, long in rows:
+            lat, long = float(lat), float(long)
+            cell = self._cell(lat, long)
+            points[gedung_id] = (lat, long, cell)
+            cells.setdefault(cell, set()).add(gedung_id)
+
+        with self._lock:
+            self._points = points
+            self._cells = cells
+            self._arrays = {}
+            self.loaded_at = time.monotonic()
+            self.synced_at = synced_at if synced_at is not None else time.time()
+
+    def start_journal(self):
+        """Mulai mencatat upsert/remove agar bisa diterapkan ulang ke index pengganti"""
+        with self._lock:
+            self._journal = []
+
+    def replay(self, other):
+        """Terapkan perubahan yang dicatat index lama (other) sejak start_journal"""
+        with other._lock:
+            journal, other._journal = other._journal or [], None
+        for gedung_id, point in journal:
+            if point is None:
+                self.remove(gedung_id)
+            else:
+                self.upsert(gedung_id, *point)
+
+    def upsert(self, gedung_id, lat, long):
+        """Tambah atau pindahkan satu gedung di index"""
+        lat, long = float(lat), float(long)
+        cell = self._cell(lat, long)
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((gedung_id, (lat, long)))
+            old = self._points.get(gedung_id)
+            if old is not None and old[2] != cell:
+                self._discard_from_cell(old[2], gedung_id)
+            self._points[gedung_id] = (lat, long, cell)
+            self._cells.setdefault(cell, set()).add(gedung_id)
+            self._arrays.pop(cell, None)
+
+    def remove(self, gedung_id):
+        """Hapus satu gedung dari index"""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((gedung_id, None))
+            old = self._points.pop(gedung_id, None)
+            if old is not None:
+                self._discard_from_cell(old[2], gedung_id)
+
+    def _discard_from_cell(self, cell, gedung_id):
+        self._arrays.pop(cell, None)
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(gedung_id)
+            if not members:
+                del self._cells[cell]
+
+    def _cell_arrays(self, cell):
+        arrays = self._arrays.get(cell)
+        if arrays is None:
+            ids = np.fromiter(self._cells[cell], dtype=np.int64)
+            coords = np.array([self._points[i][:2] for i in ids.tolist()], dtype=np.float64).reshape(-1, 2)
+            arrays = (ids, coords[:, 0], coords[:, 1])
+            self._arrays[cell] = arrays
+        return arrays
+
+    def query_bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """
+        Ambil gedung di semua cell yang bersinggungan dengan bounding box.
+
+        Kandidat bisa sedikit di luar bounding box; filter jarak exact
+        dilakukan oleh pemanggil.
+
+        Returns:
+            tuple: (ids, lats, longs) sebagai NumPy array
+        """
+        return self.query_bboxes([(lat_min, lat_max, lon_min, lon_max)])
+
+    def query_bboxes(self, bboxes):
+        """
+        Seperti query_bbox untuk banyak bounding box sekaligus.
+
+        Cell yang dipakai beberapa bounding box hanya dibaca sekali, jadi
+        setiap gedung muncul paling banyak satu kali. Bounding box yang
+        melewati +-180 dipecah; jumlah cell yang diperiksa per bounding box
+        dibatasi jumlah cell terisi (bbox besar cukup memfilter cell terisi).
+        """
+        cells = set()
+        with self._lock:
+            for bbox in bboxes:
+                for lat_min, lat_max, lon_min, lon_max in split_antimeridian(*bbox):
+                    row_min, col_min = self._cell(max(lat_min, -90.0), max(lon_min, -180.0))
+                    row_max, col_max = self._cell(min(lat_max, 90.0), min(lon_max, 180.0))
+                    if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self._cells):
+                        cells.update(
+                            (row, col) for row, col in self._cells
+                            if row_min <= row <= row_max and col_min <= col <= col_max
+                        )
+                    else:
+                        cells.update(
+                            (row, col)
+                            for row in range(row_min, row_max + 1)
+                            for col in range(col_min, col_max + 1)
+                        )
+
+            parts = [self._cell_arrays(cell) for cell in cells if cell in self._cells]
+
+        if not parts:
+            return _empty_candidates()
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+    def nearest(self, lat, long, k):
+        """
+        k gedung terdekat dengan expanding-ring search di atas grid.
+
+        Ring cell dibaca dari dalam ke luar sampai jarak gedung ke-k tidak
+        lebih jauh dari batas bawah jarak ke cell yang belum dibaca.
+
+        Returns:
+            tuple: (ids, distances) sebagai NumPy array, urut dari terdekat
+        """
+        row0, col0 = self._cell(lat, long)
+        parts = []
+        seen = set()
+        found = 0
+        ring = 0
+
+        with self._lock:
+            total_cells = len(self._cells)
+            while len(seen) < total_cells:
+                if 8 * ring >= total_cells:
+                    # Ring sudah lebih besar dari jumlah cell terisi: baca sisa cell sekaligus
+                    parts += [self._cell_arrays(cell) for cell in self._cells if cell not in seen]
+                    break
+
+                for row, col in self._ring_cells(row0, col0, ring):
+                    for cell in self._wrapped_cells(row, col):
+                        if cell in self._cells and cell not in seen:
+                            seen.add(cell)
+                            arrays = self._cell_arrays(cell)
+                            parts.append(arrays)
+                            found += len(arrays[0])
+
+                if found >= k:
+                    ids, lats, longs = (np.concatenate(column) for column in zip(*parts))
+                    distances = haversine_distances(lat, long, lats, longs)
+                    kth = np.partition(distances, k - 1)[k - 1]
+                    if kth <= self._ring_clearance(lat, long, row0, col0, ring):
+                        break
+                ring += 1
+
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        ids, lats, longs = (np.concatenate(column) for column in zip(*parts))
+        distances = haversine_distances(lat, long, lats, longs)
+        order = np.argsort(distances, kind='stable')[:k]
+        return ids[order], distances[order]
+
+    @staticmethod
+    def _ring_cells(row0, col0, ring):
+        if ring == 0:
+            yield (row0, col0)
+            return
+        for col in range(col0 - ring, col0 + ring + 1):
+            yield (row0 - ring, col)
+            yield (row0 + ring, col)
+        for row in range(row0 - ring + 1, row0 + ring):
+            yield (row, col0 - ring)
+            yield (row, col0 + ring)
+
+    def _wrapped_cells(self, row, col):
+        """
+        Cell asli untuk cell ring (row, col).
+
+        Ring tidak dibatasi +-180: kolom di luar range itu dipetakan ke kolom
+        di sisi lain antimeridian (longitude +-360) agar gedung di seberang
+        tetap terbaca.
+        """
+        west = col * self.cell_size
+        if -180.0 <= west and west + self.cell_size < 180.0:
+            yield (row, col)
+            return
+        for shift in (-360.0, 0.0, 360.0):
+            start, end = max(west + shift, -180.0), min(west + self.cell_size + shift, 180.0)
+            if start < end or start == end == 180.0:
+                # Gedung tepat di long 180 ada di kolom floor(180 / cell_size)
+                last = floor(end / self.cell_size) if end == 180.0 else ceil(end / self.cell_size) - 1
+                for real in range(floor(start / self.cell_size), last + 1):
+                    yield (row, real)
+
+    def _ring_clearance(self, lat, long, row0, col0, ring):
+        """Batas bawah jarak (meter) dari titik ke cell di luar ring"""
+        south = (row0 - ring) * self.cell_size
+        north = (row0 + ring + 1) * self.cell_size
+        west = (col0 - ring) * self.cell_size
+        east = (col0 + ring + 1) * self.cell_size
+
+        # Jarak ke garis lintang: sepanjang meridian
+        lat_gap = radians(min(lat - south, north - lat))
+        # Jarak ke meridian (great circle): asin(cos(lat) * sin(dlon))
+        lon_gap = radians(min(min(long - west, east - long), 90))
+        meridian_gap = asin(cos(radians(lat)) * sin(lon_gap))
+
+        return EARTH_RADIUS * min(lat_gap, meridian_gap)
+
+
+def _empty_candidates():
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+
+
+_index = None
+_index_lock = threading.Lock()
+_rebuilding = False
+
+# Toleransi selisih jam antar host saat membandingkan synced_at dengan waktu invalidasi
+INDEX_CLOCK_SKEW = 2
+
+
+def spatial_index_enabled():
+    return getattr(settings, 'GEDUNG_SPATIAL_INDEX', True)
+
+
+def _build_index():
+    index = GedungGridIndex(getattr(settings, 'GEDUNG_INDEX_CELL_SIZE', 0.01))
+    synced_at = time.time()
+    index.load(Gedung.objects.values_list('id', 'lat_float', 'long_float').iterator(), synced_at)
+    return index
+
+
+def _rebuild_in_background(old):
+    """Build index baru di thread ini lalu tukar referensinya; request tetap memakai index lama"""
+    global _index, _rebuilding
+    try:
+        index = _build_index()
+        with _index_lock, old._lock:
+            if _index is old:
+                index.replay(old)
+                _index = index
+    except Exception:
+        logger.exception('Rebuild spatial index gagal, dicoba lagi di request berikutnya')
+    finally:
+        old._journal = None
+        _rebuilding = False
+        connection.close()
+
+
+def get_gedung_index():
+    """
+    Return index milik worker ini, build dari database saat pertama dipakai.
+
+    Signal hanya meng-update index di worker yang menerima perubahan, jadi
+    index di-rebuild penuh setelah GEDUNG_INDEX_MAX_AGE detik agar perubahan
+    dari worker lain tetap terlihat. Rebuild berjalan di thread background;
+    sampai selesai request tetap dilayani index lama (perubahan lokal selama
+    rebuild diterapkan ulang ke index baru), jadi tidak ada request yang
+    menunggu rebuild kecuali build pertama.
+    """
+    global _index, _rebuilding
+    max_age = getattr(settings, 'GEDUNG_INDEX_MAX_AGE', 300)
+
+    index = _index
+    if index is not None and time.monotonic() - index.loaded_at < max_age:
+        return index
+
+    with _index_lock:
+        index = _index
+        if index is None:
+            index = _build_index()
+            _index = index
+        elif time.monotonic() - index.loaded_at >= max_age and not _rebuilding:
+            _rebuilding = True
+            index.start_journal()
+            threading.Thread(target=_rebuild_in_background, args=(index,), daemon=True).start()
+    return index
+
+
+def get_loaded_gedung_index():
+    """Return index jika sudah di-build di worker ini, tanpa memicu query"""
+    return _index
+
+
+def reset_gedung_index():
+    """Buang index worker ini; di-build ulang saat dipakai berikutnya"""
+    global _index
+    with _index_lock:
+        if _index is not None:
+            _index._journal = None
+        _index = None
+
+
+def nearby_candidates(lat, long, radius):
+    """
+    Kandidat gedung di dalam bounding box radius.
+
+    Memakai index in-memory bila aktif, fallback ke range scan geocell di
+    database.
+
+    Returns:
+        tuple: (ids, lats, longs) sebagai NumPy array
+    """
+    return nearby_candidates_multi([(lat, long, radius)])
+
+
+def nearby_candidates_multi(points, fresh_after=None):
+    """
+    Kandidat gabungan untuk banyak titik (lat, long, radius) sekaligus.
+
+    Hanya satu lookup index atau satu query database untuk semua titik,
+    tanpa duplikat gedung. Jika fresh_after (time.time()) diberikan dan
+    index worker ini dibaca dari database sebelum waktu itu, kandidat
+    diambil langsung dari database.
+
+    Returns:
+        tuple: (ids, lats, longs) sebagai NumPy array
+    """
+    bboxes = [
+        part
+        for bbox in (get_bounding_box(lat, long, radius) for lat, long, radius in points)
+        for part in split_antimeridian(bbox['lat_min'], bbox['lat_max'], bbox['lon_min'], bbox['lon_max'])
+    ]
+
+    if spatial_index_enabled():
+        index = get_gedung_index()
+        if fresh_after is None or index.synced_at > fresh_after + INDEX_CLOCK_SKEW:
+            return index.query_bboxes(bboxes)
+
+    # Range scan per geocell (B-tree index), range antar titik digabung
+    ranges = sorted(r for bbox in bboxes for r in geocell_ranges(*bbox))
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    cells = Q()
+    for start, end in merged:
+        cells |= Q(geocell__gte=start, geocell__lt=end)
+
+    # Filter bounding box gabungan (exact untuk satu titik)
+    rows = list(Gedung.objects.filter(cells).filter(
+        lat_float__gte=min(b[0] for b in bboxes),
+        lat_float__lte=max(b[1] for b in bboxes),
+        long_float__gte=min(b[2] for b in bboxes),
+        long_float__lte=max(b[3] for b in bboxes)
+    ).values_list('id', 'lat_float', 'long_float'))
+    if not rows:
+        return _empty_candidates()
+
+    ids, lats, longs = zip(*rows)
+    return (
+        np.array(ids, dtype=np.int64),
+        np.array(lats, dtype=np.float64),
+        np.array(longs, dtype=np.float64),
+    )
+
+
+def gedung_in_bbox(lat_min, lat_max, lon_min, lon_max):
+    """
+    Id gedung yang koordinatnya tepat di dalam bounding box.
+
+    Returns:
+        list: gedung_id
+    """
+    if spatial_index_enabled():
+        ids, lats, longs = get_gedung_index().query_bbox(lat_min, lat_max, lon_min, lon_max)
+        inside = (lats >= lat_min) & (lats <= lat_max) & (longs >= lon_min) & (longs <= lon_max)
+        return ids[inside].tolist()
+
+    return list(Gedung.objects.filter(
+        lat_float__gte=lat_min, lat_float__lte=lat_max,
+        long_float__gte=lon_min, long_float__lte=lon_max
+    ).values_list('id', flat=True))
+
+
+def nearest_gedung(lat, long, k):
+    """
+    k gedung terdekat dari titik, tanpa batas radius.
+
+    Memakai expanding-ring search di index in-memory. Bila index tidak
+    aktif, fallback ke range scan database dengan radius yang diperbesar
+    bertahap sampai k gedung ditemukan.
+
+    Returns:
+        tuple: (ids, distances) sebagai NumPy array, urut dari terdekat
+    """
+    if spatial_index_enabled():
+        return get_gedung_index().nearest(lat, long, k)
+
+    radius = 500
+    while True:
+        ids, lats, longs = nearby_candidates(lat, long, radius)
+        distances = haversine_distances(lat, long, lats, longs)
+        in_radius = distances <= radius
+        # Berhenti jika k gedung ada di dalam radius, atau radius sudah menutup bumi
+        if in_radius.sum() >= k or radius >= EARTH_RADIUS * pi:
+            break
+        radius *= 4
+
+    ids, distances = ids[in_radius], distances[in_radius]
+    order = np.argsort(distances, kind='stable')[:k]
+    return ids[order], distances[order]
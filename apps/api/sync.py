@@ -0,0 +1,168 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.core.models import Gedung, Unit, Pemilik, Agen, Image, Tombstone
+
+
+class SyncCursorInvalid(ValueError):
+    """Cursor since tidak bisa dibaca"""
+
+
+class SyncCursorExpired(Exception):
+    """Cursor lebih tua dari retensi tombstone; client harus sync penuh ulang"""
+
+
+def sync_lag_seconds():
+    return getattr(settings, 'SYNC_LAG_SECONDS', 60)
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _gedung(row):
+    return {
+        'id': row['id'],
+        'uuid': str(row['uuid']),
+        'nama_gedung': row['nama_gedung'],
+        'alamat': row['alamat'],
+        'total_units': row['total_units'],
+        'blacklisted_units': row['blacklisted_units'],
+        'updated_at': _iso(row['updated_at']),
+        'lat': row['lat_float'],
+        'long': row['long_float'],
+        'lokasi_nama': row['lokasi__nama'],
+        'distrik_nama': row['lokasi__distrik__nama'],
+    }
+
+
+def _person(row):
+    return {**row, 'updated_at': _iso(row['updated_at'])}
+
+
+# entity -> (queryset, kolom waktu, serializer). Urutan ini juga urutan di response.
+ENTITIES = {
+    'gedung': (
+        lambda: Gedung.objects.values(
+            'id', 'uuid', 'nama_gedung', 'alamat', 'total_units', 'blacklisted_units', 'updated_at',
+            'lat_float', 'long_float', 'lokasi__nama', 'lokasi__distrik__nama'
+        ),
+        'updated_at',
+        _gedung,
+    ),
+    'unit': (
+        lambda: Unit.objects.values(
+            'id', 'uuid', 'gedung_id', 'lantai', 'unit_number', 'deskripsi', 'listing_type',
+            'alasan_blacklist', 'pemilik_id', 'agen_id', 'updated_at'
+        ),
+        'updated_at',
+        lambda row: {**row, 'uuid': str(row['uuid']), 'updated_at': _iso(row['updated_at'])},
+    ),
+    'pemilik': (
+        lambda: Pemilik.objects.values('id', 'nama', 'julukan', 'no_telp', 'status', 'updated_at'),
+        'updated_at',
+        _person,
+    ),
+    'agen': (
+        lambda: Agen.objects.values('id', 'nama', 'julukan', 'no_telp', 'status', 'updated_at'),
+        'updated_at',
+        _person,
+    ),
+    'image': (
+        # 'image' masih nama file; URL di-resolve oleh view
+        lambda: Image.objects.values('id', 'object_id', 'image', 'is_primary', 'updated_at', owner=F('content_type__model')),
+        'updated_at',
+        lambda row: {**row, 'updated_at': _iso(row['updated_at'])},
+    ),
+    'deleted': (
+        lambda: Tombstone.objects.values('id', 'model', 'object_id', 'uuid', 'deleted_at'),
+        'deleted_at',
+        lambda row: {
+            'model': row['model'], 'object_id': row['object_id'],
+            'uuid': str(row['uuid']) if row['uuid'] else None, 'deleted_at': _iso(row['deleted_at'])
+        },
+    ),
+}
+
+
+def encode_cursor(issued_at, positions):
+    payload = {
+        't': issued_at.isoformat(),
+        'p': {name: [timestamp.isoformat(), row_id] for name, (timestamp, row_id) in positions.items()},
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """
+    Returns:
+        tuple: (issued_at, {entity: (updated_at, id)})
+
+    Raises:
+        SyncCursorInvalid: cursor tidak valid
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+        issued_at = datetime.fromisoformat(payload['t'])
+        positions = {
+            name: (datetime.fromisoformat(timestamp), int(row_id))
+            for name, (timestamp, row_id) in payload['p'].items() if name in ENTITIES
+        }
+    except (ValueError, TypeError, KeyError, AttributeError) as exc:
+        raise SyncCursorInvalid('cursor tidak valid') from exc
+    if timezone.is_naive(issued_at) or any(timezone.is_naive(ts) for ts, _ in positions.values()):
+        raise SyncCursorInvalid('cursor tidak valid')
+    return issued_at, positions
+
+
+def sync_page(cursor, limit):
+    """
+    Satu halaman delta sync untuk semua entity.
+
+    Setiap entity dipaginasi terpisah dengan cursor (updated_at, id) yang
+    stabil (index updated_at, id). Baris yang diubah dalam SYNC_LAG_SECONDS
+    terakhir ditunda ke pull berikutnya, agar transaksi yang belum commit
+    dengan updated_at lebih awal tidak terlewat. Ini hanya aman selama
+    setiap transaksi tulis commit dalam SYNC_LAG_SECONDS sejak updated_at
+    di-stamp; transaksi yang lebih lama bisa terlewat (lihat config/base.py).
+
+    Returns:
+        dict: rows per entity, 'next_cursor' dan 'has_more'
+
+    Raises:
+        SyncCursorInvalid: cursor tidak valid
+        SyncCursorExpired: cursor lebih tua dari SYNC_TOMBSTONE_RETENTION_DAYS
+    """
+    now = timezone.now()
+    positions = {}
+    if cursor:
+        issued_at, positions = decode_cursor(cursor)
+        retention = timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+        if issued_at < now - retention:
+            raise SyncCursorExpired('Cursor kedaluwarsa, lakukan sync penuh tanpa since')
+
+    upper = now - timedelta(seconds=sync_lag_seconds())
+    entities = {}
+    has_more = False
+    next_positions = dict(positions)
+
+    for name, (queryset, time_field, serialize) in ENTITIES.items():
+        rows = queryset().filter(**{f'{time_field}__lte': upper})
+        if name in positions:
+            timestamp, row_id = positions[name]
+            rows = rows.filter(Q(**{f'{time_field}__gt': timestamp}) | Q(**{time_field: timestamp, 'id__gt': row_id}))
+        rows = list(rows.order_by(time_field, 'id')[:limit + 1])
+
+        if len(rows) > limit:
+            has_more = True
+            rows = rows[:limit]
+        if rows:
+            next_positions[name] = (rows[-1][time_field], rows[-1]['id'])
+        entities[name] = [serialize(row) for row in rows]
+
+    return {'has_more': has_more, 'next_cursor': encode_cursor(now, next_positions), **entities}
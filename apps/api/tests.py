@@ -0,0 +1,833 @@
+import gzip
+import hashlib
+import io
+import json
+import random
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import timedelta
+from math import floor
+from pathlib import Path
+from unittest import mock, skipUnless
+
+import boto3
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.http import JsonResponse
+from django.test import AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import path
+from django.utils import timezone
+import numpy as np
+from PIL import Image as PILImage
+from storages.backends.s3 import S3Storage
+
+from apps.api import media, schemas, spatial
+from apps.api.cache import entry_keys, quantize_point
+from apps.api.clusters import ClusterIndex, cell_size, cluster_max_zoom, get_cluster_index, reset_cluster_index
+from apps.api.nplusone import NPlusOneError
+from apps.api.media import (
+    MediaUrlCache, aresolve_media_urls, clear_media_url_cache, resolve_media_url, resolve_media_urls,
+    storage_is_signed, url_ttl
+)
+from apps.api.ratelimit import RateLimitExceeded, check_rate_limit, key_limits, rate_limit_enabled
+from apps.api.snapshot import build_snapshot, read_manifest
+from apps.api.spatial import GedungGridIndex, get_gedung_index, get_loaded_gedung_index, reset_gedung_index
+from apps.api.sync import sync_page
+from apps.api.utils import haversine_distance
+from apps.core.fuzzy import reset_name_indexes
+from apps.core.models import Distrik, Lokasi, Gedung, Pemilik, Agen, Unit, Image
+
+try:
+    # moto ada di requirements-dev.txt, bukan requirements.txt
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+API_KEY = 'test-api-key'
+
+
+def n_plus_one_view(request):
+    """N+1 yang disengaja: satu query gedung per unit"""
+    return JsonResponse({'gedung': [unit.gedung.nama_gedung for unit in Unit.objects.all()]})
+
+
+# ROOT_URLCONF untuk NPlusOneTests
+urlpatterns = [path('n-plus-one', n_plus_one_view)]
+
+
+def _png():
+    buffer = io.BytesIO()
+    PILImage.new('RGB', (200, 150), (200, 40, 40)).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), 'foto.png')
+
+
+class ApiTestCase(TestCase):
+    """
+    Dataset kecil (gedung, unit, pemilik/agen, gambar) untuk test endpoint.
+
+    Index/cache per worker (spatial, cluster, trigram, nearby, URL media)
+    dikosongkan per test karena on_commit tidak jalan di TestCase.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # Variant gambar dibuat di on_commit
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.create_dataset()
+
+    @classmethod
+    def create_dataset(cls):
+        distrik = Distrik.objects.create(nama='Nasr City')
+        lokasi = Lokasi.objects.create(distrik=distrik, nama='Hay 10')
+        cls.pemilik = Pemilik.objects.create(nama='Mohamed Ahmed', julukan='Abu Ali', no_telp='0101 234 5678')
+        cls.agen = Agen.objects.create(nama='Mahmoud Hassan', no_telp='+20 111 222 3333')
+
+        gedung_type = ContentType.objects.get_for_model(Gedung)
+        unit_type = ContentType.objects.get_for_model(Unit)
+        cls.gedungs = []
+        for i in range(6):
+            gedung = Gedung.objects.create(
+                lokasi=lokasi, nama_gedung=f'Imarah {i}', alamat=f'Shari3 {i}',
+                lat=30.05 + i * 0.001, long=31.35 + i * 0.001
+            )
+            Image.objects.create(content_type=gedung_type, object_id=gedung.id, image=_png(), is_primary=True)
+            for n in range(3):
+                unit = Unit.objects.create(
+                    gedung=gedung, pemilik=cls.pemilik, agen=cls.agen, deskripsi='kanan',
+                    unit_number=str(n + 1), lantai=n, listing_type='blacklist' if n else 'available'
+                )
+                Image.objects.create(content_type=unit_type, object_id=unit.id, image=_png(), is_primary=True)
+                Image.objects.create(content_type=unit_type, object_id=unit.id, image=_png())
+            cls.gedungs.append(Gedung.objects.get(pk=gedung.pk))
+        cls.units = list(Unit.objects.order_by('id'))
+
+    def setUp(self):
+        for reset in (reset_gedung_index, reset_cluster_index, reset_name_indexes, cache.clear, clear_media_url_cache):
+            reset()
+            self.addCleanup(reset)
+
+        patcher = mock.patch('apps.api.utils.IMARAH_ALLOWED_API_KEYS', frozenset({API_KEY}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = Client(HTTP_X_API_KEY=API_KEY)
+
+    def request(self, method, url, body=None):
+        if method == 'post':
+            return self.client.post(url, json.dumps(body), content_type='application/json')
+        return self.client.get(url)
+
+    def endpoint_requests(self):
+        """(method, url, body, schema response 200) untuk setiap endpoint JSON"""
+        gedung, unit = self.gedungs[0], self.units[0]
+        gedung_uuids = [str(g.uuid) for g in self.gedungs] + ['bukan-uuid']
+        unit_uuids = [str(u.uuid) for u in self.units] + ['bukan-uuid']
+        nearby = {'lat': 30.052, 'long': 31.352, 'radius': 1000}
+        return [
+            ('post', '/api/gedung/nearby', nearby, schemas.NearbyResponse),
+            ('post', '/api/gedung/nearby?image_size=thumb', nearby, schemas.NearbyResponse),
+            ('post', '/api/gedung/nearby/batch', {'points': [nearby, {**nearby, 'radius': 200, 'limit': 2}]}, schemas.NearbyBatchResponse),
+            ('get', '/api/gedung/nearest?lat=30.052&long=31.352&k=4', None, schemas.NearestResponse),
+            ('get', '/api/gedung/search?q=imarah&per_page=3', None, schemas.GedungSearchResponse),
+            ('get', '/api/gedung/clusters?bbox=31.0,29.8,31.7,30.4&zoom=12', None, schemas.ClusterResponse),
+            ('get', '/api/gedung/clusters?bbox=31.34,30.04,31.36,30.06&zoom=18', None, schemas.ClusterResponse),
+            ('post', '/api/gedung/batch', {'uuids': gedung_uuids}, schemas.GedungBatchResponse),
+            ('get', f'/api/gedung/{gedung.uuid}', None, schemas.GedungDetailSchema),
+            ('get', f'/api/gedung/{gedung.uuid}?image_size=medium', None, schemas.GedungDetailSchema),
+            ('post', '/api/unit/batch', {'uuids': unit_uuids}, schemas.UnitBatchResponse),
+            ('get', f'/api/unit/{unit.uuid}', None, schemas.UnitDetailResponse),
+            ('post', '/api/screening/phone', {'numbers': ['+20 101 234 5678', '01112223333', 'x']}, schemas.PhoneScreeningResponse),
+            ('get', '/api/screening/name?q=mohamed', None, schemas.NameScreeningResponse),
+            ('get', '/api/sync?limit=5', None, schemas.SyncResponse),
+        ]
+
+
+@skipUnless(mock_aws, 'moto tidak terinstal (pip install -r requirements-dev.txt)')
+class MediaUrlCacheTests(SimpleTestCase):
+    """Cache URL media terhadap S3Storage yang di-backend moto (pengganti R2)"""
+
+    def setUp(self):
+        mocked = mock_aws()
+        mocked.start()
+        self.addCleanup(mocked.stop)
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='imarah-test')
+
+        clear_media_url_cache()
+        self.addCleanup(clear_media_url_cache)
+
+    def _storage(self, **options):
+        return S3Storage(
+            bucket_name='imarah-test', region_name='us-east-1',
+            access_key='testing', secret_key='testing', **options
+        )
+
+    def _count_url_calls(self, storage):
+        return mock.patch.object(storage, 'url', wraps=storage.url)
+
+    def test_presigned_url_cached_for_half_expiry(self):
+        storage = self._storage(querystring_auth=True, querystring_expire=600)
+        self.assertTrue(storage_is_signed(storage))
+        self.assertEqual(url_ttl(storage), 300)
+
+        with self._count_url_calls(storage) as url, mock.patch.object(media.time, 'monotonic', return_value=1000.0):
+            first = resolve_media_url('images/a.jpg', storage)
+            self.assertIn('Signature=', first)
+            self.assertEqual(resolve_media_url('images/a.jpg', storage), first)
+            self.assertEqual(url.call_count, 1)
+
+        # Masih di dalam setengah masa berlaku: tetap dari cache
+        with self._count_url_calls(storage) as url, mock.patch.object(media.time, 'monotonic', return_value=1299.0):
+            self.assertEqual(resolve_media_url('images/a.jpg', storage), first)
+            self.assertEqual(url.call_count, 0)
+
+        # Lewat querystring_expire / 2: URL ditandatangani ulang
+        with self._count_url_calls(storage) as url, mock.patch.object(media.time, 'monotonic', return_value=1300.0):
+            resolve_media_url('images/a.jpg', storage)
+            self.assertEqual(url.call_count, 1)
+
+    def test_public_storage_returns_unsigned_url(self):
+        for storage in (
+            self._storage(querystring_auth=False),
+            self._storage(querystring_auth=True, custom_domain='media.example.com'),
+        ):
+            with self.subTest(storage=storage):
+                self.assertFalse(storage_is_signed(storage))
+                self.assertIsNone(url_ttl(storage))
+                url = resolve_media_url('images/b.jpg', storage)
+                self.assertNotIn('Signature=', url)
+                self.assertNotIn('Expires=', url)
+                self.assertTrue(url.endswith('/images/b.jpg'))
+
+    def test_lru_eviction_bound(self):
+        cache = MediaUrlCache(max_size=2)
+        cache.set('a', 'url-a', None)
+        cache.set('b', 'url-b', None)
+        self.assertEqual(cache.get('a', 0), 'url-a')  # a jadi paling baru dipakai
+        cache.set('c', 'url-c', None)
+
+        self.assertIsNone(cache.get('b', 0))
+        self.assertEqual(cache.get('a', 0), 'url-a')
+        self.assertEqual(cache.get('c', 0), 'url-c')
+        self.assertEqual(len(cache._entries), 2)
+
+    def test_module_cache_respects_size_limit(self):
+        storage = self._storage(querystring_auth=True, querystring_expire=600)
+        with mock.patch.object(media, '_url_cache', MediaUrlCache(max_size=3)):
+            for n in range(10):
+                resolve_media_url(f'images/{n}.jpg', storage)
+            self.assertEqual(len(media._url_cache._entries), 3)
+
+    async def test_async_resolve_matches_sync(self):
+        storage = self._storage(querystring_auth=True, querystring_expire=600)
+        request = RequestFactory().get('/api/gedung/nearby')
+        names = ['images/1.jpg', None, 'images/2.jpg', 'images/1.jpg']
+
+        # Cache kosong: semua nama lewat jalur sync_to_async
+        async_urls = await aresolve_media_urls(request, names, storage)
+        # Cache terisi: jalur sync membaca entry yang sama
+        self.assertEqual(resolve_media_urls(request, names, storage), async_urls)
+        self.assertEqual(set(async_urls), {'images/1.jpg', 'images/2.jpg'})
+
+        # Sebagian ter-cache, sebagian belum
+        names.append('images/3.jpg')
+        self.assertEqual(await aresolve_media_urls(request, names, storage), resolve_media_urls(request, names, storage))
+
+
+@override_settings(SYNC_LAG_SECONDS=0)
+class TrustedResponseTests(ApiTestCase):
+    """
+    API_TRUST_RESPONSES melewati validasi schema; output-nya harus sama persis
+    dengan jalur yang divalidasi, termasuk urutan field.
+    """
+
+    def _fetch(self, method, url, body, trusted):
+        with override_settings(API_TRUST_RESPONSES=trusted):
+            response = self.request(method, url, body)
+        self.assertEqual(response.status_code, 200, response.content[:300])
+        # next_cursor memuat waktu request
+        return response, re.sub(rb'"next_cursor":"[^"]*"', b'', response.content)
+
+    def test_trusted_output_matches_validated_output(self):
+        for method, url, body, schema in self.endpoint_requests():
+            with self.subTest(url=url):
+                validated, validated_body = self._fetch(method, url, body, trusted=False)
+                trusted, trusted_body = self._fetch(method, url, body, trusted=True)
+
+                self.assertEqual(trusted_body, validated_body)
+                self.assertEqual(trusted['Content-Type'], validated['Content-Type'])
+                self.assertEqual(trusted.get('ETag'), validated.get('ETag'))
+
+                # Payload trusted sudah dalam bentuk dan urutan field schema
+                payload = json.loads(trusted.content)
+                dumped = schema.model_validate(payload).model_dump(mode='json')
+                self.assertEqual(json.dumps(payload), json.dumps(dumped))
+
+    def test_requests_return_data(self):
+        """Pastikan perbandingan di atas tidak hanya membandingkan list kosong"""
+        counts = {
+            '/api/gedung/nearby': lambda p: p['count'],
+            '/api/gedung/nearby?image_size=thumb': lambda p: sum('_thumb.' in g['primary_image'] for g in p['results']),
+            '/api/gedung/search?q=imarah&per_page=3': lambda p: len(p['results']),
+            '/api/screening/phone': lambda p: sum(r['blacklisted'] for r in p['results']),
+            '/api/screening/name?q=mohamed': lambda p: p['count'],
+            '/api/sync?limit=5': lambda p: len(p['gedung']) + len(p['unit']) + len(p['image']),
+        }
+        for method, url, body, _ in self.endpoint_requests():
+            if url in counts:
+                with self.subTest(url=url):
+                    payload = self.request(method, url, body).json()
+                    self.assertGreater(counts[url](payload), 0)
+
+
+REDIS_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/0'}}
+
+
+@override_settings(API_RATE_LIMITS={'key-partner': {'rate': 1, 'burst': 2}}, API_RATE_LIMIT_DEFAULT=None)
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_only_listed_keys_are_limited(self):
+        self.assertEqual(key_limits('key-partner'), {'rate': 1, 'burst': 2})
+        self.assertIsNone(key_limits('key-lain'))
+        with override_settings(API_RATE_LIMIT_DEFAULT={'rate': 10, 'burst': 40}):
+            self.assertEqual(key_limits('key-lain'), {'rate': 10, 'burst': 40})
+
+    async def test_unlisted_key_is_never_rejected(self):
+        for _ in range(20):
+            await check_rate_limit('key-lain')
+        with self.assertRaises(RateLimitExceeded):
+            for _ in range(3):
+                await check_rate_limit('key-partner')
+
+    def test_disabled_on_per_worker_cache(self):
+        self.assertFalse(rate_limit_enabled())  # LocMemCache di config.settings.test
+        with override_settings(CACHES=REDIS_CACHE):
+            self.assertTrue(rate_limit_enabled())
+            with override_settings(API_RATE_LIMIT_ENABLED=False):
+                self.assertFalse(rate_limit_enabled())
+
+
+class MetricsViewTests(SimpleTestCase):
+    def test_token_required_outside_debug(self):
+        with override_settings(METRICS_TOKEN=None, DEBUG=False):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(METRICS_TOKEN=None, DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_bearer_token(self):
+        with override_settings(METRICS_TOKEN='rahasia'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer salah').status_code, 403)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer rahasia')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'api_request_duration_seconds', response.content)
+
+
+@override_settings(SYNC_LAG_SECONDS=0)
+class NPlusOneTests(ApiTestCase):
+    """Endpoint list/batch API di bawah N_PLUS_ONE_RAISE (config.settings.test)"""
+
+    def test_runs_under_raise_settings(self):
+        self.assertTrue(settings.N_PLUS_ONE_DETECTION)
+        self.assertTrue(settings.N_PLUS_ONE_RAISE)
+
+    def test_api_endpoints(self):
+        extra = [
+            ('get', '/api/gedung/search?q=imarah&per_page=50', None, None),
+            ('get', '/api/sync?limit=500', None, None),
+            ('get', f'/api/unit/{self.units[0].uuid}?image_size=thumb', None, None),
+            ('post', '/api/unit/batch?image_size=medium', {'uuids': [str(u.uuid) for u in self.units]}, None),
+        ]
+        for trusted in (False, True):
+            for method, url, body, _ in self.endpoint_requests() + extra:
+                with self.subTest(url=url, trusted=trusted), override_settings(API_TRUST_RESPONSES=trusted):
+                    self.assertEqual(self.request(method, url, body).status_code, 200)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_middleware_raises_on_n_plus_one(self):
+        with self.assertRaises(NPlusOneError) as raised, self.assertLogs('apps.api.nplusone', 'WARNING'):
+            self.client.get('/n-plus-one')
+        self.assertIn('GET /n-plus-one', str(raised.exception))
+        self.assertIn('gedung', str(raised.exception))
+
+        with override_settings(N_PLUS_ONE_RAISE=False), self.assertLogs('apps.api.nplusone', 'WARNING') as logs:
+            self.assertEqual(self.client.get('/n-plus-one').status_code, 200)
+        self.assertIn('n_plus_one_view', logs.output[0])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    async def test_middleware_raises_on_n_plus_one_async(self):
+        with self.assertRaises(NPlusOneError), self.assertLogs('apps.api.nplusone', 'WARNING'):
+            await AsyncClient().get('/n-plus-one')
+
+
+class SyncLagTests(TestCase):
+    def test_late_commit_within_lag_is_not_skipped(self):
+        lokasi = Lokasi.objects.create(distrik=Distrik.objects.create(nama='Nasr City'), nama='Hay 10')
+        now = timezone.now()
+        early = Gedung.objects.create(lokasi=lokasi, nama_gedung='Lama', alamat='a', lat=30.05, long=31.35)
+        late = Gedung.objects.create(lokasi=lokasi, nama_gedung='Baru', alamat='b', lat=30.06, long=31.36)
+        # early sudah commit; late di-stamp 30 detik lalu tapi transaksinya belum commit saat pull pertama
+        Gedung.objects.filter(pk=early.pk).update(updated_at=now - timedelta(seconds=120))
+        Gedung.objects.filter(pk=late.pk).update(updated_at=now - timedelta(seconds=30))
+
+        with override_settings(SYNC_LAG_SECONDS=60), mock.patch('apps.api.sync.timezone.now', return_value=now):
+            first = sync_page(None, 100)
+        self.assertEqual([row['nama_gedung'] for row in first['gedung']], ['Lama'])
+
+        # Pull berikutnya melanjutkan dari cursor dan tetap mendapat baris yang commit terlambat
+        with override_settings(SYNC_LAG_SECONDS=60), mock.patch('apps.api.sync.timezone.now', return_value=now + timedelta(seconds=60)):
+            second = sync_page(first['next_cursor'], 100)
+        self.assertEqual([row['nama_gedung'] for row in second['gedung']], ['Baru'])
+
+
+class PoleAndAntimeridianTests(ApiTestCase):
+    """Bounding box di kutub (cos(lat) = 0) dan yang melintasi +-180"""
+
+    @classmethod
+    def create_dataset(cls):
+        super().create_dataset()
+        lokasi = Lokasi.objects.first()
+        for name, lat, long in (('Kutub Utara', 89.9996, 10.0), ('Kutub Selatan', -89.9996, -170.0),
+                                ('Timur', 0.0, 179.9995), ('Barat', 0.0, -179.9995)):
+            Gedung.objects.create(lokasi=lokasi, nama_gedung=name, alamat=name, lat=lat, long=long)
+
+    def _nearby_names(self, lat, long, radius=1000):
+        response = self.request('post', '/api/gedung/nearby', {'lat': lat, 'long': long, 'radius': radius})
+        self.assertEqual(response.status_code, 200)
+        return sorted(g['nama_gedung'] for g in response.json()['results'])
+
+    def test_grid_index_query_is_bounded(self):
+        index = GedungGridIndex(0.01)
+        index.load([(1, 89.9996, 10.0), (2, 0.0, 179.9995), (3, 0.0, -179.9995)])
+        # Longitude +-1.5e14 derajat: cell yang diperiksa dibatasi cell terisi
+        ids, _, _ = index.query_bbox(89.99, 90.0, -1.5e14, 1.5e14)
+        self.assertEqual(ids.tolist(), [1])
+        ids, _, _ = index.query_bboxes([(-0.01, 0.01, 179.99, 180.01)])
+        self.assertEqual(sorted(ids.tolist()), [2, 3])
+
+    def test_nearby_at_poles_and_antimeridian(self):
+        cases = [
+            ((90, 0), ['Kutub Utara']),
+            ((-90, 0), ['Kutub Selatan']),
+            ((89.999, -170), ['Kutub Utara']),
+            ((0, 180), ['Barat', 'Timur']),
+            ((0, -179.9999), ['Barat', 'Timur']),
+        ]
+        for spatial_index in (True, False):
+            for (lat, long), expected in cases:
+                with self.subTest(lat=lat, long=long, spatial_index=spatial_index), override_settings(
+                    NEARBY_CACHE_ENABLED=False, GEDUNG_SPATIAL_INDEX=spatial_index
+                ):
+                    self.assertEqual(self._nearby_names(lat, long), expected)
+
+    def test_nearest_at_pole(self):
+        response = self.request('get', '/api/gedung/nearest?lat=90&long=0&k=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([g['nama_gedung'] for g in response.json()['results']], ['Kutub Utara'])
+
+    def test_cache_keys_at_poles(self):
+        for lat, long in ((90, 0), (-90, 0), (89.9999, 180), (0, 180), (0, -180)):
+            with self.subTest(lat=lat, long=long):
+                _, center_lat, center_long, _ = quantize_point(lat, long, 1000)
+                self.assertTrue(-90 <= center_lat <= 90 and -180 <= center_long <= 180)
+                [(key, *_, invalidated_at)] = entry_keys([(lat, long, 1000)])
+                self.assertEqual(invalidated_at, 0)
+
+    def test_cached_nearby_at_poles(self):
+        for _ in range(2):  # miss lalu hit
+            self.assertEqual(self._nearby_names(90, 0), ['Kutub Utara'])
+            self.assertEqual(self._nearby_names(-90, 0), ['Kutub Selatan'])
+            self.assertEqual(self._nearby_names(0, 180), ['Barat', 'Timur'])
+
+        # Perubahan di kolom mana pun dekat kutub meng-invalidate entry kutub
+        gedung = Gedung.objects.get(nama_gedung='Kutub Utara')
+        with self.captureOnCommitCallbacks(execute=True):
+            gedung.lat = 80
+            gedung.save()
+        self.assertEqual(self._nearby_names(90, 0), [])
+
+        # Begitu juga perubahan di seberang antimeridian
+        gedung = Gedung.objects.get(nama_gedung='Barat')
+        with self.captureOnCommitCallbacks(execute=True):
+            gedung.delete()
+        self.assertEqual(self._nearby_names(0, 180), ['Timur'])
+
+
+class ETagTests(ApiTestCase):
+    """Conditional GET detail gedung/unit (If-None-Match)"""
+
+    def _get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def _urls(self):
+        return [f'/api/gedung/{self.gedungs[0].uuid}', f'/api/unit/{self.units[0].uuid}']
+
+    def test_matching_etag_returns_304(self):
+        for url in self._urls():
+            with self.subTest(url=url):
+                response = self._get(url)
+                self.assertEqual(response.status_code, 200)
+                etag = response['ETag']
+
+                cached = self._get(url, etag)
+                self.assertEqual(cached.status_code, 304)
+                self.assertEqual(cached.content, b'')
+                self.assertEqual(cached['ETag'], etag)
+                # Weak comparison dan daftar ETag
+                self.assertEqual(self._get(url, f'"lama", W/{etag}').status_code, 304)
+
+    def test_stale_etag_returns_200(self):
+        for url in self._urls():
+            with self.subTest(url=url):
+                response = self._get(url, '"etag-lama"')
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.content)
+
+    def test_etag_is_per_image_size(self):
+        url = self._urls()[0]
+        self.assertNotEqual(self._get(url)['ETag'], self._get(url + '?image_size=thumb')['ETag'])
+
+    def _assert_changes(self, write):
+        etags = {url: self._get(url)['ETag'] for url in self._urls()}
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self._get(url, etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_after_gedung_update(self):
+        gedung = Gedung.objects.get(pk=self.gedungs[0].pk)
+
+        def write():
+            gedung.nama_gedung = 'Imarah Baru'
+            gedung.save()
+        self._assert_changes(write)
+
+    def test_etag_changes_after_unit_update(self):
+        unit = Unit.objects.get(pk=self.units[0].pk)
+
+        def write():
+            unit.deskripsi = 'kiri'
+            unit.save()
+        self._assert_changes(write)
+
+    def test_etag_changes_after_image_update(self):
+        image = Image.objects.filter(unit=self.units[0], is_primary=False).first()
+
+        def write():
+            image.is_primary = True
+            image.save()
+        self._assert_changes(write)
+
+    def test_etag_changes_after_image_delete(self):
+        self._assert_changes(lambda: Image.objects.filter(unit=self.units[0], is_primary=False).delete())
+
+
+@override_settings(SYNC_LAG_SECONDS=0)
+class SnapshotTests(ApiTestCase):
+    """build_snapshot: manifest, file gzip dan R*Tree gedung_rtree"""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        patcher = override_settings(SNAPSHOT_DIR=self.directory)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def _open(self, manifest):
+        """Ekstrak snapshot yang dipublish ke file sqlite sementara"""
+        path = self.directory / 'check.sqlite3'
+        with gzip.open(self.directory / manifest['file'], 'rb') as src, open(path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        db = sqlite3.connect(path)
+        self.addCleanup(db.close)
+        return db
+
+    def _rtree_ids(self, db, lat_min, lat_max, long_min, long_max):
+        return sorted(row[0] for row in db.execute(
+            'SELECT id FROM gedung_rtree WHERE min_lat >= ? AND max_lat <= ? AND min_long >= ? AND max_long <= ?',
+            [lat_min, lat_max, long_min, long_max]
+        ))
+
+    def test_build_publishes_manifest_and_rtree(self):
+        manifest, changes = build_snapshot()
+        self.assertEqual(manifest['version'], 1)
+        self.assertEqual(manifest['file'], 'snapshot-v1.sqlite3.gz')
+        self.assertEqual(read_manifest(), manifest)
+        self.assertGreater(changes, 0)
+
+        content = (self.directory / manifest['file']).read_bytes()
+        self.assertEqual(manifest['size'], len(content))
+        self.assertEqual(manifest['sha256'], hashlib.sha256(content).hexdigest())
+
+        db = self._open(manifest)
+        self.assertEqual(db.execute('SELECT COUNT(*) FROM gedung').fetchone()[0], len(self.gedungs))
+        self.assertEqual(db.execute('SELECT COUNT(*) FROM unit').fetchone()[0], len(self.units))
+        # Kotak yang hanya memuat gedung 1..3
+        self.assertEqual(
+            self._rtree_ids(db, 30.0505, 30.0535, 31.3505, 31.3535),
+            [g.id for g in self.gedungs[1:4]]
+        )
+
+    def test_incremental_build_updates_rtree(self):
+        build_snapshot()
+        # Tanpa perubahan versi lama dipakai ulang
+        manifest, changes = build_snapshot()
+        self.assertEqual((manifest['version'], changes), (1, 0))
+
+        moved, deleted = self.gedungs[0], self.gedungs[5]
+        with self.captureOnCommitCallbacks(execute=True):
+            gedung = Gedung.objects.get(pk=moved.pk)
+            gedung.lat, gedung.long = 10.0, 20.0
+            gedung.save()
+            Gedung.objects.get(pk=deleted.pk).delete()
+
+        manifest, changes = build_snapshot()
+        self.assertEqual(manifest['version'], 2)
+        db = self._open(manifest)
+        self.assertEqual(self._rtree_ids(db, 9.9, 10.1, 19.9, 20.1), [moved.id])
+        self.assertEqual(self._rtree_ids(db, 30.0, 30.1, 31.3, 31.4), [g.id for g in self.gedungs[1:5]])
+        self.assertIsNone(db.execute('SELECT id FROM gedung WHERE id = ?', [deleted.id]).fetchone())
+
+    def test_download(self):
+        self.assertEqual(self.client.get('/api/snapshot').status_code, 404)
+
+        manifest, _ = build_snapshot()
+        response = self.client.get('/api/snapshot')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(hashlib.sha256(b''.join(response.streaming_content)).hexdigest(), manifest['sha256'])
+        response.close()
+
+        cached = self.client.get('/api/snapshot', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+
+class NearestTests(SimpleTestCase):
+    """GedungGridIndex.nearest (expanding-ring) dibandingkan brute-force haversine"""
+
+    def setUp(self):
+        rng = random.Random(5)
+        # Campuran titik rapat (satu kota) dan tersebar, termasuk dekat kutub dan +-180
+        self.points = [(i, rng.uniform(-90, 90), rng.uniform(-180, 180)) for i in range(200)]
+        self.points += [(1000 + i, 30.05 + rng.uniform(-0.05, 0.05), 31.35 + rng.uniform(-0.05, 0.05)) for i in range(300)]
+        self.points += [(2000, 0.0, 179.995), (2001, 0.0, -179.999), (2002, 89.999, 0.0), (2003, -89.999, 90.0)]
+        self.index = GedungGridIndex(0.01)
+        self.index.load(self.points)
+
+    def _brute_force(self, lat, long, k):
+        distances = sorted((haversine_distance(lat, long, p_lat, p_long), gedung_id) for gedung_id, p_lat, p_long in self.points)
+        return distances[:k]
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        queries = [(30.05, 31.35), (30.2, 31.5), (0.0, 179.9999), (0.0, -179.9999), (89.9999, 45.0), (-89.9999, -45.0)]
+        queries += [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(20)]
+        for lat, long in queries:
+            for k in (1, 7, 60):
+                with self.subTest(lat=lat, long=long, k=k):
+                    ids, distances = self.index.nearest(lat, long, k)
+                    expected = self._brute_force(lat, long, k)
+                    self.assertEqual(ids.tolist(), [gedung_id for _, gedung_id in expected])
+                    np.testing.assert_allclose(distances, [d for d, _ in expected], rtol=1e-9, atol=1e-6)
+
+    def test_crosses_antimeridian(self):
+        ids, _ = self.index.nearest(0.0, 179.9999, 1)
+        self.assertEqual(ids.tolist(), [2001])
+
+    def test_k_larger_than_index(self):
+        ids, distances = self.index.nearest(30.05, 31.35, len(self.points) + 10)
+        self.assertEqual(sorted(ids.tolist()), sorted(gedung_id for gedung_id, _, _ in self.points))
+        self.assertTrue(np.all(np.diff(distances) >= 0))
+
+    def test_empty_index(self):
+        index = GedungGridIndex(0.01)
+        index.load([])
+        ids, distances = index.nearest(30.05, 31.35, 5)
+        self.assertEqual((ids.size, distances.size), (0, 0))
+
+
+class GedungIndexRebuildTests(SimpleTestCase):
+    """Rebuild background setelah GEDUNG_INDEX_MAX_AGE: request tetap dilayani index lama"""
+
+    def setUp(self):
+        reset_gedung_index()
+        self.addCleanup(reset_gedung_index)
+        self.threads = []
+        real_thread = threading.Thread
+
+        def record_thread(*args, **kwargs):
+            thread = real_thread(*args, **kwargs)
+            self.threads.append(thread)
+            return thread
+        patcher = mock.patch('apps.api.spatial.threading.Thread', side_effect=record_thread)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _index(self, rows):
+        index = GedungGridIndex(0.01)
+        index.load(rows)
+        return index
+
+    def _ids(self, index):
+        ids, _ = index.nearest(30.05, 31.35, 100)
+        return sorted(ids.tolist())
+
+    def _wait(self):
+        for thread in self.threads:
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+
+    def test_rebuild_replays_local_changes(self):
+        old = self._index([(1, 30.05, 31.35), (2, 30.06, 31.36)])
+        release = threading.Event()
+
+        def build():
+            # Snapshot database diambil sebelum perubahan lokal di bawah
+            new = self._index([(1, 30.05, 31.35), (2, 30.06, 31.36), (3, 30.07, 31.37)])
+            release.wait(5)
+            return new
+
+        with mock.patch('apps.api.spatial._build_index', return_value=old) as build_index, \
+                override_settings(GEDUNG_INDEX_MAX_AGE=0):
+            self.assertIs(get_gedung_index(), old)
+
+            build_index.side_effect = build
+            # Index kadaluarsa: dikembalikan langsung, rebuild di thread
+            self.assertIs(get_gedung_index(), old)
+            self.assertEqual(len(self.threads), 1)
+            # Rebuild sedang berjalan: tidak ada thread kedua
+            self.assertIs(get_gedung_index(), old)
+            self.assertEqual(len(self.threads), 1)
+
+            old.upsert(4, 30.08, 31.38)
+            old.remove(2)
+            release.set()
+            self._wait()
+
+        index = get_loaded_gedung_index()
+        self.assertIsNot(index, old)
+        self.assertEqual(self._ids(index), [1, 3, 4])
+        self.assertIsNone(old._journal)
+
+    def test_failed_rebuild_keeps_old_index(self):
+        old = self._index([(1, 30.05, 31.35)])
+        with mock.patch('apps.api.spatial._build_index', side_effect=[old, RuntimeError('db down')]), \
+                override_settings(GEDUNG_INDEX_MAX_AGE=0), self.assertLogs('apps.api.spatial', 'ERROR'):
+            get_gedung_index()
+            self.assertIs(get_gedung_index(), old)
+            self._wait()
+
+        self.assertIs(get_loaded_gedung_index(), old)
+        self.assertIsNone(old._journal)
+        self.assertFalse(spatial._rebuilding)
+
+
+class ClusterIndexTests(SimpleTestCase):
+    """Level cluster dibandingkan pengelompokan brute-force per cell"""
+
+    ROWS = [
+        (30.05, 31.35, 2), (30.051, 31.352, 0), (30.2, 31.1, 1), (-33.87, 151.21, 3),
+        (-33.86, 151.2, 0), (40.71, -74.0, 1), (-0.001, -0.001, 4), (0.001, 0.001, 0),
+    ]
+
+    def _expected(self, zoom, rows):
+        size = cell_size(zoom)
+        cells = {}
+        for lat, long, blacklisted in rows:
+            cells.setdefault((floor(lat / size), floor(long / size)), []).append((lat, long, blacklisted))
+        return sorted(
+            (len(members), sum(m[2] for m in members), sum(m[0] for m in members) / len(members), sum(m[1] for m in members) / len(members))
+            for members in cells.values()
+        )
+
+    def _actual(self, clusters):
+        return sorted((c['count'], c['blacklisted_units'], c['lat'], c['long']) for c in clusters)
+
+    def assertClusters(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        for got, want in zip(actual, expected):
+            self.assertEqual(got[:2], want[:2])
+            self.assertAlmostEqual(got[2], want[2], places=9)
+            self.assertAlmostEqual(got[3], want[3], places=9)
+
+    def test_counts_and_centroids_per_zoom(self):
+        index = ClusterIndex(self.ROWS)
+        self.assertEqual(sorted(index.levels), list(range(cluster_max_zoom())))
+        for zoom in range(cluster_max_zoom()):
+            with self.subTest(zoom=zoom):
+                clusters = index.query(zoom, -90, 90, -180, 180)
+                self.assertClusters(self._actual(clusters), self._expected(zoom, self.ROWS))
+                self.assertEqual(sum(c['count'] for c in clusters), len(self.ROWS))
+
+        # Zoom 0: cell 90 derajat, titik di sekitar (0, 0) terpisah ke empat kuadran
+        self.assertEqual(len(index.query(0, -90, 90, -180, 180)), 4)
+        # Zoom 16: cell ~0.0014 derajat, setiap titik punya cell sendiri
+        self.assertEqual(len(index.query(16, -90, 90, -180, 180)), len(self.ROWS))
+
+    def test_bbox_selects_intersecting_cells(self):
+        index = ClusterIndex(self.ROWS)
+        zoom = 10
+        clusters = index.query(zoom, 29.9, 30.3, 31.0, 31.5)
+        cairo = [row for row in self.ROWS if 29.9 <= row[0] <= 30.3 and 31.0 <= row[1] <= 31.5]
+        self.assertClusters(self._actual(clusters), self._expected(zoom, cairo))
+
+    def test_zoom_above_max_uses_deepest_level(self):
+        index = ClusterIndex(self.ROWS)
+        deepest = index.query(cluster_max_zoom() - 1, -90, 90, -180, 180)
+        self.assertEqual(index.query(22, -90, 90, -180, 180), deepest)
+
+    def test_empty(self):
+        self.assertEqual(ClusterIndex([]).query(5, -90, 90, -180, 180), [])
+
+
+class ClusterInvalidationTests(ApiTestCase):
+    """Cluster worker dihitung ulang setelah gedung dipindah/dihapus (on_commit)"""
+
+    def _world(self, zoom=0):
+        return get_cluster_index().query(zoom, -90, 90, -180, 180)
+
+    def test_move_and_delete(self):
+        before = self._world()
+        self.assertEqual([(c['count'], c['blacklisted_units']) for c in before], [(6, 12)])
+        self.assertAlmostEqual(before[0]['lat'], sum(g.lat_float for g in self.gedungs) / 6)
+
+        index = get_cluster_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            gedung = Gedung.objects.get(pk=self.gedungs[0].pk)
+            gedung.lat, gedung.long = -33.87, 151.21
+            gedung.save()
+        self.assertIsNot(get_cluster_index(), index)
+        self.assertEqual(
+            sorted((c['count'], c['blacklisted_units'], round(c['lat'], 6)) for c in self._world()),
+            [(1, 2, -33.87), (5, 10, round(sum(g.lat_float for g in self.gedungs[1:]) / 5, 6))]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Gedung.objects.get(pk=self.gedungs[1].pk).delete()
+        self.assertEqual(sorted(c['count'] for c in self._world()), [1, 4])
+
+    def test_unit_blacklist_change(self):
+        self._world()
+        with self.captureOnCommitCallbacks(execute=True):
+            unit = Unit.objects.get(pk=self.units[0].pk)
+            unit.listing_type = 'blacklist'
+            unit.save()
+        self.assertEqual(self._world()[0]['blacklisted_units'], 13)
+
+    def test_endpoint_reflects_move(self):
+        url = '/api/gedung/clusters?bbox=31.0,29.8,31.7,30.4&zoom=5'
+        self.assertEqual(self.client.get(url).json()['count'], 6)
+        with self.captureOnCommitCallbacks(execute=True):
+            Gedung.objects.get(pk=self.gedungs[0].pk).delete()
+        self.assertEqual(self.client.get(url).json()['count'], 5)
@@ -1,8 +1,15 @@
 from math import radians, cos, sin, asin, sqrt
 import os
+import numpy as np
 from ninja.security import APIKeyHeader
 from ninja.errors import HttpError
 
+from apps.api.metrics import API_KEY_REQUESTS
+from apps.api.ratelimit import RateLimitExceeded, api_key_id, check_rate_limit, rate_limit_enabled
+
+# Radius bumi dalam meter
+EARTH_RADIUS = 6371000
+
 
 def haversine_distance(lat1, lon1, lat2, lon2):
     """
@@ -18,10 +25,30 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
     c = 2 * asin(sqrt(a))
     
-    # Radius bumi dalam meter
-    r = 6371000
-    
-    return c * r
+    return c * EARTH_RADIUS
+
+
+def haversine_distances(lat, lon, lats, lons):
+    """
+    Versi batch dari haversine_distance untuk banyak kandidat sekaligus.
+
+    Args:
+        lat, lon: titik pusat (float), atau array kolom shape (P, 1)
+            untuk P titik sekaligus (hasil di-broadcast jadi matrix P x N)
+        lats, lons: NumPy array koordinat kandidat
+
+    Return: NumPy array jarak dalam meter
+    """
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2 = np.radians(lats)
+    lon2 = np.radians(lons)
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    return c * EARTH_RADIUS
 
 
 def get_bounding_box(lat, lon, radius_meters):
@@ -39,28 +66,62 @@ def get_bounding_box(lat, lon, radius_meters):
     # 1 derajat latitude ≈ 111,000 meter
     # 1 derajat longitude ≈ 111,000 * cos(latitude) meter
     
+    # Latitude di-clamp ke [-90, 90]. Dekat kutub (atau radius yang menutup
+    # kutub) cos(lat) mendekati 0: longitude langsung dibuat satu putaran penuh.
+    # Di luar itu lon_min/lon_max bisa melewati +-180 (melintasi antimeridian),
+    # lihat split_antimeridian.
     lat_degree = radius_meters / 111000
-    lon_degree = radius_meters / (111000 * cos(radians(lat)))
+    lat_min, lat_max = max(lat - lat_degree, -90.0), min(lat + lat_degree, 90.0)
+    
+    cos_lat = cos(radians(min(abs(lat), 90.0)))
+    if lat_min <= -90 or lat_max >= 90 or radius_meters >= 180 * 111000 * cos_lat:
+        lon_min, lon_max = -180.0, 180.0
+    else:
+        lon_degree = radius_meters / (111000 * cos_lat)
+        lon_min, lon_max = lon - lon_degree, lon + lon_degree
     
     return {
-        'lat_min': lat - lat_degree,
-        'lat_max': lat + lat_degree,
-        'lon_min': lon - lon_degree,
-        'lon_max': lon + lon_degree
+        'lat_min': lat_min,
+        'lat_max': lat_max,
+        'lon_min': lon_min,
+        'lon_max': lon_max
     }
 
+
+def split_antimeridian(lat_min, lat_max, lon_min, lon_max):
+    """
+    Pecah bounding box yang melewati +-180 menjadi bounding box di dalam [-180, 180].
+    
+    Returns:
+        list: tuple (lat_min, lat_max, lon_min, lon_max)
+    """
+    if lon_max - lon_min >= 360:
+        return [(lat_min, lat_max, -180.0, 180.0)]
+    if lon_min < -180:
+        return [(lat_min, lat_max, lon_min + 360, 180.0), (lat_min, lat_max, -180.0, lon_max)]
+    if lon_max > 180:
+        return [(lat_min, lat_max, lon_min, 180.0), (lat_min, lat_max, -180.0, lon_max - 360)]
+    return [(lat_min, lat_max, lon_min, lon_max)]
+
 # API Keys khusus Imarah Blacklist API (inter-app)
-IMARAH_ALLOWED_API_KEYS = []
-api_keys_str = os.getenv('APIKEY_IMARAH_BLACKLIST')
-if api_keys_str:
-    IMARAH_ALLOWED_API_KEYS = [k.strip() for k in api_keys_str.split(',')]
+# Dimuat sekali saat startup; frozenset agar lookup key O(1)
+IMARAH_ALLOWED_API_KEYS = frozenset(
+    k.strip() for k in os.getenv('APIKEY_IMARAH_BLACKLIST', '').split(',') if k.strip()
+)
 
 class ImarahApiKeyAuth(APIKeyHeader):
     param_name = 'X-API-Key'
     
-    def authenticate(self, request, key):
+    async def authenticate(self, request, key):
         if not IMARAH_ALLOWED_API_KEYS:
             raise HttpError(503, "No API keys configured")
-        if key in IMARAH_ALLOWED_API_KEYS:
-            return key
-        raise HttpError(401, "Invalid")
+        if key not in IMARAH_ALLOWED_API_KEYS:
+            raise HttpError(401, "Invalid")
+        if rate_limit_enabled():
+            try:
+                await check_rate_limit(key)
+            except RateLimitExceeded:
+                API_KEY_REQUESTS.labels(api_key_id(key), 'rate_limited').inc()
+                raise
+        API_KEY_REQUESTS.labels(api_key_id(key), 'allowed').inc()
+        return key
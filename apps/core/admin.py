@@ -3,6 +3,9 @@ from django.contrib.contenttypes.admin import GenericTabularInline
 from django.utils.html import format_html
 from apps.core.models import Lokasi, Gedung, Pemilik, Agen, Unit, Image, Distrik
 from apps.core.forms import GedungAdminForm
+from apps.core.utils import normalize_phone
+from apps.core.search import search_filter
+from apps.core.fuzzy import fuzzy_search
 
 # Inline
 
@@ -12,9 +15,15 @@ class ImageInline(GenericTabularInline):
     fields = ['image', 'is_primary', 'image_preview']
     readonly_fields = ['image_preview']
     
+    def get_queryset(self, request):
+        # Image.__str__ membaca content_object (satu query per baris tanpa prefetch)
+        return super().get_queryset(request).prefetch_related('content_object')
+    
     def image_preview(self, obj):
         if obj.pk and obj.image:
-            return format_html('<img src="{}" style="max-height: 100px;" />', obj.image.url)
+            # Preview dari variant thumb, bukan original yang bisa sampai 5000px
+            url = obj.image.storage.url(obj.variant_name('thumb'))
+            return format_html('<img src="{}" style="max-height: 100px;" />', url)
         return "-"
     image_preview.short_description = 'Preview'
 
@@ -70,6 +79,31 @@ class UnitInline(admin.TabularInline):
     def has_delete_permission(self, request, obj=None):
         return False
 
+class PhoneSearchMixin:
+    """Search admin juga mencocokkan nomor telepon ternormalisasi (format apa pun)"""
+    
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        normalized = normalize_phone(search_term)
+        if normalized and len(normalized) >= 8:
+            results |= queryset.filter(no_telp_normalized=normalized)
+        return results, may_have_duplicates
+
+
+class FuzzyNameSearchMixin:
+    """
+    Search admin (termasuk autocomplete di UnitAdmin) juga mencocokkan
+    nama/julukan dengan ejaan berbeda lewat index trigram
+    """
+    
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if len(search_term.strip()) >= 3:
+            matches = fuzzy_search(self.model, search_term, limit=50)
+            if matches:
+                results |= queryset.filter(id__in=[obj_id for obj_id, _ in matches])
+        return results, may_have_duplicates
+
 @admin.register(Distrik)
 class DistrikAdmin(admin.ModelAdmin):
     list_display = ['nama', 'kode', 'created_at']
@@ -82,6 +116,11 @@ class LokasiAdmin(admin.ModelAdmin):
     list_filter = ['distrik']
     search_fields = ['nama', 'distrik__nama']
     autocomplete_fields = ['distrik']
+    list_select_related = ['distrik']
+    
+    def get_queryset(self, request):
+        # Lokasi.__str__ membaca distrik.nama (juga dipakai autocomplete Gedung)
+        return super().get_queryset(request).select_related('distrik')
 
 
 
@@ -90,11 +129,17 @@ class GedungAdmin(admin.ModelAdmin):
     form = GedungAdminForm
     list_display = ['nama_gedung', 'lokasi', 'alamat', 'lat', 'long', 'created_at']
     list_filter = ['lokasi__distrik', 'created_at']
-    search_fields = ['nama_gedung', 'alamat', 'lokasi__lokasi_name']
+    search_fields = ['nama_gedung', 'alamat', 'lokasi__nama', 'lokasi__distrik__nama']
     autocomplete_fields = ['lokasi']
-    list_select_related = ['lokasi']
+    list_select_related = ['lokasi__distrik']
     inlines = [ImageInline, UnitInline]
     
+    def get_search_results(self, request, queryset, search_term):
+        # Pakai index full-text (search_document) daripada icontains per field
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(search_filter(search_term)), False
+    
     fieldsets = (
         ('Informasi Gedung', {
             'fields': ('lokasi', 'nama_gedung', 'alamat')
@@ -106,14 +151,14 @@ class GedungAdmin(admin.ModelAdmin):
 
 
 @admin.register(Pemilik)
-class PemilikAdmin(admin.ModelAdmin):
+class PemilikAdmin(FuzzyNameSearchMixin, PhoneSearchMixin, admin.ModelAdmin):
     list_display = ['nama', 'julukan', 'no_telp', 'status', 'created_at']
     list_filter = ['status']
     search_fields = ['nama', 'julukan', 'no_telp']
 
 
 @admin.register(Agen)
-class AgenAdmin(admin.ModelAdmin):
+class AgenAdmin(FuzzyNameSearchMixin, PhoneSearchMixin, admin.ModelAdmin):
     list_display = ['nama', 'julukan', 'no_telp', 'status', 'created_at']
     list_filter = ['status']
     search_fields = ['nama', 'julukan', 'no_telp']
@@ -63,6 +63,9 @@ class GedungAdminForm(forms.ModelForm):
             lat_str, long_str = coords.split(',')
             instance.lat = float(lat_str.strip())
             instance.long = float(long_str.strip())
+            # Kolom float untuk API dan spatial index
+            instance.lat_float = instance.lat
+            instance.long_float = instance.long
         
         if commit:
             instance.save()
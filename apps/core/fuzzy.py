@@ -0,0 +1,222 @@
+"""
+Fuzzy matching nama/julukan pemilik dan agen berbasis trigram.
+
+Nama yang sama sering ditulis dengan ejaan berbeda (Mohamed / Muhammad,
+Abu Ahmad / Abou Ahmed), jadi pencarian substring tidak cukup. Similarity
+dihitung seperti pg_trgm: setiap kata dipad ("  kata "), dipecah menjadi
+trigram, lalu skor = trigram sama / gabungan trigram.
+
+- PostgreSQL: query langsung dengan similarity() pg_trgm (GIN index dari
+  migration).
+- Database lain: index trigram in-memory per worker (lihat TrigramIndex),
+  di-update lewat signal dan di-rebuild berkala seperti spatial index.
+"""
+import re
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+from django.db import connection, transaction
+
+
+def normalize_name(value):
+    """Lowercase, tanpa diakritik dan tanda baca (pemisah kata jadi satu spasi)"""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(re.findall(r'\w+', value.lower()))
+
+
+def trigrams(value):
+    """Set trigram gaya pg_trgm dari sebuah nama"""
+    grams = set()
+    for word in normalize_name(value).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    """Similarity trigram antara dua string (0-1)"""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    shared = len(grams_a & grams_b)
+    return shared / (len(grams_a) + len(grams_b) - shared)
+
+
+def fuzzy_threshold():
+    return getattr(settings, 'FUZZY_NAME_THRESHOLD', 0.3)
+
+
+class TrigramIndex:
+    """
+    Inverted index trigram -> id untuk satu model (Pemilik atau Agen).
+
+    Setiap id bisa punya beberapa nama (nama dan julukan); skor id adalah
+    skor nama terbaiknya. Query hanya membaca posting list trigram yang
+    ada di query, jadi tidak perlu membandingkan dengan semua baris.
+    """
+
+    def __init__(self):
+        self.loaded_at = None
+        self._names = {}     # id -> list set trigram per nama
+        self._postings = {}  # trigram -> set(id)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def load(self, rows):
+        """Rebuild seluruh index dari iterable (id, nama, julukan)"""
+        names = {}
+        postings = {}
+        for obj_id, *values in rows:
+            grams = [g for g in (trigrams(value) for value in values) if g]
+            names[obj_id] = grams
+            for gram in set().union(*grams):
+                postings.setdefault(gram, set()).add(obj_id)
+
+        with self._lock:
+            self._names = names
+            self._postings = postings
+            self.loaded_at = time.monotonic()
+
+    def upsert(self, obj_id, *values):
+        grams = [g for g in (trigrams(value) for value in values) if g]
+        with self._lock:
+            self._discard(obj_id)
+            self._names[obj_id] = grams
+            for gram in set().union(*grams):
+                self._postings.setdefault(gram, set()).add(obj_id)
+
+    def remove(self, obj_id):
+        with self._lock:
+            self._discard(obj_id)
+
+    def _discard(self, obj_id):
+        for gram in set().union(*self._names.pop(obj_id, [])):
+            members = self._postings.get(gram)
+            if members is not None:
+                members.discard(obj_id)
+                if not members:
+                    del self._postings[gram]
+
+    def search(self, query, limit, threshold):
+        """
+        Returns:
+            list: (id, skor) urut dari skor tertinggi
+        """
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        with self._lock:
+            candidates = set()
+            for gram in query_grams:
+                candidates.update(self._postings.get(gram, ()))
+
+            scores = []
+            for obj_id in candidates:
+                score = max(
+                    len(query_grams & grams) / len(query_grams | grams)
+                    for grams in self._names[obj_id]
+                )
+                if score >= threshold:
+                    scores.append((obj_id, score))
+
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        return scores[:limit]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_name_index(model):
+    """
+    Return index trigram model ini di worker ini, build saat pertama dipakai.
+
+    Signal hanya meng-update worker yang menerima perubahan, jadi index
+    di-rebuild penuh setelah FUZZY_INDEX_MAX_AGE detik.
+    """
+    max_age = getattr(settings, 'FUZZY_INDEX_MAX_AGE', 300)
+
+    index = _indexes.get(model)
+    if index is not None and time.monotonic() - index.loaded_at < max_age:
+        return index
+
+    with _indexes_lock:
+        index = _indexes.get(model)
+        if index is None or time.monotonic() - index.loaded_at >= max_age:
+            index = TrigramIndex()
+            index.load(model.objects.values_list('id', 'nama', 'julukan').iterator())
+            _indexes[model] = index
+    return index
+
+
+def get_loaded_name_index(model):
+    """Return index jika sudah di-build di worker ini, tanpa memicu query"""
+    return _indexes.get(model)
+
+
+def reset_name_indexes():
+    with _indexes_lock:
+        _indexes.clear()
+
+
+def _search_postgres(model, query, limit, threshold):
+    table = model._meta.db_table
+    # Operator % memakai index GIN trigram. Threshold diset lokal per transaksi
+    # (set_config(..., true)), jadi kedua statement harus di transaksi yang sama:
+    # di autocommit setting sudah hilang sebelum query jalan.
+    sql = f"""
+        SELECT id, GREATEST(similarity(nama, %s), similarity(COALESCE(julukan, ''), %s)) AS score
+        FROM {table}
+        WHERE nama %% %s OR julukan %% %s
+        ORDER BY score DESC, id
+        LIMIT %s
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true)", [str(threshold)])
+        cursor.execute(sql, [query, query, query, query, limit])
+        return [(obj_id, score) for obj_id, score in cursor.fetchall() if score >= threshold]
+
+
+def fuzzy_search(model, query, limit=20, threshold=None):
+    """
+    Cari Pemilik/Agen yang nama atau julukannya mirip query.
+
+    Returns:
+        list: (id, skor) urut dari skor tertinggi
+    """
+    threshold = fuzzy_threshold() if threshold is None else threshold
+    if connection.vendor == 'postgresql':
+        return _search_postgres(model, query, limit, threshold)
+    return get_name_index(model).search(query, limit, threshold)
+
+
+# Index pg_trgm untuk migration (database lain memakai index in-memory)
+
+_NAME_TABLES = ('pemilik', 'agen')
+
+
+def create_name_indexes(schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in _NAME_TABLES:
+        for column in ('nama', 'julukan'):
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm_idx ON {table} USING GIN ({column} gin_trgm_ops)'
+            )
+
+
+def drop_name_indexes(schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in _NAME_TABLES:
+        for column in ('nama', 'julukan'):
+            schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm_idx')
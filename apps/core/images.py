@@ -0,0 +1,119 @@
+"""
+Variant gambar (thumb, medium) untuk response API.
+
+Original bisa sampai 5000x5000 (validate_image_file), terlalu besar untuk
+list nearby dan detail. Setiap kali file Image diganti, variant yang
+sudah diperkecil dibuat setelah transaksi commit (Image.build_variants):
+orientasi EXIF diterapkan ke pixel lalu metadata (EXIF, GPS, ICC)
+dibuang. Variant file lama dan variant gambar yang dihapus ikut dihapus
+dari storage. Variant disimpan di samping original dengan layout
+image_upload_path yang sama:
+
+    images/gedung_x/2026/10/abc123.jpg
+    images/gedung_x/2026/10/abc123_thumb.webp
+    images/gedung_x/2026/10/abc123_medium.webp
+"""
+import io
+import logging
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image as PILImage, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+ORIGINAL = 'original'
+
+
+def variant_sizes():
+    """{nama variant: sisi terpanjang (pixel)}"""
+    return getattr(settings, 'IMAGE_VARIANTS', {'thumb': 320, 'medium': 1024})
+
+
+def image_sizes():
+    """Pilihan ukuran gambar untuk API: semua variant + original"""
+    return (*variant_sizes(), ORIGINAL)
+
+
+def variant_format():
+    """Format variant: WEBP, atau JPEG jika Pillow dibuild tanpa WebP"""
+    fmt = getattr(settings, 'IMAGE_VARIANT_FORMAT', 'WEBP').upper()
+    if fmt == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return fmt
+
+
+def variant_path(name, variant, fmt):
+    """Nama file variant di folder yang sama dengan original"""
+    stem, _ = posixpath.splitext(name)
+    extension = 'webp' if fmt == 'WEBP' else 'jpg'
+    return f'{stem}_{variant}.{extension}'
+
+
+def render_variant(img, max_side, fmt, quality):
+    """
+    Perkecil gambar (tidak pernah diperbesar) dan encode tanpa metadata.
+
+    Returns:
+        bytes
+    """
+    img = img.copy()
+    img.thumbnail((max_side, max_side), PILImage.LANCZOS)
+
+    if fmt == 'JPEG' or img.mode not in ('RGB', 'RGBA'):
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        if fmt == 'WEBP' and has_alpha:
+            img = img.convert('RGBA')
+        elif has_alpha:
+            # JPEG tanpa alpha: transparansi jadi putih
+            rgba = img.convert('RGBA')
+            img = PILImage.new('RGB', img.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba)
+        else:
+            img = img.convert('RGB')
+
+    buffer = io.BytesIO()
+    # exif/icc_profile tidak diteruskan, jadi file variant bersih dari metadata
+    if fmt == 'WEBP':
+        img.save(buffer, 'WEBP', quality=quality, method=4)
+    else:
+        img.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def generate_variants(field_file):
+    """
+    Buat semua variant untuk file Image.image yang sudah tersimpan.
+
+    Returns:
+        dict: {nama variant: nama file di storage}
+    """
+    fmt = variant_format()
+    quality = getattr(settings, 'IMAGE_VARIANT_QUALITY', 80)
+    storage = field_file.storage
+
+    with storage.open(field_file.name, 'rb') as f:
+        img = PILImage.open(f)
+        img.load()
+    img = ImageOps.exif_transpose(img)
+
+    variants = {}
+    for variant, max_side in variant_sizes().items():
+        name = variant_path(field_file.name, variant, fmt)
+        if storage.exists(name):
+            storage.delete(name)
+        variants[variant] = storage.save(name, ContentFile(render_variant(img, max_side, fmt, quality)))
+    return variants
+
+
+def delete_variants(storage, names):
+    """
+    Hapus file variant dari storage (file original diurus django-cleanup).
+    Gagal hapus hanya di-log: sisa file tidak dipakai lagi oleh API.
+    """
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.exception('Gagal menghapus variant %s', name)
@@ -0,0 +1,73 @@
+import random
+import time
+from bisect import bisect_left, bisect_right
+from math import cos, radians
+
+from django.core.management.base import BaseCommand
+
+from apps.core.utils import geocell_encode, geocell_ranges
+
+
+class Command(BaseCommand):
+    help = (
+        'Bandingkan jumlah baris index yang di-scan oleh composite index (lat, long) '
+        'vs range scan geocell untuk query nearby, pada dataset sintetis.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help='Jumlah gedung sintetis')
+        parser.add_argument('--queries', type=int, default=1000, help='Jumlah query nearby')
+        parser.add_argument('--radius', type=int, default=1000, help='Radius query dalam meter')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        radius = options['radius']
+
+        # Dataset: cluster di sekitar Kairo (default LeafletCoordinatesWidget)
+        centers = [(30.066 + rng.uniform(-0.15, 0.15), 31.328 + rng.uniform(-0.15, 0.15)) for _ in range(40)]
+        points = []
+        for _ in range(options['count']):
+            c_lat, c_long = rng.choice(centers)
+            points.append((rng.gauss(c_lat, 0.01), rng.gauss(c_long, 0.01)))
+
+        # Simulasi B-tree: entry index terurut sesuai key masing-masing
+        by_lat = sorted(points)
+        lat_keys = [p[0] for p in by_lat]
+        cell_keys = sorted(geocell_encode(lat, long) for lat, long in points)
+
+        composite_rows = geocell_rows = result_rows = 0
+        geocell_ranges_total = 0
+        started = time.perf_counter()
+
+        for _ in range(options['queries']):
+            lat, long = rng.choice(points)
+            lat_deg = radius / 111000
+            lon_deg = radius / (111000 * cos(radians(lat)))
+            lat_min, lat_max = lat - lat_deg, lat + lat_deg
+            lon_min, lon_max = long - lon_deg, long + lon_deg
+
+            # (lat, long): range scan hanya menyempit di kolom pertama (lat)
+            lo, hi = bisect_left(lat_keys, lat_min), bisect_right(lat_keys, lat_max)
+            composite_rows += hi - lo
+            result_rows += sum(1 for p in by_lat[lo:hi] if lon_min <= p[1] <= lon_max)
+
+            # geocell: beberapa range scan per prefix cell
+            ranges = geocell_ranges(lat_min, lat_max, lon_min, lon_max)
+            geocell_ranges_total += len(ranges)
+            for start, end in ranges:
+                geocell_rows += bisect_left(cell_keys, end) - bisect_left(cell_keys, start)
+
+        elapsed = time.perf_counter() - started
+        queries = options['queries']
+
+        self.stdout.write(f"Gedung: {options['count']}, query: {queries}, radius: {radius} m")
+        self.stdout.write(f"Rata-rata baris dalam bounding box : {result_rows / queries:.1f}")
+        self.stdout.write(f"Rata-rata baris di-scan (lat, long): {composite_rows / queries:.1f}")
+        self.stdout.write(f"Rata-rata baris di-scan geocell    : {geocell_rows / queries:.1f}")
+        self.stdout.write(f"Rata-rata range geocell per query  : {geocell_ranges_total / queries:.1f}")
+        if geocell_rows:
+            self.stdout.write(self.style.SUCCESS(
+                f"Geocell men-scan {composite_rows / geocell_rows:.1f}x lebih sedikit baris "
+                f"({elapsed:.2f}s simulasi)"
+            ))
@@ -0,0 +1,175 @@
+import io
+import random
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image as PILImage
+
+from apps.core.images import generate_variants
+from apps.core.models import Distrik, Lokasi, Gedung, Pemilik, Agen, Unit, Image
+from apps.core.utils import geocell_encode, normalize_phone
+
+# Prefix nama distrik sintetis, dipakai juga oleh --clear
+SYNTHETIC_PREFIX = 'Distrik Sintetis'
+
+DESKRIPSI = ['Sebelah kanan', 'Sebelah kiri', 'Pintu teralis', 'Di tengah', 'Depan lift', 'Ujung lorong']
+ALASAN = [
+    'Deposit tidak dikembalikan', 'Harga dinaikkan sepihak', 'Air sering mati',
+    'Pemilik mengusir sebelum kontrak habis', 'Kerusakan tidak diperbaiki', None,
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate dataset sintetis (distrik, lokasi, gedung, unit, image) dengan '
+        'distribusi koordinat ter-cluster di sekitar Kairo, untuk benchmark.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gedung', type=int, default=10000, help='Jumlah gedung')
+        parser.add_argument('--units-per-gedung', type=int, default=4, help='Rata-rata unit per gedung')
+        parser.add_argument('--images-per-unit', type=float, default=1.0, help='Rata-rata gambar per unit')
+        parser.add_argument('--distrik', type=int, default=8)
+        parser.add_argument('--lokasi-per-distrik', type=int, default=10)
+        parser.add_argument('--pemilik', type=int, default=500, help='Jumlah pemilik (dan agen)')
+        parser.add_argument('--center', type=float, nargs=2, default=(30.066, 31.328), metavar=('LAT', 'LONG'),
+                            help='Pusat dataset (default pusat LeafletCoordinatesWidget)')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help='Hapus dataset sintetis sebelumnya dulu')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self._clear()
+
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            lokasis = self._create_lokasi(rng, options)
+            pemiliks, agens = self._create_people(rng, options['pemilik'], batch_size)
+            gedungs = self._create_gedung(rng, options, lokasis, batch_size)
+            units = self._create_units(rng, options, gedungs, pemiliks, agens, batch_size)
+            images = self._create_images(rng, options, gedungs, units, batch_size)
+
+            # bulk_create tidak memanggil save()/signal: hitung ulang field denormalized
+            Gedung.recompute_denormalized([g.id for g in gedungs])
+            Unit.recompute_primary_image([u.id for u in units])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Dibuat {len(lokasis)} lokasi, {len(gedungs)} gedung, {len(units)} unit, {images} image'
+        ))
+
+    def _clear(self):
+        distriks = Distrik.objects.filter(nama__startswith=SYNTHETIC_PREFIX)
+        gedungs = Gedung.objects.filter(lokasi__distrik__in=distriks)
+        Image.objects.filter(
+            content_type=ContentType.objects.get_for_model(Unit), object_id__in=Unit.objects.filter(gedung__in=gedungs).values('id')
+        ).delete()
+        Image.objects.filter(
+            content_type=ContentType.objects.get_for_model(Gedung), object_id__in=gedungs.values('id')
+        ).delete()
+        distriks.delete()
+        Pemilik.objects.filter(nama__startswith='Pemilik Sintetis').delete()
+        Agen.objects.filter(nama__startswith='Agen Sintetis').delete()
+
+    def _create_lokasi(self, rng, options):
+        center_lat, center_long = options['center']
+        existing = Distrik.objects.filter(nama__startswith=SYNTHETIC_PREFIX).count()
+
+        lokasis = []
+        for d in range(options['distrik']):
+            distrik = Distrik.objects.create(nama=f'{SYNTHETIC_PREFIX} {existing + d + 1:02d}')
+            # Distrik tersebar ~15 km dari pusat, lokasi ~1.5 km dari pusat distrik
+            d_lat, d_long = center_lat + rng.gauss(0, 0.06), center_long + rng.gauss(0, 0.06)
+            for i in range(options['lokasi_per_distrik']):
+                lokasi = Lokasi.objects.create(distrik=distrik, nama=f'Hay {i + 1}')
+                lokasi.center = (d_lat + rng.gauss(0, 0.015), d_long + rng.gauss(0, 0.015))
+                lokasis.append(lokasi)
+        return lokasis
+
+    def _create_people(self, rng, count, batch_size):
+        def phone():
+            return f'+20 1{rng.choice("0125")}{rng.randint(0, 9)} {rng.randint(100, 999)} {rng.randint(1000, 9999)}'
+
+        pemiliks = [
+            Pemilik(nama=f'Pemilik Sintetis {i + 1}', julukan=rng.choice([None, f'Abu {i + 1}']), no_telp=phone())
+            for i in range(count)
+        ]
+        agens = [Agen(nama=f'Agen Sintetis {i + 1}', no_telp=phone()) for i in range(max(count // 5, 1))]
+        # Field turunan yang biasanya dihitung di save()
+        for person in pemiliks + agens:
+            person.no_telp_normalized = normalize_phone(person.no_telp)
+        return (
+            Pemilik.objects.bulk_create(pemiliks, batch_size=batch_size),
+            Agen.objects.bulk_create(agens, batch_size=batch_size),
+        )
+
+    def _create_gedung(self, rng, options, lokasis, batch_size):
+        # Ukuran lokasi tidak seragam: beberapa lokasi jauh lebih padat
+        weights = [rng.paretovariate(1.5) for _ in lokasis]
+
+        gedungs = []
+        for i, lokasi in enumerate(rng.choices(lokasis, weights=weights, k=options['gedung'])):
+            lat = round(lokasi.center[0] + rng.gauss(0, 0.004), 15)
+            long = round(lokasi.center[1] + rng.gauss(0, 0.004), 15)
+            gedung = Gedung(
+                lokasi=lokasi,
+                nama_gedung=f'Imarah {i + 1}' if rng.random() < 0.7 else None,
+                lat=Decimal(f'{lat:.15f}'),
+                long=Decimal(f'{long:.15f}'),
+                alamat=f'Street {rng.randint(1, 120)}, {lokasi.nama}',
+            )
+            # Field turunan yang biasanya dihitung di Gedung.save()
+            gedung.lat_float, gedung.long_float = float(gedung.lat), float(gedung.long)
+            gedung.geocell = geocell_encode(gedung.lat_float, gedung.long_float)
+            gedung.search_document = gedung.build_search_document()
+            gedungs.append(gedung)
+
+        return Gedung.objects.bulk_create(gedungs, batch_size=batch_size)
+
+    def _create_units(self, rng, options, gedungs, pemiliks, agens, batch_size):
+        average = options['units_per_gedung']
+        units = []
+        for gedung in gedungs:
+            lantai_max = rng.randint(3, 15)
+            count = round(rng.expovariate(1 / average)) if average else 0
+            for n in range(count):
+                listing_type = 'blacklist' if rng.random() < 0.7 else 'available'
+                units.append(Unit(
+                    gedung=gedung,
+                    pemilik=rng.choice(pemiliks),
+                    agen=rng.choice(agens) if rng.random() < 0.5 else None,
+                    deskripsi=rng.choice(DESKRIPSI),
+                    unit_number=str(n + 1),
+                    lantai=rng.randint(0, lantai_max),
+                    listing_type=listing_type,
+                    alasan_blacklist=rng.choice(ALASAN) if listing_type == 'blacklist' else None,
+                ))
+        return Unit.objects.bulk_create(units, batch_size=batch_size)
+
+    def _create_images(self, rng, options, gedungs, units, batch_size):
+        """Semua baris image memakai satu file placeholder agar generate tetap cepat"""
+        buffer = io.BytesIO()
+        PILImage.new('RGB', (64, 48), (200, 200, 200)).save(buffer, 'JPEG')
+        storage = Image._meta.get_field('image').storage
+        name = storage.save('images/synthetic/placeholder.jpg', ContentFile(buffer.getvalue()))
+        variants = generate_variants(Image(image=name).image)
+
+        gedung_type = ContentType.objects.get_for_model(Gedung)
+        unit_type = ContentType.objects.get_for_model(Unit)
+
+        images = []
+        for gedung in gedungs:
+            if rng.random() < 0.8:
+                images.append(Image(content_type=gedung_type, object_id=gedung.id, image=name, variants=variants, is_primary=True))
+        for unit in units:
+            count = round(rng.expovariate(1 / options['images_per_unit'])) if options['images_per_unit'] else 0
+            for n in range(count):
+                images.append(Image(content_type=unit_type, object_id=unit.id, image=name, variants=variants, is_primary=n == 0))
+
+        Image.objects.bulk_create(images, batch_size=batch_size)
+        return len(images)
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.images import delete_variants, variant_sizes
+from apps.core.models import Image
+
+
+class Command(BaseCommand):
+    help = 'Generate variant thumb/medium untuk gambar yang belum punya (mis. upload sebelum variant ada).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Generate ulang semua variant (setelah IMAGE_VARIANTS diubah)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        sizes = set(variant_sizes())
+        # File yang dipakai beberapa baris image cukup diproses sekali
+        generated = {}
+        updated = failed = 0
+
+        queryset = Image.objects.select_related('content_type').order_by('pk')
+        for image in queryset.iterator(chunk_size=options['batch_size']):
+            if not options['all'] and sizes <= set(image.variants):
+                continue
+
+            old_names = set(image.variants.values())
+            if image.image.name in generated:
+                image.variants = generated[image.image.name]
+            else:
+                image.refresh_variants()
+                generated[image.image.name] = image.variants
+
+            if not image.variants:
+                failed += 1
+                self.stderr.write(f'Image #{image.pk}: file {image.image.name} tidak bisa dibaca')
+                continue
+
+            # Hanya field variants (dan updated_at) yang disimpan; signal post_save
+            # tetap meng-invalidate cache nearby
+            image.save(update_fields=['variants', 'updated_at'])
+            # Variant yang tidak ada lagi di IMAGE_VARIANTS
+            delete_variants(image.image.storage, old_names - set(image.variants.values()))
+            updated += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Selesai: {updated} gambar di-update, {failed} gagal'))
@@ -0,0 +1,303 @@
+import csv
+import json
+import time
+from contextlib import nullcontext
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.api.sync import sync_lag_seconds
+from apps.core.models import Distrik, Lokasi, Gedung, Pemilik, Agen, Unit
+from apps.core.utils import geocell_encode, normalize_phone
+
+COORDINATE = Decimal('1e-15')
+LISTING_TYPES = {choice for choice, _ in Unit.LISTING_TYPE_CHOICES}
+UNIT_UPDATE_FIELDS = ['pemilik', 'agen', 'deskripsi', 'lantai', 'listing_type', 'alasan_blacklist', 'updated_at']
+
+
+class RowError(ValueError):
+    pass
+
+
+def _text(record, field, required=False, max_length=None):
+    value = record.get(field)
+    value = str(value).strip() if value is not None else ''
+    if required and not value:
+        raise RowError(f'{field} wajib diisi')
+    if max_length and len(value) > max_length:
+        raise RowError(f'{field} maksimal {max_length} karakter')
+    return value or None
+
+
+def _coordinate(record, field, limit):
+    try:
+        value = Decimal(str(record.get(field)).strip()).quantize(COORDINATE)
+    except (InvalidOperation, TypeError):
+        raise RowError(f'{field} bukan angka')
+    if not (-limit <= value <= limit):
+        raise RowError(f'{field} di luar jangkauan')
+    return value
+
+
+def _person_keys(nama, julukan, phone):
+    """Key lookup pemilik/agen: nomor telepon ternormalisasi, atau nama + julukan"""
+    keys = []
+    if phone:
+        keys.append(('telp', phone))
+    if nama:
+        keys.append(('nama', nama.lower(), (julukan or '').lower()))
+    return keys
+
+
+class Command(BaseCommand):
+    help = (
+        'Import gedung, unit, pemilik dan agen dari CSV/NDJSON (satu baris per unit), '
+        'streaming per batch. Unit di-upsert berdasarkan (gedung, unit_number); gedung dicocokkan '
+        'lewat gedung_uuid atau lokasi + koordinat dan tidak diubah jika sudah ada. '
+        'Worker yang berjalan melihat data baru setelah cache/index-nya kedaluwarsa.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File .csv atau .ndjson/.jsonl')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Default dari ekstensi file')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help='Validasi dan jalankan semua query lalu rollback')
+        parser.add_argument('--resume', action='store_true', help='Lanjutkan dari checkpoint import sebelumnya')
+        parser.add_argument('--checkpoint', help='File checkpoint (default <path>.checkpoint)')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'File tidak ditemukan: {path}')
+        file_format = options['format'] or ('csv' if path.suffix.lower() == '.csv' else 'ndjson')
+        checkpoint = Path(options['checkpoint'] or f'{path}.checkpoint')
+        dry_run = options['dry_run']
+
+        skip = 0
+        if options['resume'] and checkpoint.exists():
+            state = json.loads(checkpoint.read_text())
+            if state.get('file') != str(path.resolve()):
+                raise CommandError(f'Checkpoint {checkpoint} untuk file lain: {state.get("file")}')
+            skip = state['records']
+            self.stdout.write(f'Lanjut dari record {skip + 1}')
+
+        self._load_caches()
+        self.stats = {'records': skip, 'units': 0, 'gedung': 0, 'pemilik': 0, 'agen': 0, 'errors': 0}
+
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            records = islice(self._records(f, file_format), skip, None)
+            try:
+                # Setiap batch satu transaksi (checkpoint setelah commit); dry-run membungkus semuanya lalu rollback
+                with transaction.atomic() if dry_run else nullcontext():
+                    while batch := list(islice(records, options['batch_size'])):
+                        self._import_batch(batch)
+                        self.stats['records'] += len(batch)
+                        if not dry_run:
+                            checkpoint.write_text(json.dumps({'file': str(path.resolve()), 'records': self.stats['records']}))
+                        self.stderr.write(f"  {self.stats['records']} record, {self.stats['units']} unit")
+                    if dry_run:
+                        transaction.set_rollback(True)
+            except KeyboardInterrupt:
+                raise CommandError(f"Dihentikan setelah record {self.stats['records']}; jalankan ulang dengan --resume")
+
+        if not dry_run:
+            checkpoint.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"{'[dry-run] ' if dry_run else ''}{self.stats['records']} record: {self.stats['units']} unit, "
+            f"{self.stats['gedung']} gedung baru, {self.stats['pemilik']} pemilik baru, "
+            f"{self.stats['agen']} agen baru, {self.stats['errors']} error"
+        ))
+
+    def _records(self, f, file_format):
+        """Stream record (dict) dari file tanpa membaca semuanya ke memory"""
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield {'_error': 'JSON tidak valid'}
+
+    def _load_caches(self):
+        """Lookup in-memory untuk referensi yang sudah ada di database"""
+        self.distriks = {d.nama.lower(): d for d in Distrik.objects.all()}
+        self.lokasis = {
+            (lokasi.distrik_id, lokasi.nama.lower()): lokasi for lokasi in Lokasi.objects.select_related('distrik')
+        }
+        self.gedungs = {}
+        self.gedung_uuids = {}
+        for gedung_id, gedung_uuid, lokasi_id, lat, long in Gedung.objects.values_list('id', 'uuid', 'lokasi_id', 'lat', 'long').iterator():
+            self.gedungs[(lokasi_id, lat.quantize(COORDINATE), long.quantize(COORDINATE))] = gedung_id
+            self.gedung_uuids[str(gedung_uuid)] = gedung_id
+        self.people = {Pemilik: {}, Agen: {}}
+        for model, cache in self.people.items():
+            for person_id, nama, julukan, phone in model.objects.values_list('id', 'nama', 'julukan', 'no_telp_normalized').iterator():
+                for key in _person_keys(nama, julukan, phone):
+                    cache.setdefault(key, person_id)
+
+    def _lokasi(self, distrik_nama, lokasi_nama):
+        distrik = self.distriks.get(distrik_nama.lower())
+        if distrik is None:
+            distrik = self.distriks[distrik_nama.lower()] = Distrik.objects.create(nama=distrik_nama)
+        key = (distrik.id, lokasi_nama.lower())
+        lokasi = self.lokasis.get(key)
+        if lokasi is None:
+            lokasi = self.lokasis[key] = Lokasi.objects.create(distrik=distrik, nama=lokasi_nama)
+        return lokasi
+
+    def _parse(self, record):
+        """Validasi satu record; return dict nilai yang sudah dibersihkan"""
+        if '_error' in record:
+            raise RowError(record['_error'])
+
+        listing_type = (_text(record, 'listing_type') or 'blacklist').lower()
+        if listing_type not in LISTING_TYPES:
+            raise RowError(f'listing_type harus salah satu dari {", ".join(sorted(LISTING_TYPES))}')
+        try:
+            lantai = int(str(record.get('lantai')).strip())
+        except ValueError:
+            raise RowError('lantai bukan angka')
+        if lantai < 0:
+            raise RowError('lantai tidak boleh negatif')
+
+        people = {}
+        for prefix in ('pemilik', 'agen'):
+            nama = _text(record, f'{prefix}_nama', max_length=200)
+            no_telp = _text(record, f'{prefix}_no_telp', max_length=20)
+            julukan = _text(record, f'{prefix}_julukan', max_length=100)
+            people[prefix] = (nama, julukan, no_telp) if nama else None
+
+        return {
+            'distrik': _text(record, 'distrik', required=True, max_length=100),
+            'lokasi': _text(record, 'lokasi', required=True, max_length=200),
+            'gedung_uuid': _text(record, 'gedung_uuid'),
+            'nama_gedung': _text(record, 'nama_gedung', max_length=200),
+            'alamat': _text(record, 'alamat', required=True),
+            'lat': _coordinate(record, 'lat', 90),
+            'long': _coordinate(record, 'long', 180),
+            'unit_number': _text(record, 'unit_number', required=True, max_length=50),
+            'lantai': lantai,
+            'deskripsi': _text(record, 'deskripsi', required=True, max_length=50),
+            'listing_type': listing_type,
+            'alasan_blacklist': _text(record, 'alasan_blacklist'),
+            **people,
+        }
+
+    def _import_batch(self, batch):
+        rows = []
+        for number, record in enumerate(batch, self.stats['records'] + 1):
+            try:
+                rows.append(self._parse(record))
+            except RowError as exc:
+                self.stats['errors'] += 1
+                self.stderr.write(self.style.ERROR(f'Record {number}: {exc}'))
+
+        started = time.monotonic()
+        with transaction.atomic():
+            people = {prefix: self._resolve_people(rows, prefix, model) for prefix, model in (('pemilik', Pemilik), ('agen', Agen))}
+            gedung_ids = self._resolve_gedung(rows)
+
+            # Baris terakhir menang untuk (gedung, unit_number) yang sama di satu batch
+            units = {}
+            for index, row in enumerate(rows):
+                if gedung_ids[index] is None:
+                    continue
+                units[(gedung_ids[index], row['unit_number'])] = Unit(
+                    gedung_id=gedung_ids[index],
+                    unit_number=row['unit_number'],
+                    pemilik_id=people['pemilik'][index],
+                    agen_id=people['agen'][index],
+                    deskripsi=row['deskripsi'],
+                    lantai=row['lantai'],
+                    listing_type=row['listing_type'],
+                    alasan_blacklist=row['alasan_blacklist'],
+                )
+            Unit.objects.bulk_create(
+                units.values(), update_conflicts=True,
+                unique_fields=['gedung', 'unit_number'], update_fields=UNIT_UPDATE_FIELDS
+            )
+            self.stats['units'] += len(units)
+
+            # bulk_create tidak memanggil signal: hitung ulang counter gedung yang tersentuh
+            Gedung.recompute_denormalized({gedung_id for gedung_id, _ in units})
+
+        # updated_at di-stamp di awal transaksi; /api/sync hanya aman jika commit
+        # dalam SYNC_LAG_SECONDS (lihat apps/api/sync.py)
+        elapsed = time.monotonic() - started
+        if elapsed > sync_lag_seconds() / 2:
+            self.stderr.write(self.style.WARNING(
+                f'Batch butuh {elapsed:.0f} detik, mendekati SYNC_LAG_SECONDS ({sync_lag_seconds()}); '
+                f'perkecil --batch-size agar perubahan tidak terlewat client /api/sync'
+            ))
+
+    def _resolve_people(self, rows, prefix, model):
+        """Id pemilik/agen per baris; yang belum ada dibuat sekaligus dengan bulk_create"""
+        cache = self.people[model]
+        # Semua key orang baru didaftarkan, agar baris lain yang cocok lewat
+        # key mana pun (telepon atau nama + julukan) tidak membuat duplikat
+        pending = {}
+        new_people = []
+        for row in rows:
+            if row[prefix] is None:
+                continue
+            nama, julukan, no_telp = row[prefix]
+            phone = normalize_phone(no_telp)
+            keys = _person_keys(nama, julukan, phone)
+            if not any(key in cache or key in pending for key in keys):
+                person = model(nama=nama, julukan=julukan, no_telp=no_telp, no_telp_normalized=phone)
+                new_people.append(person)
+                for key in keys:
+                    pending[key] = person
+
+        for person in model.objects.bulk_create(new_people):
+            for key in _person_keys(person.nama, person.julukan, person.no_telp_normalized):
+                cache.setdefault(key, person.id)
+        self.stats[prefix] += len(new_people)
+
+        ids = []
+        for row in rows:
+            if row[prefix] is None:
+                ids.append(None)
+                continue
+            nama, julukan, no_telp = row[prefix]
+            keys = _person_keys(nama, julukan, normalize_phone(no_telp))
+            ids.append(next(cache[key] for key in keys if key in cache))
+        return ids
+
+    def _resolve_gedung(self, rows):
+        """Id gedung per baris (gedung_uuid atau lokasi + koordinat); gedung baru dibuat sekaligus"""
+        pending = {}
+        keys = []
+        for row in rows:
+            if row['gedung_uuid']:
+                keys.append(('uuid', row['gedung_uuid']))
+                continue
+            lokasi = self._lokasi(row['distrik'], row['lokasi'])
+            key = (lokasi.id, row['lat'], row['long'])
+            keys.append(key)
+            if key not in self.gedungs and key not in pending:
+                gedung = Gedung(lokasi=lokasi, nama_gedung=row['nama_gedung'], alamat=row['alamat'], lat=row['lat'], long=row['long'])
+                # Field turunan yang biasanya dihitung di Gedung.save()
+                gedung.lat_float, gedung.long_float = float(gedung.lat), float(gedung.long)
+                gedung.geocell = geocell_encode(gedung.lat_float, gedung.long_float)
+                gedung.search_document = gedung.build_search_document()
+                pending[key] = gedung
+
+        for key, gedung in zip(pending, Gedung.objects.bulk_create(pending.values())):
+            self.gedungs[key] = gedung.id
+            self.gedung_uuids[str(gedung.uuid)] = gedung.id
+        self.stats['gedung'] += len(pending)
+
+        ids = []
+        for number, key in enumerate(keys):
+            gedung_id = self.gedung_uuids.get(key[1]) if key[0] == 'uuid' else self.gedungs[key]
+            if gedung_id is None:
+                self.stats['errors'] += 1
+                self.stderr.write(self.style.ERROR(f"gedung_uuid {key[1]} tidak ditemukan (unit {rows[number]['unit_number']})"))
+            ids.append(gedung_id)
+        return ids
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.core.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = 'Hapus tombstone yang lebih tua dari SYNC_TOMBSTONE_RETENTION_DAYS (cursor /sync setua itu sudah ditolak).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Override retensi dalam hari')
+
+    def handle(self, *args, **options):
+        days = options['days'] or getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 90)
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()
+        self.stdout.write(self.style.SUCCESS(f'Selesai: {deleted} tombstone dihapus'))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.api.sync import sync_lag_seconds
+from apps.core.models import Gedung, Unit
+
+
+class Command(BaseCommand):
+    help = 'Hitung ulang total_units, blacklisted_units dan primary_image di Gedung/Unit.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gedung', nargs='*', type=int, help='Batasi ke id gedung tertentu')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Jumlah gedung per transaksi')
+
+    def handle(self, *args, **options):
+        gedung_ids = options['gedung'] or Gedung.objects.order_by('pk').values_list('pk', flat=True)
+        gedung_ids = list(gedung_ids)
+        batch_size = options['batch_size']
+        gedung_count = unit_count = 0
+
+        # Update mengubah updated_at, jadi transaksi dibuat per batch agar commit
+        # dalam SYNC_LAG_SECONDS (lihat apps/api/sync.py)
+        for start in range(0, len(gedung_ids), batch_size):
+            batch = gedung_ids[start:start + batch_size]
+            started = time.monotonic()
+            with transaction.atomic():
+                gedung_count += Gedung.recompute_denormalized(batch)
+                unit_count += Unit.recompute_primary_image(
+                    Unit.objects.filter(gedung_id__in=batch).values_list('pk', flat=True)
+                )
+
+            elapsed = time.monotonic() - started
+            if elapsed > sync_lag_seconds() / 2:
+                self.stderr.write(self.style.WARNING(
+                    f'Batch butuh {elapsed:.0f} detik, mendekati SYNC_LAG_SECONDS ({sync_lag_seconds()}); '
+                    f'perkecil --batch-size'
+                ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Selesai: {gedung_count} gedung dan {unit_count} unit dihitung ulang'
+        ))
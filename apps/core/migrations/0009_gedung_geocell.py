@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:28
+
+from django.db import migrations, models
+
+from apps.core.utils import geocell_encode
+
+
+def backfill_geocell(apps, schema_editor):
+    Gedung = apps.get_model('core', 'Gedung')
+    batch = []
+    for gedung in Gedung.objects.only('id', 'lat', 'long').iterator(chunk_size=2000):
+        gedung.geocell = geocell_encode(gedung.lat, gedung.long)
+        batch.append(gedung)
+        if len(batch) >= 2000:
+            Gedung.objects.bulk_update(batch, ['geocell'])
+            batch = []
+    if batch:
+        Gedung.objects.bulk_update(batch, ['geocell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_unit_uuid'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='gedung',
+            name='gedung_lat_0a2239_idx',
+        ),
+        migrations.AddField(
+            model_name='gedung',
+            name='geocell',
+            field=models.BigIntegerField(editable=False, help_text='Spatial cell key (Z-order), dihitung otomatis dari lat/long', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='gedung',
+            index=models.Index(fields=['geocell'], name='gedung_geocell_79a43a_idx'),
+        ),
+        migrations.RunPython(backfill_geocell, migrations.RunPython.noop),
+    ]
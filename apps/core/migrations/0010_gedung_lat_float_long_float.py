@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:32
+
+from django.db import migrations, models
+
+
+def backfill_float_coordinates(apps, schema_editor):
+    Gedung = apps.get_model('core', 'Gedung')
+    batch = []
+    for gedung in Gedung.objects.only('id', 'lat', 'long').iterator(chunk_size=2000):
+        gedung.lat_float = float(gedung.lat)
+        gedung.long_float = float(gedung.long)
+        batch.append(gedung)
+        if len(batch) >= 2000:
+            Gedung.objects.bulk_update(batch, ['lat_float', 'long_float'])
+            batch = []
+    if batch:
+        Gedung.objects.bulk_update(batch, ['lat_float', 'long_float'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_gedung_geocell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gedung',
+            name='lat_float',
+            field=models.FloatField(editable=False, help_text='Salinan double dari lat untuk query dan API', null=True),
+        ),
+        migrations.AddField(
+            model_name='gedung',
+            name='long_float',
+            field=models.FloatField(editable=False, help_text='Salinan double dari long untuk query dan API', null=True),
+        ),
+        migrations.RunPython(backfill_float_coordinates, migrations.RunPython.noop),
+    ]
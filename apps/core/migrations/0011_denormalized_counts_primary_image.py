@@ -0,0 +1,62 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_denormalized(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Gedung = apps.get_model('core', 'Gedung')
+    Unit = apps.get_model('core', 'Unit')
+    Image = apps.get_model('core', 'Image')
+
+    def primary_image(model_name):
+        content_type = ContentType.objects.filter(app_label='core', model=model_name).first()
+        return Subquery(
+            Image.objects.filter(
+                content_type=content_type, object_id=OuterRef('pk'), is_primary=True
+            ).order_by('-created_at').values('pk')[:1]
+        )
+
+    units = Unit.objects.filter(gedung=OuterRef('pk')).order_by().values('gedung')
+    Gedung.objects.update(
+        total_units=Coalesce(Subquery(units.annotate(c=Count('pk')).values('c')), Value(0)),
+        blacklisted_units=Coalesce(
+            Subquery(units.filter(listing_type='blacklist').annotate(c=Count('pk')).values('c')), Value(0)
+        ),
+        primary_image=primary_image('gedung'),
+    )
+    Unit.objects.update(primary_image=primary_image('unit'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_gedung_lat_float_long_float'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gedung',
+            name='blacklisted_units',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Jumlah unit blacklist (denormalized)'),
+        ),
+        migrations.AddField(
+            model_name='gedung',
+            name='primary_image',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Gambar utama (denormalized)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.image'),
+        ),
+        migrations.AddField(
+            model_name='gedung',
+            name='total_units',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Jumlah unit (denormalized)'),
+        ),
+        migrations.AddField(
+            model_name='unit',
+            name='primary_image',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Gambar utama (denormalized)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.image'),
+        ),
+        migrations.RunPython(backfill_denormalized, migrations.RunPython.noop),
+    ]
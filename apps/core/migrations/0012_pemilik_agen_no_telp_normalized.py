@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:50
+
+from django.db import migrations, models
+
+from apps.core.utils import normalize_phone
+
+
+def backfill_no_telp_normalized(apps, schema_editor):
+    for model_name in ('Pemilik', 'Agen'):
+        model = apps.get_model('core', model_name)
+        batch = []
+        for obj in model.objects.exclude(no_telp=None).only('id', 'no_telp').iterator(chunk_size=2000):
+            obj.no_telp_normalized = normalize_phone(obj.no_telp)
+            batch.append(obj)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, ['no_telp_normalized'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ['no_telp_normalized'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_denormalized_counts_primary_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agen',
+            name='no_telp_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Nomor telepon digit saja dengan kode negara (untuk screening)', max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='pemilik',
+            name='no_telp_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Nomor telepon digit saja dengan kode negara (untuk screening)', max_length=20, null=True),
+        ),
+        migrations.RunPython(backfill_no_telp_normalized, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+from apps.core.search import build_search_document, create_search_index, drop_search_index
+
+
+def backfill_search_document(apps, schema_editor):
+    Gedung = apps.get_model('core', 'Gedung')
+    batch = []
+    for gedung in Gedung.objects.select_related('lokasi__distrik').iterator(chunk_size=2000):
+        gedung.search_document = build_search_document(
+            gedung.nama_gedung, gedung.alamat, gedung.lokasi.nama, gedung.lokasi.distrik.nama
+        )
+        batch.append(gedung)
+        if len(batch) >= 2000:
+            Gedung.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    if batch:
+        Gedung.objects.bulk_update(batch, ['search_document'])
+
+
+def create_index(apps, schema_editor):
+    create_search_index(schema_editor)
+
+
+def drop_index(apps, schema_editor):
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_pemilik_agen_no_telp_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gedung',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Gabungan nama, alamat, lokasi dan distrik untuk full-text search'),
+        ),
+        migrations.RunPython(backfill_search_document, migrations.RunPython.noop),
+        migrations.RunPython(create_index, drop_index),
+    ]
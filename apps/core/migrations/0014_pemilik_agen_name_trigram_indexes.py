@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:30
+
+from django.db import migrations
+
+from apps.core.fuzzy import create_name_indexes, drop_name_indexes
+
+
+def create_indexes(apps, schema_editor):
+    create_name_indexes(schema_editor)
+
+
+def drop_indexes(apps, schema_editor):
+    drop_name_indexes(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_gedung_search_document'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('core', '0014_pemilik_agen_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('gedung', 'Gedung'), ('unit', 'Unit'), ('pemilik', 'Pemilik'), ('agen', 'Agen'), ('image', 'Image')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('uuid', models.UUIDField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Tombstone',
+                'verbose_name_plural': 'Tombstones',
+                'db_table': 'tombstone',
+                'ordering': ['deleted_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='agen',
+            index=models.Index(fields=['updated_at', 'id'], name='agen_updated_f3f57e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gedung',
+            index=models.Index(fields=['updated_at', 'id'], name='gedung_updated_e5a0c7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['updated_at', 'id'], name='image_updated_4b6cf2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pemilik',
+            index=models.Index(fields=['updated_at', 'id'], name='pemilik_updated_7927b3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unit',
+            index=models.Index(fields=['updated_at', 'id'], name='unit_updated_34058c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_fb330c_idx'),
+        ),
+    ]
@@ -1,10 +1,15 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
 
 # utils
 import uuid
-from apps.core.utils import image_upload_path
+from apps.core.utils import image_upload_path, geocell_encode, normalize_phone
+from apps.core.search import build_search_document
+from apps.core.images import delete_variants, generate_variants
 from apps.core.validators import validate_image_file, validate_filename
 
 class BaseModel(models.Model):
@@ -55,6 +60,13 @@ class Gedung(BaseModel):
     lat = models.DecimalField(max_digits=17, decimal_places=15, verbose_name='Latitude', help_text='Contoh: 30.065958719470665')
     long = models.DecimalField(max_digits=18, decimal_places=15, verbose_name='Longitude', help_text='Contoh: 31.327724660547236')
     alamat = models.TextField()
+    lat_float = models.FloatField(null=True, editable=False, help_text='Salinan double dari lat untuk query dan API')
+    long_float = models.FloatField(null=True, editable=False, help_text='Salinan double dari long untuk query dan API')
+    geocell = models.BigIntegerField(null=True, editable=False, help_text='Spatial cell key (Z-order), dihitung otomatis dari lat/long')
+    search_document = models.TextField(default='', blank=True, editable=False, help_text='Gabungan nama, alamat, lokasi dan distrik untuk full-text search')
+    total_units = models.PositiveIntegerField(default=0, editable=False, help_text='Jumlah unit (denormalized)')
+    blacklisted_units = models.PositiveIntegerField(default=0, editable=False, help_text='Jumlah unit blacklist (denormalized)')
+    primary_image = models.ForeignKey('Image', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+', help_text='Gambar utama (denormalized)')
     images = GenericRelation('Image', related_query_name='gedung')
     
     class Meta:
@@ -62,14 +74,46 @@ class Gedung(BaseModel):
         verbose_name = 'Gedung'
         verbose_name_plural = 'Gedung'
         ordering = ['-created_at']
-        indexes = [models.Index(fields=['lat', 'long'])]
+        indexes = [models.Index(fields=['geocell']), models.Index(fields=['updated_at', 'id'])]
     
     def __str__(self):
         return self.nama_gedung or f"Gedung #{self.id}"
     
-    @property
-    def primary_image(self):
-        return self.images.filter(is_primary=True).first()
+    def save(self, *args, **kwargs):
+        if self.lat is not None and self.long is not None:
+            self.lat_float = float(self.lat)
+            self.long_float = float(self.long)
+            self.geocell = geocell_encode(self.lat_float, self.long_float)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and {'lat', 'long'} & set(update_fields):
+                kwargs['update_fields'] = {*update_fields, 'lat_float', 'long_float', 'geocell'}
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'nama_gedung', 'alamat', 'lokasi'} & set(update_fields):
+            self.search_document = self.build_search_document()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_document'}
+        super().save(*args, **kwargs)
+    
+    def build_search_document(self):
+        lokasi = self.lokasi if self.lokasi_id else None
+        return build_search_document(
+            self.nama_gedung, self.alamat,
+            lokasi.nama if lokasi else None, lokasi.distrik.nama if lokasi else None
+        )
+    
+    @classmethod
+    def recompute_denormalized(cls, gedung_ids=None):
+        """Hitung ulang total_units, blacklisted_units dan primary_image dari tabel unit/image"""
+        units = Unit.objects.filter(gedung=OuterRef('pk')).order_by().values('gedung')
+        queryset = cls.objects.all() if gedung_ids is None else cls.objects.filter(pk__in=gedung_ids)
+        return queryset.update(
+            total_units=Coalesce(Subquery(units.annotate(c=Count('pk')).values('c')), Value(0)),
+            blacklisted_units=Coalesce(
+                Subquery(units.filter(listing_type='blacklist').annotate(c=Count('pk')).values('c')), Value(0)
+            ),
+            primary_image=_primary_image_subquery(cls),
+            updated_at=timezone.now()
+        )
 
 
 class Pemilik(BaseModel):
@@ -79,6 +123,7 @@ class Pemilik(BaseModel):
     nama = models.CharField(max_length=200)
     julukan = models.CharField(max_length=100, blank=True, null=True, verbose_name='Julukan (opsional)', help_text='Nama panggilan atau julukan')
     no_telp = models.CharField(max_length=20, blank=True, null=True, verbose_name='Nomor Telepon (opsional)')
+    no_telp_normalized = models.CharField(max_length=20, blank=True, null=True, editable=False, db_index=True, help_text='Nomor telepon digit saja dengan kode negara (untuk screening)')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='blacklist')
     
     class Meta:
@@ -86,9 +131,17 @@ class Pemilik(BaseModel):
         verbose_name = 'Pemilik'
         verbose_name_plural = 'Pemilik'
         ordering = ['nama']
+        indexes = [models.Index(fields=['updated_at', 'id'])]
     
     def __str__(self):
         return f"{self.nama} ({self.julukan})" if self.julukan else self.nama
+    
+    def save(self, *args, **kwargs):
+        self.no_telp_normalized = normalize_phone(self.no_telp)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'no_telp' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'no_telp_normalized'}
+        super().save(*args, **kwargs)
 
 
 class Agen(BaseModel):
@@ -98,6 +151,7 @@ class Agen(BaseModel):
     nama = models.CharField(max_length=200)
     julukan = models.CharField(max_length=100, blank=True, null=True, verbose_name='Julukan (opsional)', help_text='Nama panggilan atau julukan')
     no_telp = models.CharField(max_length=20, blank=True, null=True, verbose_name='Nomor Telepon (opsional)')
+    no_telp_normalized = models.CharField(max_length=20, blank=True, null=True, editable=False, db_index=True, help_text='Nomor telepon digit saja dengan kode negara (untuk screening)')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='blacklist')
     
     class Meta:
@@ -105,9 +159,17 @@ class Agen(BaseModel):
         verbose_name = 'Agen'
         verbose_name_plural = 'Agen'
         ordering = ['nama']
+        indexes = [models.Index(fields=['updated_at', 'id'])]
     
     def __str__(self):
         return f"{self.nama} ({self.julukan})" if self.julukan else self.nama
+    
+    def save(self, *args, **kwargs):
+        self.no_telp_normalized = normalize_phone(self.no_telp)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'no_telp' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'no_telp_normalized'}
+        super().save(*args, **kwargs)
 
 
 class Unit(BaseModel):
@@ -123,6 +185,7 @@ class Unit(BaseModel):
     lantai = models.PositiveIntegerField(verbose_name='Lantai', help_text='Lantai unit')
     listing_type = models.CharField(max_length=20, choices=LISTING_TYPE_CHOICES, default='blacklist')
     alasan_blacklist = models.TextField(blank=True, null=True, verbose_name='Alasan Blacklist')
+    primary_image = models.ForeignKey('Image', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+', help_text='Gambar utama (denormalized)')
     images = GenericRelation('Image', related_query_name='unit')
     
     class Meta:
@@ -131,13 +194,49 @@ class Unit(BaseModel):
         verbose_name_plural = 'Unit'
         ordering = ['gedung', 'lantai', 'unit_number']
         unique_together = [['gedung', 'unit_number']]
+        indexes = [models.Index(fields=['updated_at', 'id'])]
     
     def __str__(self):
         return f"{self.gedung} - Lantai {self.lantai} - Unit {self.unit_number}"
     
-    @property
-    def primary_image(self):
-        return self.images.filter(is_primary=True).first()
+    COUNTED_FIELDS = frozenset({'gedung', 'gedung_id', 'listing_type'})
+    
+    def save(self, *args, **kwargs):
+        # Counter total_units/blacklisted_units gedung di-update di post_save
+        # (apps/core/signals.py); satu transaksi agar tidak bisa selisih.
+        # Delete sudah atomic lewat Collector.
+        with transaction.atomic():
+            update_fields = kwargs.get('update_fields')
+            if (
+                not self._state.adding and getattr(self, '_counted_state', None) is None
+                and (update_fields is None or self.COUNTED_FIELDS & set(update_fields))
+            ):
+                # Dimuat dengan gedung/listing_type di-defer: baca nilai yang sudah dihitung
+                stored = Unit.objects.filter(pk=self.pk).values_list('gedung_id', 'listing_type').first()
+                self._counted_state = stored or (None, None)
+            super().save(*args, **kwargs)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_counted_state()
+        return instance
+    
+    def remember_counted_state(self):
+        """
+        Simpan gedung dan listing_type yang sudah dihitung di counter Gedung
+        (None jika salah satunya di-defer, lihat save())
+        """
+        if 'gedung_id' in self.__dict__ and 'listing_type' in self.__dict__:
+            self._counted_state = (self.gedung_id, self.listing_type)
+        else:
+            self._counted_state = None
+    
+    @classmethod
+    def recompute_primary_image(cls, unit_ids=None):
+        """Hitung ulang primary_image dari tabel image"""
+        queryset = cls.objects.all() if unit_ids is None else cls.objects.filter(pk__in=unit_ids)
+        return queryset.update(primary_image=_primary_image_subquery(cls), updated_at=timezone.now())
 
 
 class Image(BaseModel):
@@ -147,18 +246,118 @@ class Image(BaseModel):
     content_object = GenericForeignKey('content_type', 'object_id')
     image = models.ImageField(upload_to=image_upload_path, help_text='Upload gambar gedung atau unit', validators=[validate_image_file])
     is_primary = models.BooleanField(default=False, verbose_name='Gambar Utama', help_text='Centang jika ini gambar utama')
+    variants = models.JSONField(default=dict, blank=True, editable=False, help_text='Nama file variant (thumb, medium) di storage')
     
     class Meta:
         db_table = 'image'
         verbose_name = 'Image'
         verbose_name_plural = 'Images'
         ordering = ['-is_primary', '-created_at']
-        indexes = [models.Index(fields=['content_type', 'object_id'])]
+        indexes = [models.Index(fields=['content_type', 'object_id']), models.Index(fields=['updated_at', 'id'])]
     
     def __str__(self):
         return f"Image for {self.content_object} ({'Primary' if self.is_primary else 'Secondary'})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_image_name = instance.__dict__.get('image')
+        return instance
+    
     def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        file_changed = (update_fields is None or 'image' in update_fields) and self.image.name != getattr(self, '_stored_image_name', None)
+        if file_changed:
+            # Variant lama milik file lama: dikosongkan (API pakai original) sampai
+            # variant file baru selesai dibuat setelah commit
+            old_variants = list(self.variants.values())
+            self.variants = {}
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'variants'}
+        
+        with transaction.atomic():
+            # Save sebagian (mis. update_fields=['variants']) tidak menyentuh is_primary
+            if self.is_primary and (update_fields is None or 'is_primary' in update_fields):
+                Image.objects.filter(content_type=self.content_type, object_id=self.object_id, is_primary=True).update(is_primary=False, updated_at=timezone.now())
+            super().save(*args, **kwargs)
+            self.sync_owner_primary_image()
+            
+            if file_changed:
+                pk, name, storage = self.pk, self.image.name, self.image.storage
+                
+                def _replace_variants():
+                    delete_variants(storage, old_variants)
+                    if name:
+                        Image.build_variants(pk, name)
+                
+                # Resize berjalan setelah commit, tidak menahan transaksi (lihat SYNC_LAG_SECONDS)
+                transaction.on_commit(_replace_variants, robust=True)
+                self._stored_image_name = name
+    
+    @classmethod
+    def build_variants(cls, pk, name):
+        """
+        Generate variant untuk file name lalu simpan hanya field variants
+        (dipanggil setelah commit). Dilewati jika gambar sudah dihapus atau
+        filenya diganti lagi; save berikutnya menjadwalkan variant sendiri.
+        """
+        image = cls.objects.filter(pk=pk).select_related('content_type').first()
+        if image is None or image.image.name != name:
+            return
+        image.refresh_variants()
+        image.save(update_fields=['variants', 'updated_at'])
+    
+    def refresh_variants(self):
+        """Generate variant thumb/medium dari file original (kosong jika file tidak bisa dibaca)"""
+        try:
+            self.variants = generate_variants(self.image) if self.image else {}
+        except OSError:
+            # API jatuh ke original untuk gambar tanpa variant
+            self.variants = {}
+    
+    def variant_name(self, size):
+        """Nama file untuk ukuran thumb/medium/original; tanpa variant pakai original"""
+        return self.variants.get(size, self.image.name) if self.image else None
+    
+    def sync_owner_primary_image(self):
+        """Update referensi primary_image di Gedung/Unit pemilik gambar ini"""
+        owner_model = self.content_type.model_class()
+        if owner_model not in (Gedung, Unit):
+            return
+        
+        owners = owner_model.objects.filter(pk=self.object_id)
         if self.is_primary:
-            Image.objects.filter(content_type=self.content_type, object_id=self.object_id, is_primary=True).update(is_primary=False)
-        super().save(*args, **kwargs)
+            owners.exclude(primary_image=self).update(primary_image=self, updated_at=timezone.now())
+        else:
+            owners.filter(primary_image=self).update(primary_image=None, updated_at=timezone.now())
+
+
+class Tombstone(models.Model):
+    """Jejak baris yang dihapus, agar client /sync ikut menghapus salinan lokalnya"""
+    MODEL_CHOICES = [('gedung', 'Gedung'), ('unit', 'Unit'), ('pemilik', 'Pemilik'), ('agen', 'Agen'), ('image', 'Image')]
+    
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    uuid = models.UUIDField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'tombstone'
+        verbose_name = 'Tombstone'
+        verbose_name_plural = 'Tombstones'
+        ordering = ['deleted_at', 'id']
+        indexes = [models.Index(fields=['deleted_at', 'id'])]
+    
+    def __str__(self):
+        return f"{self.model} #{self.object_id} (dihapus {self.deleted_at:%Y-%m-%d %H:%M})"
+
+
+def _primary_image_subquery(model):
+    """Subquery id gambar utama terbaru untuk Gedung/Unit (OuterRef pk)"""
+    return Subquery(
+        Image.objects.filter(
+            content_type=ContentType.objects.get_for_model(model),
+            object_id=OuterRef('pk'),
+            is_primary=True
+        ).order_by('-created_at').values('pk')[:1]
+    )
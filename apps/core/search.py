@@ -0,0 +1,222 @@
+"""
+Full-text search gedung (nama_gedung, alamat, lokasi, distrik).
+
+Semua teks digabung di kolom Gedung.search_document. Index-nya tergantung
+database:
+
+- PostgreSQL: GIN index tsvector ('simple') + GIN trigram (pg_trgm) untuk
+  kecocokan sebagian kata / salah ketik.
+- SQLite (development): tabel virtual FTS5 external-content yang
+  di-sinkronkan dengan trigger.
+- Database lain: fallback icontains per kata (tanpa index).
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+SQLITE_FTS_TABLE = 'gedung_search'
+
+_SQLITE_TRIGGERS = {
+    'gedung_search_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS gedung_search_ai AFTER INSERT ON gedung BEGIN
+            INSERT INTO {SQLITE_FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document);
+        END
+    """,
+    'gedung_search_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS gedung_search_ad AFTER DELETE ON gedung BEGIN
+            INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, search_document)
+            VALUES ('delete', old.id, old.search_document);
+        END
+    """,
+    'gedung_search_au': f"""
+        CREATE TRIGGER IF NOT EXISTS gedung_search_au AFTER UPDATE OF search_document ON gedung BEGIN
+            INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, search_document)
+            VALUES ('delete', old.id, old.search_document);
+            INSERT INTO {SQLITE_FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document);
+        END
+    """,
+}
+
+_POSTGRES_INDEXES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    "CREATE INDEX IF NOT EXISTS gedung_search_tsv_idx ON gedung USING GIN (to_tsvector('simple', search_document))",
+    'CREATE INDEX IF NOT EXISTS gedung_search_trgm_idx ON gedung USING GIN (search_document gin_trgm_ops)',
+]
+
+
+def build_search_document(nama_gedung, alamat, lokasi_nama, distrik_nama):
+    """Gabungkan semua teks yang bisa dicari untuk satu gedung"""
+    return ' '.join(part for part in (nama_gedung, alamat, lokasi_nama, distrik_nama) if part)
+
+
+def refresh_search_documents(gedungs, batch_size=2000):
+    """
+    Hitung ulang search_document untuk queryset gedung (mis. setelah nama
+    lokasi/distrik berubah). Hanya baris yang berubah yang di-update.
+
+    Returns:
+        int: jumlah gedung yang di-update
+    """
+    # updated_at ikut diubah agar client /sync menerima nama lokasi/distrik baru
+    now = timezone.now()
+    changed = []
+    updated = 0
+    for gedung in gedungs.select_related('lokasi__distrik').only(
+        'id', 'nama_gedung', 'alamat', 'search_document', 'lokasi__nama', 'lokasi__distrik__nama'
+    ).iterator(chunk_size=batch_size):
+        document = gedung.build_search_document()
+        if document != gedung.search_document:
+            gedung.search_document = document
+            gedung.updated_at = now
+            changed.append(gedung)
+        if len(changed) >= batch_size:
+            updated += gedungs.model.objects.bulk_update(changed, ['search_document', 'updated_at'])
+            changed = []
+    if changed:
+        updated += gedungs.model.objects.bulk_update(changed, ['search_document', 'updated_at'])
+    return updated
+
+
+def create_search_index(schema_editor):
+    """Buat index full-text sesuai vendor database (dipanggil dari migration)"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in _POSTGRES_INDEXES:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        ensure_sqlite_search_index(schema_editor.connection)
+
+
+def drop_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS gedung_search_tsv_idx')
+        schema_editor.execute('DROP INDEX IF EXISTS gedung_search_trgm_idx')
+    elif vendor == 'sqlite':
+        for name in _SQLITE_TRIGGERS:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}')
+
+
+def ensure_sqlite_search_index(db_connection):
+    """
+    Pastikan tabel FTS5 dan trigger-nya ada, rebuild isi jika baru dibuat.
+
+    Migration SQLite yang me-remake tabel gedung (AlterField dll) ikut
+    menghapus trigger, jadi fungsi ini juga dipanggil setelah migrate.
+    """
+    with db_connection.cursor() as cursor:
+        existing = {
+            row[0] for row in cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name IN (%s)" % ','.join(['%s'] * (len(_SQLITE_TRIGGERS) + 1)),
+                [SQLITE_FTS_TABLE, *_SQLITE_TRIGGERS]
+            ).fetchall()
+        }
+        if existing == {SQLITE_FTS_TABLE, *_SQLITE_TRIGGERS}:
+            return
+
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5("
+            f"search_document, content='gedung', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        for sql in _SQLITE_TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')")
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def _fts5_query(query):
+    """Query FTS5 yang aman dari input user: setiap kata di-quote, prefix match, AND"""
+    return ' '.join(f'"{term}"*' for term in _terms(query))
+
+
+def search_filter(query):
+    """
+    Kondisi filter gedung yang cocok dengan query (tanpa ranking).
+
+    Dipakai admin search; memakai index full-text yang sama dengan
+    search_gedung.
+
+    Returns:
+        Q untuk Gedung.objects.filter()
+    """
+    if connection.vendor == 'postgresql':
+        return Q(id__in=RawSQL(
+            "SELECT id FROM gedung WHERE to_tsvector('simple', search_document) @@ websearch_to_tsquery('simple', %s) "
+            "OR %s <%% search_document",
+            [query, query]
+        ))
+    if connection.vendor == 'sqlite':
+        fts_query = _fts5_query(query)
+        if not fts_query:
+            return Q(pk__in=[])
+        return Q(id__in=RawSQL(
+            f'SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s', [fts_query]
+        ))
+
+    condition = Q()
+    for term in _terms(query):
+        condition &= Q(search_document__icontains=term)
+    return condition
+
+
+def search_gedung(query, limit, offset):
+    """
+    Cari gedung, diurutkan dari yang paling relevan.
+
+    Returns:
+        tuple: (list gedung_id untuk halaman ini, total hasil)
+    """
+    if connection.vendor == 'postgresql':
+        # ts_rank untuk kecocokan kata utuh, word_similarity untuk sebagian kata / typo
+        sql = """
+            SELECT id, COUNT(*) OVER ()
+            FROM gedung, websearch_to_tsquery('simple', %s) AS query
+            WHERE to_tsvector('simple', search_document) @@ query OR %s <%% search_document
+            ORDER BY ts_rank(to_tsvector('simple', search_document), query)
+                     + word_similarity(%s, search_document) DESC, id
+            LIMIT %s OFFSET %s
+        """
+        params = [query, query, query, limit, offset]
+    elif connection.vendor == 'sqlite':
+        fts_query = _fts5_query(query)
+        if not fts_query:
+            return [], 0
+        # bm25() tidak bisa dipakai bersama window function di query yang sama
+        sql = f"""
+            SELECT id, COUNT(*) OVER ()
+            FROM (
+                SELECT rowid AS id, bm25({SQLITE_FTS_TABLE}) AS score
+                FROM {SQLITE_FTS_TABLE}
+                WHERE {SQLITE_FTS_TABLE} MATCH %s
+            )
+            ORDER BY score, id
+            LIMIT %s OFFSET %s
+        """
+        params = [fts_query, limit, offset]
+    else:
+        from apps.core.models import Gedung
+        queryset = Gedung.objects.filter(search_filter(query)).order_by('id')
+        return list(queryset.values_list('id', flat=True)[offset:offset + limit]), queryset.count()
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    if rows:
+        return [row[0] for row in rows], rows[0][1]
+    if offset:
+        # Halaman di luar jangkauan: total tetap dihitung
+        return [], search_count(query)
+    return [], 0
+
+
+def search_count(query):
+    from apps.core.models import Gedung
+    return Gedung.objects.filter(search_filter(query)).count()
@@ -1,9 +1,15 @@
-from django.db.models.signals import post_delete
+from django.db.models import F
+from django.db import connections, transaction
+from django.db.models.signals import post_save, post_delete, post_migrate
 from django.dispatch import receiver
 from django.conf import settings
+from django.utils import timezone
 from pathlib import Path
 import shutil
-from apps.core.models import Gedung, Unit
+from apps.core.models import Distrik, Lokasi, Gedung, Pemilik, Agen, Unit, Image, Tombstone
+from apps.core.fuzzy import get_loaded_name_index
+from apps.core.images import delete_variants
+from apps.core.search import ensure_sqlite_search_index, refresh_search_documents
 
 
 @receiver(post_delete, sender=Gedung)
@@ -41,3 +47,148 @@ def delete_unit_folder(sender, instance, **kwargs):
             print(f"Unit folder deleted: {folder_path}")
     except Exception as e:
         print(f"Error deleting unit folder: {e}")
+
+
+def _adjust_unit_counts(gedung_id, listing_type, delta):
+    """
+    Tambah/kurangi counter unit di gedung dengan UPDATE atomic (F expression)
+    """
+    if gedung_id is None:
+        return
+    blacklisted = delta if listing_type == 'blacklist' else 0
+    Gedung.objects.filter(pk=gedung_id).update(
+        total_units=F('total_units') + delta,
+        blacklisted_units=F('blacklisted_units') + blacklisted,
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Unit)
+def update_gedung_unit_counts(sender, instance, **kwargs):
+    """
+    Sinkronkan total_units dan blacklisted_units gedung setelah unit disimpan
+    (masih di dalam transaksi Unit.save)
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not Unit.COUNTED_FIELDS & update_fields:
+        return
+    
+    # Unit baru belum punya _counted_state (belum dihitung)
+    old_state = getattr(instance, '_counted_state', None) or (None, None)
+    new_state = (instance.gedung_id, instance.listing_type)
+    
+    if old_state != new_state:
+        _adjust_unit_counts(*old_state, -1)
+        _adjust_unit_counts(*new_state, 1)
+    instance.remember_counted_state()
+
+
+@receiver(post_delete, sender=Unit)
+def decrement_gedung_unit_counts(sender, instance, **kwargs):
+    """
+    Kurangi counter unit di gedung setelah unit dihapus
+    """
+    gedung_id, listing_type = getattr(instance, '_counted_state', None) or (instance.gedung_id, instance.listing_type)
+    _adjust_unit_counts(gedung_id, listing_type, -1)
+
+
+@receiver(post_delete, sender=Image)
+def touch_owner_of_primary_image(sender, instance, **kwargs):
+    """
+    primary_image pemilik sudah di-NULL-kan (SET_NULL) tanpa mengubah
+    updated_at; naikkan agar delta /sync dan ETag ikut berubah
+    """
+    if not instance.is_primary:
+        return
+    owner_model = instance.content_type.model_class()
+    if owner_model in (Gedung, Unit):
+        owner_model.objects.filter(pk=instance.object_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Lokasi)
+def refresh_lokasi_search_documents(sender, instance, created, **kwargs):
+    """
+    Nama lokasi/distrik ikut di search_document gedung: perbarui setelah lokasi diubah
+    """
+    if not created and not kwargs.get('raw'):
+        refresh_search_documents(Gedung.objects.filter(lokasi=instance))
+
+
+@receiver(post_save, sender=Distrik)
+def refresh_distrik_search_documents(sender, instance, created, **kwargs):
+    if not created and not kwargs.get('raw'):
+        refresh_search_documents(Gedung.objects.filter(lokasi__distrik=instance))
+
+
+@receiver(post_migrate)
+def ensure_search_index(sender, app_config, using, **kwargs):
+    """
+    Migration SQLite yang me-remake tabel gedung menghapus trigger FTS5;
+    buat ulang setelah migrate (no-op jika sudah lengkap)
+    """
+    connection = connections[using]
+    if app_config.label != 'core' or connection.vendor != 'sqlite':
+        return
+    table = Gedung._meta.db_table
+    with connection.cursor() as cursor:
+        if table not in connection.introspection.table_names(cursor):
+            return
+        columns = {column.name for column in connection.introspection.get_table_description(cursor, table)}
+    if 'search_document' in columns:
+        ensure_sqlite_search_index(connection)
+
+
+@receiver(post_save, sender=Pemilik)
+@receiver(post_save, sender=Agen)
+def update_name_index(sender, instance, **kwargs):
+    """
+    Update index trigram nama/julukan di worker ini setelah commit
+    """
+    obj_id, nama, julukan = instance.id, instance.nama, instance.julukan
+
+    def _apply():
+        index = get_loaded_name_index(sender)
+        if index is not None:
+            index.upsert(obj_id, nama, julukan)
+
+    transaction.on_commit(_apply)
+
+
+@receiver(post_delete, sender=Pemilik)
+@receiver(post_delete, sender=Agen)
+def remove_from_name_index(sender, instance, **kwargs):
+    obj_id = instance.id
+
+    def _apply():
+        index = get_loaded_name_index(sender)
+        if index is not None:
+            index.remove(obj_id)
+
+    transaction.on_commit(_apply)
+
+
+@receiver(post_delete, sender=Image)
+def delete_image_variants(sender, instance, **kwargs):
+    """
+    Hapus file variant setelah commit (django-cleanup hanya menghapus field image)
+    """
+    names = list(instance.variants.values())
+    if names:
+        storage = instance.image.storage
+        transaction.on_commit(lambda: delete_variants(storage, names))
+
+
+@receiver(post_delete, sender=Gedung)
+@receiver(post_delete, sender=Unit)
+@receiver(post_delete, sender=Pemilik)
+@receiver(post_delete, sender=Agen)
+@receiver(post_delete, sender=Image)
+def record_tombstone(sender, instance, **kwargs):
+    """
+    Catat baris yang dihapus (termasuk lewat cascade) untuk delta /sync
+    """
+    Tombstone.objects.create(
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+        uuid=getattr(instance, 'uuid', None)
+    )
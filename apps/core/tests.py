@@ -1,3 +1,483 @@
-from django.test import TestCase
+import csv
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from apps.api.spatial import reset_gedung_index
+from apps.core.fuzzy import fuzzy_search, reset_name_indexes
+from apps.core.models import Distrik, Lokasi, Gedung, Pemilik, Agen, Unit, Image
+from apps.core.search import search_filter, search_gedung
+from apps.core.utils import GEOCELL_BITS, _geocell_axes, geocell_encode, geocell_ranges, normalize_phone
+
+# GIF 1x1, cukup untuk ImageField tanpa memproses file besar
+GIF = (
+    b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00'
+    b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+)
+
+
+class AdminNPlusOneTests(TestCase):
+    """
+    Changelist, halaman change dan search admin dijalankan di bawah
+    config.settings.test (N_PLUS_ONE_RAISE): request dengan query berulang
+    gagal dengan NPlusOneError.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+        unit_type = ContentType.objects.get_for_model(Unit)
+        gedung_type = ContentType.objects.get_for_model(Gedung)
+
+        for d in range(6):
+            distrik = Distrik.objects.create(nama=f'Distrik {d}', kode=f'D{d}')
+            lokasi = Lokasi.objects.create(distrik=distrik, nama=f'Hay {d}')
+            pemilik = Pemilik.objects.create(nama=f'Mohamed {d}', no_telp=f'0101 234 56{d}0')
+            agen = Agen.objects.create(nama=f'Mahmoud {d}', no_telp=f'0111 222 33{d}0')
+            gedung = Gedung.objects.create(
+                lokasi=lokasi, nama_gedung=f'Imarah {d}', alamat=f'Shari3 {d}',
+                lat=30.05 + d * 0.001, long=31.35 + d * 0.001
+            )
+            Image.objects.create(content_type=gedung_type, object_id=gedung.id, image=ContentFile(GIF, 'g.gif'))
+            for n in range(6):
+                unit = Unit.objects.create(
+                    gedung=gedung, pemilik=pemilik, agen=agen, deskripsi='kanan',
+                    unit_number=str(n + 1), lantai=n, listing_type='blacklist'
+                )
+                Image.objects.create(content_type=unit_type, object_id=unit.id, image=ContentFile(GIF, 'u.gif'))
+        cls.gedung = Gedung.objects.first()
+        cls.unit = Unit.objects.first()
+
+    def setUp(self):
+        reset_gedung_index()
+        reset_name_indexes()
+        self.addCleanup(reset_gedung_index)
+        self.addCleanup(reset_name_indexes)
+        self.client.force_login(self.user)
+
+    def assertPageOk(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+    def test_changelists(self):
+        for model in admin.site._registry:
+            if model._meta.app_label != 'core':
+                continue
+            with self.subTest(model=model.__name__):
+                self.assertPageOk(reverse(f'admin:core_{model._meta.model_name}_changelist'))
+
+    def test_changelist_search(self):
+        searches = {
+            'gedung': 'imarah',
+            'pemilik': 'muhamad',
+            'agen': '0111 222 3300',
+            'unit': 'mohamed',
+            'lokasi': 'distrik',
+        }
+        for model_name, term in searches.items():
+            with self.subTest(model=model_name):
+                self.assertPageOk(reverse(f'admin:core_{model_name}_changelist') + f'?q={term}')
+
+    def test_change_pages(self):
+        self.assertPageOk(reverse('admin:core_gedung_change', args=[self.gedung.pk]))
+        self.assertPageOk(reverse('admin:core_unit_change', args=[self.unit.pk]))
+        self.assertPageOk(reverse('admin:core_distrik_change', args=[self.gedung.lokasi.distrik_id]))
+
+    def test_autocomplete(self):
+        for model_name, field, term in (('unit', 'gedung', 'imarah'), ('unit', 'pemilik', 'mohamed'), ('gedung', 'lokasi', 'hay')):
+            with self.subTest(field=field):
+                self.assertPageOk(
+                    reverse('admin:autocomplete')
+                    + f'?app_label=core&model_name={model_name}&field_name={field}&term={term}'
+                )
+
+
+class NormalizePhoneTests(SimpleTestCase):
+    def test_formats(self):
+        for value, expected in (
+            ('+20 101 234 5678', '201012345678'),
+            ('0020 101 234 5678', '201012345678'),
+            ('0101 234 5678', '201012345678'),
+            ('101 234 5678', '201012345678'),
+            ('201012345678', '201012345678'),
+            ('', None),
+            ('tidak ada', None),
+        ):
+            with self.subTest(value=value):
+                self.assertEqual(normalize_phone(value), expected)
+
+    def test_longer_than_e164_is_rejected(self):
+        self.assertEqual(normalize_phone('+123 456 789 012 345'), '123456789012345')
+        for value in ('+123 456 789 012 3456', '0101 234 5678 / 0111 222 3333', '1234567890123456789012'):
+            with self.subTest(value=value):
+                self.assertIsNone(normalize_phone(value))
+
+
+class PhoneNormalizedFieldTests(TestCase):
+    def test_overlong_number_saved_without_normalized(self):
+        # 20 karakter input + kode negara akan melewati max_length=20 kolom normalized
+        pemilik = Pemilik.objects.create(nama='Mohamed', no_telp='01012345678901234567')
+        pemilik.refresh_from_db()
+        self.assertIsNone(pemilik.no_telp_normalized)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'pg_trgm hanya di PostgreSQL')
+class PostgresFuzzySearchTests(TransactionTestCase):
+    """Di luar transaksi (autocommit), seperti request API biasa"""
+
+    def test_threshold_below_pg_trgm_default(self):
+        pemilik = Pemilik.objects.create(nama='Mohamed')
+        # similarity ~0.2: hanya lolos operator % jika threshold 0.1 benar-benar
+        # dipakai, bukan default pg_trgm 0.3
+        matches = fuzzy_search(Pemilik, 'Mohamed Abdelrahman Elsayed Mostafa', threshold=0.1)
+        self.assertEqual([pk for pk, _ in matches], [pemilik.pk])
+        self.assertLess(matches[0][1], 0.3)
+
+
+class ImportDataTests(TestCase):
+    FIELDS = ['distrik', 'lokasi', 'alamat', 'lat', 'long', 'unit_number', 'lantai', 'deskripsi', 'pemilik_nama', 'pemilik_no_telp']
+
+    def _import(self, rows):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / 'data.csv'
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, self.FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        call_command('import_data', str(path), stdout=StringIO(), stderr=StringIO())
+
+    def test_pending_person_matched_by_any_key(self):
+        base = {'distrik': 'Nasr City', 'lokasi': 'Hay 10', 'alamat': 'Shari3 1', 'lat': '30.05', 'long': '31.35', 'lantai': '1', 'deskripsi': 'kanan'}
+        self._import([
+            # Baris pertama tanpa telepon, baris berikut cocok lewat nama; baris
+            # terakhir cocok lewat telepon walau namanya ditulis lain
+            {**base, 'unit_number': '1', 'pemilik_nama': 'Mohamed Ahmed'},
+            {**base, 'unit_number': '2', 'pemilik_nama': 'Mohamed Ahmed', 'pemilik_no_telp': '0101 234 5678'},
+            {**base, 'unit_number': '3', 'pemilik_nama': 'Mahmoud Hassan', 'pemilik_no_telp': '0111 222 3333'},
+            {**base, 'unit_number': '4', 'pemilik_nama': 'M. Hassan', 'pemilik_no_telp': '+20 111 222 3333'},
+        ])
+
+        self.assertEqual(sorted(Pemilik.objects.values_list('nama', flat=True)), ['Mahmoud Hassan', 'Mohamed Ahmed'])
+        owners = dict(Unit.objects.values_list('unit_number', 'pemilik__nama'))
+        self.assertEqual(owners, {'1': 'Mohamed Ahmed', '2': 'Mohamed Ahmed', '3': 'Mahmoud Hassan', '4': 'Mahmoud Hassan'})
+
+
+class ImageVariantTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        lokasi = Lokasi.objects.create(distrik=Distrik.objects.create(nama='Nasr City'), nama='Hay 10')
+        cls.gedung = Gedung.objects.create(lokasi=lokasi, nama_gedung='Imarah', alamat='Shari3', lat=30.05, long=31.35)
+
+    def _create(self, **kwargs):
+        return Image.objects.create(content_object=self.gedung, image=ContentFile(GIF, 'g.gif'), **kwargs)
+
+    def test_variants_generated_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            image = self._create(is_primary=True)
+            # Di dalam transaksi belum ada variant; API memakai original
+            self.assertEqual(Image.objects.get(pk=image.pk).variants, {})
+
+        for callback in callbacks:
+            callback()
+        image.refresh_from_db()
+        self.assertEqual(set(image.variants), {'thumb', 'medium'})
+        self.assertTrue(all(image.image.storage.exists(name) for name in image.variants.values()))
+        # Save variants saja tidak menurunkan is_primary
+        self.assertTrue(image.is_primary)
+        self.gedung.refresh_from_db()
+        self.assertEqual(self.gedung.primary_image_id, image.pk)
+
+    def test_replacing_file_deletes_old_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = self._create()
+        image.refresh_from_db()
+        old_variants = list(image.variants.values())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image.image = ContentFile(GIF, 'baru.gif')
+            image.save()
+        image.refresh_from_db()
+
+        storage = image.image.storage
+        self.assertTrue(image.variants)
+        self.assertFalse(set(old_variants) & set(image.variants.values()))
+        self.assertFalse(any(storage.exists(name) for name in old_variants))
+        self.assertTrue(all(storage.exists(name) for name in image.variants.values()))
+
+    def test_delete_removes_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = self._create()
+        image.refresh_from_db()
+        names = list(image.variants.values())
+        self.assertTrue(names)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertFalse(any(image.image.storage.exists(name) for name in names))
+
+
+class UnitCounterTests(TestCase):
+    """total_units/blacklisted_units Gedung mengikuti setiap perubahan unit"""
+
+    @classmethod
+    def setUpTestData(cls):
+        lokasi = Lokasi.objects.create(distrik=Distrik.objects.create(nama='Nasr City'), nama='Hay 10')
+        cls.a = Gedung.objects.create(lokasi=lokasi, nama_gedung='A', alamat='a', lat=30.05, long=31.35)
+        cls.b = Gedung.objects.create(lokasi=lokasi, nama_gedung='B', alamat='b', lat=30.06, long=31.36)
+
+    def assertCounts(self, gedung, total, blacklisted):
+        gedung.refresh_from_db()
+        self.assertEqual((gedung.total_units, gedung.blacklisted_units), (total, blacklisted))
+
+    def _unit(self, gedung, number, listing_type='blacklist'):
+        return Unit.objects.create(gedung=gedung, unit_number=number, lantai=1, deskripsi='kanan', listing_type=listing_type)
+
+    def test_create(self):
+        self._unit(self.a, '1')
+        self._unit(self.a, '2', 'available')
+        self.assertCounts(self.a, 2, 1)
+
+    def test_move_between_gedung(self):
+        unit = self._unit(self.a, '1')
+        unit.gedung = self.b
+        unit.save()
+        self.assertCounts(self.a, 0, 0)
+        self.assertCounts(self.b, 1, 1)
+
+    def test_listing_type_change(self):
+        unit = self._unit(self.a, '1')
+        unit.listing_type = 'available'
+        unit.save(update_fields=['listing_type'])
+        self.assertCounts(self.a, 1, 0)
+        unit.listing_type = 'blacklist'
+        unit.save()
+        self.assertCounts(self.a, 1, 1)
+
+    def test_delete(self):
+        unit = self._unit(self.a, '1')
+        self._unit(self.a, '2', 'available')
+        unit.delete()
+        self.assertCounts(self.a, 1, 0)
+        Unit.objects.filter(gedung=self.a).delete()
+        self.assertCounts(self.a, 0, 0)
+
+    def test_save_with_deferred_fields(self):
+        unit = self._unit(self.a, '1')
+
+        deferred = Unit.objects.only('deskripsi').get(pk=unit.pk)
+        deferred.deskripsi = 'kiri'
+        deferred.save(update_fields=['deskripsi'])
+        self.assertCounts(self.a, 1, 1)
+
+        deferred = Unit.objects.only('deskripsi').get(pk=unit.pk)
+        deferred.deskripsi = 'tengah'
+        deferred.save()
+        self.assertCounts(self.a, 1, 1)
+
+        deferred = Unit.objects.only('deskripsi').get(pk=unit.pk)
+        deferred.listing_type = 'available'
+        deferred.save(update_fields=['listing_type'])
+        self.assertCounts(self.a, 1, 0)
+
+        deferred = Unit.objects.defer('gedung').get(pk=unit.pk)
+        deferred.gedung = self.b
+        deferred.save(update_fields=['gedung'])
+        self.assertCounts(self.a, 0, 0)
+        self.assertCounts(self.b, 1, 0)
+
+    def test_deleting_primary_image_touches_owner(self):
+        image = Image.objects.create(content_object=self.a, image=ContentFile(GIF, 'g.gif'), is_primary=True)
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.primary_image_id, image.pk)
+        updated_at = self.a.updated_at
+
+        image.delete()
+        self.a.refresh_from_db()
+        self.assertIsNone(self.a.primary_image_id)
+        self.assertGreater(self.a.updated_at, updated_at)
+
+
+def _geocell_decode(cell):
+    """Kebalikan _interleave_bits: geocell -> (y, x) pada level GEOCELL_BITS"""
+    y = x = 0
+    for bit in range(GEOCELL_BITS):
+        x |= ((cell >> (2 * bit)) & 1) << bit
+        y |= ((cell >> (2 * bit + 1)) & 1) << bit
+    return y, x
+
+
+class GeocellTests(SimpleTestCase):
+    POINTS = [
+        (30.065958719470665, 31.327724660547236), (-33.8688, 151.2093), (40.7128, -74.006),
+        (-22.9068, -43.1729), (0.0, 0.0), (-0.000001, -0.000001), (89.9999, 179.9999), (-89.9999, -179.9999),
+    ]
+
+    def test_round_trip(self):
+        size = 1 << GEOCELL_BITS
+        for lat, long in self.POINTS:
+            with self.subTest(lat=lat, long=long):
+                cell = geocell_encode(lat, long)
+                y, x = _geocell_decode(cell)
+                self.assertEqual((y, x), _geocell_axes(lat, long))
+                # Titik ada di dalam cell hasil decode
+                self.assertLessEqual(y * 180.0 / size - 90.0, lat)
+                self.assertLess(lat, (y + 1) * 180.0 / size - 90.0)
+                self.assertLessEqual(x * 360.0 / size - 180.0, long)
+                self.assertLess(long, (x + 1) * 360.0 / size - 180.0)
+
+    def test_edges(self):
+        largest = (1 << (2 * GEOCELL_BITS)) - 1
+        self.assertEqual(geocell_encode(-90, -180), 0)
+        self.assertEqual(geocell_encode(90, 180), largest)
+        self.assertLess(largest, 1 << 63)
+        # Di luar range di-clamp ke cell tepi
+        self.assertEqual(geocell_encode(-91, -181), 0)
+        self.assertEqual(geocell_encode(91, 181), largest)
+        self.assertEqual(_geocell_decode(geocell_encode(-90, 180)), (0, (1 << GEOCELL_BITS) - 1))
+        self.assertEqual(_geocell_decode(geocell_encode(90, -180)), ((1 << GEOCELL_BITS) - 1, 0))
+        # Sisi negatif dan positif nol jatuh di cell yang bersebelahan
+        below, above = _geocell_decode(geocell_encode(-1e-9, -1e-9)), _geocell_decode(geocell_encode(0, 0))
+        self.assertEqual((above[0] - below[0], above[1] - below[1]), (1, 1))
+
+    def test_ranges_cover_bbox(self):
+        for bbox in ((30.0, 30.1, 31.3, 31.4), (-34.0, -33.7, 151.0, 151.3), (-0.05, 0.05, -0.05, 0.05), (-90, -89.9, -180, -179.9)):
+            ranges = geocell_ranges(*bbox)
+            self.assertLessEqual(len(ranges), 16)
+            lat_min, lat_max, lon_min, lon_max = bbox
+            for i in range(11):
+                for j in range(11):
+                    lat = lat_min + (lat_max - lat_min) * i / 10
+                    long = lon_min + (lon_max - lon_min) * j / 10
+                    cell = geocell_encode(lat, long)
+                    with self.subTest(bbox=bbox, lat=lat, long=long):
+                        self.assertTrue(any(start <= cell < end for start, end in ranges))
+
+
+class GedungGeocellTests(TestCase):
+    """lat_float/long_float/geocell mengikuti lat/long setiap kali Gedung disimpan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.lokasi = Lokasi.objects.create(distrik=Distrik.objects.create(nama='Nasr City'), nama='Hay 10')
+
+    def assertInSync(self, gedung):
+        gedung.refresh_from_db()
+        self.assertEqual(gedung.lat_float, float(gedung.lat))
+        self.assertEqual(gedung.long_float, float(gedung.long))
+        self.assertEqual(gedung.geocell, geocell_encode(gedung.lat, gedung.long))
+
+    def test_create(self):
+        gedung = Gedung.objects.create(lokasi=self.lokasi, alamat='a', lat='-33.868800000000000', long='-151.209300000000000')
+        self.assertInSync(gedung)
+        self.assertEqual(gedung.lat_float, -33.8688)
+
+    def test_save(self):
+        gedung = Gedung.objects.create(lokasi=self.lokasi, alamat='a', lat=30.05, long=31.35)
+        gedung.lat, gedung.long = -22.9068, -43.1729
+        gedung.save()
+        self.assertInSync(gedung)
+
+    def test_save_with_update_fields(self):
+        gedung = Gedung.objects.create(lokasi=self.lokasi, alamat='a', lat=30.05, long=31.35)
+        before = gedung.geocell
+
+        gedung = Gedung.objects.get(pk=gedung.pk)
+        gedung.lat = -30.05
+        gedung.save(update_fields=['lat'])
+        self.assertInSync(gedung)
+        self.assertNotEqual(gedung.geocell, before)
+
+        gedung.long = -31.35
+        gedung.save(update_fields=['long', 'alamat'])
+        self.assertInSync(gedung)
+        self.assertEqual(gedung.geocell, geocell_encode(-30.05, -31.35))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 hanya di SQLite')
+class SqliteSearchTests(TestCase):
+    """search_gedung / search_filter di atas tabel FTS5 (config.settings.test memakai SQLite)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.distrik = Distrik.objects.create(nama='Nasr City')
+        cls.zamalek = Lokasi.objects.create(distrik=Distrik.objects.create(nama='Zamalek'), nama='Zamalek')
+        cls.hay10 = Lokasi.objects.create(distrik=cls.distrik, nama='Hay 10')
+
+        def gedung(lokasi, nama, alamat):
+            return Gedung.objects.create(lokasi=lokasi, nama_gedung=nama, alamat=alamat, lat=30.05, long=31.35)
+        # Dokumen pendek dengan kata yang sering muncul lebih relevan (bm25)
+        # Dibuat lebih dulu (id lebih kecil), tapi kurang relevan untuk 'zamalek'
+        cls.villa = gedung(cls.hay10, 'Villa Nour', 'Dekat jembatan ke Zamalek, belakang masjid besar, lantai dasar toko roti')
+        cls.tower = gedung(cls.zamalek, 'Zamalek Tower', 'Shari3 26 July')
+        cls.cafe = gedung(cls.hay10, 'Imarah Café', 'Shari3 Makram Ebeid')
+        cls.others = [gedung(cls.hay10, f'Imarah {i}', f'Shari3 Abbas el Akkad {i}') for i in range(5)]
+
+    def _search(self, query, limit=20, offset=0):
+        return search_gedung(query, limit, offset)
+
+    def test_ranking(self):
+        ids, total = self._search('zamalek')
+        self.assertEqual(ids, [self.tower.id, self.villa.id])
+        self.assertEqual(total, 2)
+
+    def test_prefix_all_terms_and_diacritics(self):
+        self.assertEqual(self._search('zama tow')[0], [self.tower.id])
+        self.assertEqual(self._search('cafe makram')[0], [self.cafe.id])
+        self.assertEqual(self._search('abbas')[1], 5)
+
+    def test_unsafe_query(self):
+        for query in ('', '  ', '"', '*', 'OR AND NOT', 'zamalek" OR "x'):
+            with self.subTest(query=query):
+                ids, total = self._search(query)
+                self.assertEqual(len(ids), total)
+
+    def test_pagination(self):
+        ids, total = self._search('imarah', limit=4)
+        rest, rest_total = self._search('imarah', limit=4, offset=4)
+        self.assertEqual((total, rest_total), (6, 6))
+        self.assertEqual(len(ids) + len(rest), 6)
+        self.assertFalse(set(ids) & set(rest))
+        # Offset di luar jangkauan: total tetap dihitung
+        self.assertEqual(self._search('imarah', offset=50), ([], 6))
+
+    def test_filter_matches_search(self):
+        for query in ('zamalek', 'imarah', 'shari3 abbas 3', 'tidak ada'):
+            with self.subTest(query=query):
+                ids, _ = self._search(query)
+                self.assertEqual(set(Gedung.objects.filter(search_filter(query)).values_list('id', flat=True)), set(ids))
+
+    def test_index_follows_writes(self):
+        gedung = Gedung.objects.get(pk=self.tower.pk)
+        gedung.nama_gedung = 'Burj Nil'
+        gedung.save(update_fields=['nama_gedung'])
+        self.assertEqual(self._search('burj')[0], [gedung.id])
+        self.assertEqual(self._search('tower'), ([], 0))
+
+        # Nama lokasi/distrik ikut di-refresh lewat signal
+        self.hay10.nama = 'Hay Sabi3'
+        self.hay10.save()
+        self.assertEqual(self._search('sabi3')[1], 7)
+        self.distrik.nama = 'Madinet Nasr'
+        self.distrik.save()
+        self.assertEqual(self._search('madinet')[1], 7)
+
+        Gedung.objects.get(pk=self.villa.pk).delete()
+        self.assertEqual(self._search('zamalek'), ([gedung.id], 1))
+
+    def test_fallback_without_full_text_index(self):
+        # Database selain PostgreSQL/SQLite: icontains per kata, urut id
+        with mock.patch('apps.core.search.connection', mock.Mock(vendor='mysql')):
+            self.assertEqual(self._search('zamalek'), ([self.villa.id, self.tower.id], 2))
+            self.assertEqual(self._search('shari3 abbas', limit=2, offset=1), ([o.id for o in self.others[1:3]], 5))
+            self.assertEqual(self._search('tidak ada'), ([], 0))
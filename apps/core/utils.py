@@ -1,4 +1,6 @@
+import re
 from pathlib import Path
+from django.conf import settings
 from django.utils.text import slugify
 from django.utils.html import strip_tags
 
@@ -59,3 +61,111 @@ def image_upload_path(instance, filename):
             return f'images/temp/{date_folder}/{safe_filename}'
     
     return f'images/misc/{date_folder}/{safe_filename}'
+
+
+# Jumlah bit per sumbu untuk geocell (total 62 bit, muat di bigint signed)
+GEOCELL_BITS = 31
+
+
+def _interleave_bits(y, x):
+    """Gabungkan bit y dan x secara bergantian (Z-order / Morton code)"""
+    cell = 0
+    for bit in range(GEOCELL_BITS):
+        cell |= ((x >> bit) & 1) << (2 * bit)
+        cell |= ((y >> bit) & 1) << (2 * bit + 1)
+    return cell
+
+
+def _geocell_axes(lat, long, level=GEOCELL_BITS):
+    """Kuantisasi lat/long ke index grid pada level tertentu"""
+    size = 1 << level
+    y = int((lat + 90.0) / 180.0 * size)
+    x = int((long + 180.0) / 360.0 * size)
+    return min(max(y, 0), size - 1), min(max(x, 0), size - 1)
+
+
+def geocell_encode(lat, long):
+    """
+    Hitung geocell (integer Z-order) dari koordinat.
+
+    Gedung yang berdekatan punya prefix bit yang sama, sehingga satu cell
+    pada level mana pun adalah satu range integer yang berurutan dan bisa
+    di-scan langsung dengan B-tree index.
+    """
+    y, x = _geocell_axes(float(lat), float(long))
+    return _interleave_bits(y, x)
+
+
+def geocell_ranges(lat_min, lat_max, lon_min, lon_max, max_cells=16):
+    """
+    Ubah bounding box menjadi daftar range geocell [start, end).
+
+    Memilih level grid paling halus yang menutup bounding box dengan
+    maksimal max_cells cell, lalu menggabungkan range yang bersambung.
+    """
+    for level in range(GEOCELL_BITS, -1, -1):
+        y_min, x_min = _geocell_axes(lat_min, lon_min, level)
+        y_max, x_max = _geocell_axes(lat_max, lon_max, level)
+        if (y_max - y_min + 1) * (x_max - x_min + 1) <= max_cells:
+            break
+
+    shift = 2 * (GEOCELL_BITS - level)
+    starts = sorted(
+        _interleave_bits(y, x) << shift
+        for y in range(y_min, y_max + 1)
+        for x in range(x_min, x_max + 1)
+    )
+
+    ranges = []
+    for start in starts:
+        end = start + (1 << shift)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return [tuple(r) for r in ranges]
+
+
+# Nomor E.164 paling banyak 15 digit (termasuk kode negara)
+E164_MAX_DIGITS = 15
+
+
+def normalize_phone(value, country_code=None):
+    """
+    Normalisasi nomor telepon ke digit saja dengan kode negara (format E.164 tanpa '+').
+    
+    - "+20 101 234 5678" / "0020 101..." -> "201012345678"
+    - "0101 234 5678" (awalan trunk 0)   -> kode negara default + "1012345678"
+    - "101 234 5678" (tanpa awalan)      -> kode negara default + "1012345678"
+    
+    Args:
+        value: nomor telepon bebas format
+        country_code: default PHONE_DEFAULT_COUNTRY_CODE (Mesir: '20')
+    
+    Returns:
+        str digit, atau None jika tidak ada digit atau lebih dari 15 digit
+        (batas E.164, juga muat di kolom no_telp_normalized)
+    """
+    if not value:
+        return None
+    digits = re.sub(r'\D', '', value)
+    if not digits:
+        return None
+    
+    country_code = country_code or getattr(settings, 'PHONE_DEFAULT_COUNTRY_CODE', '20')
+    if value.strip().startswith('+'):
+        normalized = digits
+    elif digits.startswith('00'):
+        normalized = digits[2:]
+    elif digits.startswith('0'):
+        normalized = country_code + digits.lstrip('0')
+    elif digits.startswith(country_code) and len(digits) > 10:
+        # Sudah memuat kode negara, hanya tanpa '+'
+        normalized = digits
+    else:
+        normalized = country_code + digits
+    
+    if len(normalized) > E164_MAX_DIGITS:
+        return None
+    return normalized
+
@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import json
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -30,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.api.metrics.MetricsMiddleware',
+    'apps.api.nplusone.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -85,4 +88,94 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-CSRF_TRUSTED_ORIGINS = []
\ No newline at end of file
+CSRF_TRUSTED_ORIGINS = []
+
+# Spatial index in-memory untuk /gedung/nearby (satu per worker)
+GEDUNG_SPATIAL_INDEX = True
+GEDUNG_INDEX_CELL_SIZE = 0.01  # ukuran cell grid dalam derajat (~1.1 km)
+GEDUNG_INDEX_MAX_AGE = 300  # detik sebelum rebuild penuh di background (sinkron antar worker)
+
+# Fuzzy matching nama/julukan pemilik & agen (trigram). Di luar PostgreSQL
+# memakai index in-memory per worker, di-rebuild setelah FUZZY_INDEX_MAX_AGE detik
+FUZZY_NAME_THRESHOLD = 0.3  # similarity minimum (0-1)
+FUZZY_INDEX_MAX_AGE = 300
+
+# Delta sync (/api/sync). Perubahan dalam SYNC_LAG_SECONDS terakhir ditunda ke pull
+# berikutnya; tombstone lebih tua dari retensi dihapus (purge_tombstones) dan
+# cursor yang lebih tua dijawab 410 (client sync penuh ulang).
+# Batas: setiap transaksi tulis harus commit dalam SYNC_LAG_SECONDS sejak updated_at
+# di-stamp (termasuk selisih jam antar server), jika tidak barisnya terlewat client.
+# Request admin/API selesai jauh di bawah ini; import_data dan recompute_denormalized
+# memakai transaksi per batch dan memberi peringatan jika satu batch mendekati batas.
+SYNC_LAG_SECONDS = 60
+SYNC_TOMBSTONE_RETENTION_DAYS = 90
+
+# Snapshot SQLite offline (manage.py build_snapshot, /api/snapshot).
+# SNAPSHOT_MEDIA_BASE_URL: prefix untuk URL media relatif, mis. https://domain/
+# SNAPSHOT_ACCEL_REDIRECT_PREFIX: kirim file lewat nginx (X-Accel-Redirect), mis. /_snapshots/
+SNAPSHOT_DIR = BASE_DIR / 'snapshots'
+SNAPSHOT_MEDIA_BASE_URL = os.getenv('SNAPSHOT_MEDIA_BASE_URL')
+SNAPSHOT_ACCEL_REDIRECT_PREFIX = os.getenv('SNAPSHOT_ACCEL_REDIRECT_PREFIX')
+
+# Cluster peta /gedung/clusters (dihitung per worker untuk setiap zoom < CLUSTER_MAX_ZOOM;
+# mulai CLUSTER_MAX_ZOOM gedung dikirim satu per satu, maksimal CLUSTER_MAX_GEDUNG)
+CLUSTER_MAX_ZOOM = 17
+CLUSTER_CELLS_PER_TILE = 4  # cell per sisi tile 256 px (~64 px per cluster)
+CLUSTER_MAX_GEDUNG = 1000
+CLUSTER_INDEX_MAX_AGE = 300
+
+# Cache response /gedung/nearby (Django cache framework)
+NEARBY_CACHE_ENABLED = True
+NEARBY_CACHE_GRID = 0.002  # kuantisasi lat/long untuk cache key (~200 m)
+NEARBY_CACHE_REGION_SIZE = 0.02  # ukuran region invalidasi (~2 km)
+NEARBY_CACHE_TIMEOUT = 300  # detik
+
+# Gunakan cache server bersama (Redis) agar cache dan counter dipakai semua worker
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+
+# Variant gambar yang dibuat setelah Image disimpan (sisi terpanjang dalam pixel),
+# dipilih client lewat ?image_size=thumb|medium|original. Setelah diubah jalankan
+# manage.py generate_image_variants --all
+IMAGE_VARIANTS = {'thumb': 320, 'medium': 1024}
+IMAGE_VARIANT_FORMAT = 'WEBP'  # WEBP atau JPEG
+IMAGE_VARIANT_QUALITY = 80
+
+# Cache URL media per worker (presigned URL di-cache setengah masa berlakunya)
+MEDIA_URL_CACHE_SIZE = 10000
+MEDIA_URL_CACHE_TIMEOUT = None  # detik untuk URL tanpa expiry, None = selamanya
+
+# Lewati validasi response schema untuk output view yang sudah pasti bentuknya
+# (lihat apps/api/api.py _trusted). Aktif di production, tetap divalidasi di dev/test.
+API_TRUST_RESPONSES = False
+
+# Rate limit per API key (token bucket: rate request/detik, kapasitas burst) dan kuota harian.
+# Hanya key yang terdaftar di env API_RATE_LIMITS (JSON) yang dibatasi, contoh:
+# {"key-partner": {"rate": 50, "burst": 200, "daily_quota": 500000}}
+# API_RATE_LIMIT_DEFAULT (mis. {'rate': 10, 'burst': 40}) berlaku untuk key lain; None = tanpa limit.
+# Butuh cache bersama (REDIS_URL); dengan LocMemCache rate limit dimatikan.
+API_RATE_LIMIT_ENABLED = True
+API_RATE_LIMIT_DEFAULT = None
+API_RATE_LIMITS = json.loads(os.getenv('API_RATE_LIMITS') or '{}')
+
+# Prometheus metrics (/metrics). Antar worker gunicorn digabung lewat PROMETHEUS_MULTIPROC_DIR
+API_METRICS_ENABLED = True
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # wajib di luar DEBUG, header Authorization: Bearer <token>
+
+# Deteksi N+1 query per request (opt-in). Query dengan template SQL sama yang
+# dijalankan >= threshold kali di-log dengan stack trace; N_PLUS_ONE_RAISE
+# membuat request gagal (dipakai di config.settings.test).
+N_PLUS_ONE_DETECTION = os.getenv('N_PLUS_ONE_DETECTION') == 'True'
+N_PLUS_ONE_THRESHOLD = 5
+N_PLUS_ONE_RAISE = False
+
+# Kode negara default untuk normalisasi nomor telepon tanpa awalan internasional (Mesir)
+PHONE_DEFAULT_COUNTRY_CODE = '20'
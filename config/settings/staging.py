@@ -68,4 +68,7 @@ STORAGES = {
     },
 }
 
-MEDIA_URL = f"https://{R2_MEDIA_DOMAIN}/"
\ No newline at end of file
+MEDIA_URL = f"https://{R2_MEDIA_DOMAIN}/"
+
+# Output view API sudah tervalidasi di development, render langsung dengan orjson
+API_TRUST_RESPONSES = True
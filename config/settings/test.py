@@ -0,0 +1,30 @@
+import tempfile
+
+from ..base import *
+
+# python manage.py test --settings=config.settings.test
+SECRET_KEY = 'django-insecure-test'
+DEBUG = False
+ALLOWED_HOSTS = ['testserver']
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    }
+}
+
+STATICFILES_DIRS = []
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+MEDIA_ROOT = tempfile.mkdtemp(prefix='imarah-test-media-')
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Test gagal jika ada query N+1 di request API/admin
+N_PLUS_ONE_DETECTION = True
+N_PLUS_ONE_RAISE = True
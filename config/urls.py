@@ -4,10 +4,12 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 from apps.api.api import api
+from apps.api.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', api.urls),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
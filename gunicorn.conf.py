@@ -0,0 +1,41 @@
+# Konfigurasi gunicorn untuk production (ASGI)
+# Jalankan dengan: gunicorn -c gunicorn.conf.py
+import os
+import shutil
+
+# Metrics Prometheus multi-process: setiap worker menulis ke file di direktori
+# ini dan /metrics menggabungkannya. Harus diset sebelum worker import Django.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+
+# Settings harus dipilih eksplisit (Dockerfile / docker-compose), config.asgi
+# tidak menebak environment
+if not os.environ.get('DJANGO_SETTINGS_MODULE'):
+    raise RuntimeError('DJANGO_SETTINGS_MODULE belum diset, contoh: config.settings.staging')
+
+# Aplikasi ASGI Django, dijalankan oleh worker uvicorn
+wsgi_app = 'config.asgi:application'
+worker_class = 'uvicorn_worker.UvicornWorker'
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY') or 3)
+timeout = int(os.getenv('GUNICORN_TIMEOUT') or 60)
+graceful_timeout = 30
+keepalive = 5
+
+# Restart worker berkala untuk mencegah memory bloat (spatial index, cache URL)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS') or 5000)
+max_requests_jitter = 500
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    # Bersihkan metrics dari proses sebelumnya
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)